@@ -4,11 +4,33 @@ from .coupler import (
     Coupler,
     SwmmBackend,
     PipedreamBackend,
+    CompositeBackend,
+    ProcessBackend,
+    swmm_hotstart,
     smooth_Q,
     limit_outflow,
 )
-from .volume_balance import VolumeBalance, VolumeRecord
-from .inp import read_inp, inp_to_pipedream, InpNetwork
+from .volume_balance import (
+    VolumeBalance,
+    VolumeRecord,
+    MassBalanceError,
+    read_volume_balance,
+)
+from .inp import (
+    read_inp,
+    read_inp_section,
+    inp_to_pipedream,
+    internal_link_counts,
+    pipedream_elements,
+    pipedream_structures,
+    InpNetwork,
+    NetworkGraph,
+    network_components,
+    control_rule_elements,
+    subset_network,
+    skeletonize,
+    write_inp,
+)
 from .factory import couple_from_inp, Coupling
 from .inlet_catalogue import (
     InletSpec,
@@ -16,4 +38,4 @@ from .inlet_catalogue import (
     load_inlet_library,
     resolve_inlet_spec,
 )
-from .hydrograph import HydrographLogger
+from .hydrograph import HydrographLogger, HydrographFile, read_hydrographs
@@ -0,0 +1,188 @@
+"""Content-hash keys and file locations for the opt-in setup caches.
+
+Several setup artefacts are expensive to rebuild but depend only on their
+inputs (a SWMM warm-up hotstart, for one). They are cached on disk under a key
+that hashes those inputs, so a changed ``.inp`` or option is simply a cache
+miss -- nothing is ever invalidated in place.
+
+Nothing is cached with ``pickle``: loading a pickle runs whatever code it
+names, so a file planted in a shared cache directory would run in the next
+model run. Structured artefacts go through :func:`save_arrays` /
+:func:`load_arrays` instead -- numeric and string arrays in an ``.npz`` read
+with ``allow_pickle=False``, plus a JSON description of how they nest. The
+default cache directory is private to the user.
+
+No ANUGA or backend needed.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+_CHUNK = 1 << 20
+
+
+def file_digest(path):
+    """SHA-256 hex digest of a file's bytes (read in 1 MiB chunks)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def digest(*parts):
+    """SHA-256 hex digest of ``parts`` (bytes are hashed as-is, anything else
+    by its ``repr``), each length-prefixed so adjacent parts can't run together."""
+    h = hashlib.sha256()
+    for p in parts:
+        b = p if isinstance(p, (bytes, bytearray, memoryview)) else repr(p).encode()
+        h.update(len(b).to_bytes(8, "little"))
+        h.update(b)
+    return h.hexdigest()
+
+
+def cache_path(cache_dir, prefix, key, ext):
+    """``<cache_dir>/<prefix>_<key[:20]><ext>``, creating ``cache_dir``.
+
+    ``cache_dir=None`` uses :func:`default_cache_dir`, so repeated runs by one
+    user on one machine still share it.
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, f"{prefix}_{key[:20]}{ext}")
+
+
+def default_cache_dir():
+    """``anuga_drainage-<uid>`` under the system temp directory, created with
+    mode 0700.
+
+    Raises ``PermissionError`` if it already exists but is not a directory
+    owned by this user and closed to everyone else (as one planted by another
+    user would be). Where there are no user ids (Windows, whose temp directory
+    is per user already) it is plain ``anuga_drainage``.
+    """
+    getuid = getattr(os, "getuid", None)
+    if getuid is None:
+        return os.path.join(tempfile.gettempdir(), "anuga_drainage")
+    path = os.path.join(tempfile.gettempdir(), f"anuga_drainage-{getuid()}")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not os.path.isdir(path) or os.path.islink(path) or st.st_uid != getuid() \
+            or st.st_mode & 0o077:
+        raise PermissionError(f"cache directory {path} is not private to this user; "
+                              "remove it or pass cache_dir=")
+    return path
+
+
+def save_arrays(path, tree):
+    """Write ``tree`` to the ``.npz`` ``path`` without pickling (atomically).
+
+    ``tree`` nests dicts, lists and tuples of numpy arrays, numpy/Python
+    scalars, strings, ``None`` and pandas DataFrames/Series. Object arrays
+    (and columns) may hold only strings, ``None`` and real numbers (read back
+    as floats). Anything else raises ``TypeError`` before a file is written.
+    """
+    arrays = {}
+    manifest = _encode(tree, arrays)
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, manifest=np.array(json.dumps(manifest)), **arrays)
+    os.replace(tmp, path)   # atomic: a concurrent run never sees a partial file
+
+
+def load_arrays(path, key=None):
+    """Read back a tree written by :func:`save_arrays`.
+
+    With ``key``, the tree must be a dict and only its ``key`` entry is read
+    (e.g. a small stamp stored next to large tables).
+    """
+    with np.load(path, allow_pickle=False) as f:
+        node = json.loads(f["manifest"].item())
+        if key is not None:
+            node = dict(node["dict"])[key]
+        return _decode(node, f)
+
+
+def _put(arrays, a):
+    key = f"a{len(arrays)}"
+    arrays[key] = a
+    return key
+
+
+def _encode(obj, arrays):
+    import pandas as pd
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return {"value": obj}
+    if isinstance(obj, np.generic):
+        return {"value": obj.item()}
+    if isinstance(obj, np.ndarray):
+        if obj.dtype != object:
+            return {"array": _put(arrays, obj)}
+        flat = obj.ravel()
+        number = np.array([isinstance(v, (int, float, np.integer, np.floating))
+                           and not isinstance(v, (bool, np.bool_)) for v in flat], dtype=bool)
+        missing = np.array([v is None for v in flat], dtype=bool)
+        if not all(isinstance(v, str) for v in flat[~(number | missing)]):
+            raise TypeError("object arrays may hold only strings, numbers and None")
+        text = np.where(number | missing, "", flat).astype(str).reshape(obj.shape)
+        node = {"strings": _put(arrays, text),
+                "missing": _put(arrays, missing.reshape(obj.shape))}
+        if number.any():
+            values = np.where(number, flat, np.nan).astype(float).reshape(obj.shape)
+            node["numbers"] = _put(arrays, values)
+            node["numeric"] = _put(arrays, number.reshape(obj.shape))
+        return node
+    if isinstance(obj, dict):
+        return {"dict": [[k, _encode(v, arrays)] for k, v in obj.items()]}
+    if isinstance(obj, (list, tuple)):
+        return {"list" if isinstance(obj, list) else "tuple":
+                [_encode(v, arrays) for v in obj]}
+    if isinstance(obj, pd.DataFrame):
+        return {"frame": [[c, _encode(obj[c].to_numpy(), arrays)] for c in obj.columns],
+                "index": _encode_index(obj.index, arrays)}
+    if isinstance(obj, pd.Series):
+        return {"series": _encode(obj.to_numpy(), arrays), "name": obj.name,
+                "index": _encode_index(obj.index, arrays)}
+    raise TypeError(f"cannot store a {type(obj).__name__} without pickling")
+
+
+def _encode_index(index, arrays):
+    import pandas as pd
+    if isinstance(index, pd.RangeIndex):
+        return {"range": [index.start, index.stop, index.step]}
+    return _encode(index.to_numpy(), arrays)
+
+
+def _decode(node, f):
+    import pandas as pd
+    if "value" in node:
+        return node["value"]
+    if "array" in node:
+        return f[node["array"]]
+    if "strings" in node:
+        out = f[node["strings"]].astype(object)
+        out[f[node["missing"]]] = None
+        if "numbers" in node:
+            numeric = f[node["numeric"]]
+            out[numeric] = f[node["numbers"]][numeric]
+        return out
+    if "dict" in node:
+        return {k: _decode(v, f) for k, v in node["dict"]}
+    if "list" in node:
+        return [_decode(v, f) for v in node["list"]]
+    if "tuple" in node:
+        return tuple(_decode(v, f) for v in node["tuple"])
+    index = _decode_index(node["index"], f)
+    if "frame" in node:
+        return pd.DataFrame({c: _decode(v, f) for c, v in node["frame"]}, index=index)
+    return pd.Series(_decode(node["series"], f), index=index, name=node["name"])
+
+
+def _decode_index(node, f):
+    import pandas as pd
+    if "range" in node:
+        return pd.RangeIndex(*node["range"])
+    return pd.Index(_decode(node, f))
@@ -0,0 +1,192 @@
+"""Growable float64 row tables for the per-step diagnostics.
+
+The audits record a fixed-width row of floats every coupling step. Held as a
+Python list of tuples that is one object per step (170k of them for a 24 h event
+at 0.5 s); here the rows live in one preallocated ``(capacity, width)`` float64
+array that doubles when full, so appending is a slice assignment and reading the
+history back is a view.
+
+With ``path`` the array is an ``np.memmap`` over a raw row-major float64 file, so
+the history is on disk as it is written -- a crashed run still leaves every
+completed row behind. Rows not yet written are NaN; :func:`read_rows` drops them,
+and :meth:`RowStore.close` truncates the file to the rows written.
+
+:class:`FlushSchedule` is the shared "every N steps or T seconds" cadence of the
+writers that push their buffered rows to disk during a run; :class:`LogCadence`
+the "every N records or T simulated seconds" choice of which rows to keep.
+
+Pure numpy; no ANUGA or backend needed.
+"""
+import os
+import time
+
+import numpy as np
+
+_ITEMSIZE = np.dtype(np.float64).itemsize
+
+
+class FlushSchedule:
+    """When a buffered writer flushes: after ``every`` appends and/or once
+    ``interval`` seconds of wall-clock time have passed since the last flush.
+
+    With neither set it never fires (flush only on close).
+    """
+
+    def __init__(self, every=None, interval=None):
+        if every is not None and every < 1:
+            raise ValueError(f"flush every must be >= 1, got {every}")
+        if interval is not None and interval <= 0:
+            raise ValueError(f"flush interval must be > 0, got {interval}")
+        self.every = every
+        self.interval = interval
+        self._pending = 0
+        self._last = time.monotonic()
+
+    def tick(self):
+        """Count one append; True when the writer should flush now."""
+        self._pending += 1
+        if self.every is not None and self._pending >= self.every:
+            return True
+        return (self.interval is not None
+                and time.monotonic() - self._last >= self.interval)
+
+    def reset(self):
+        """Mark a flush as done."""
+        self._pending = 0
+        self._last = time.monotonic()
+
+
+class LogCadence:
+    """Which records a cadenced logger keeps: the first, then every ``every``-th
+    and/or the first once ``interval`` s of simulated time have passed."""
+
+    def __init__(self, every, interval):
+        if every is not None and every < 1:
+            raise ValueError(f"log_every must be >= 1, got {every}")
+        if interval is not None and interval <= 0:
+            raise ValueError(f"log_interval must be > 0, got {interval}")
+        self.every = every
+        self.interval = interval
+        self._since = None
+        self._last_t = None
+
+    def due(self, t):
+        """Count one record at time ``t``; True when it is to be kept."""
+        if self._since is not None:
+            self._since += 1
+            if not ((self.every is not None and self._since >= self.every)
+                    or (self.interval is not None
+                        and t - self._last_t >= self.interval)):
+                return False
+        self._since = 0
+        self._last_t = t
+        return True
+
+
+class RowStore:
+    """A ``(rows, width)`` float64 table appended one row at a time.
+
+    Parameters
+    ----------
+    width : int
+        Values per row.
+    capacity : int
+        Rows preallocated up front; the table doubles whenever it fills.
+    path : str, optional
+        Back the table with a memmap file at ``path`` (created or overwritten).
+    """
+
+    def __init__(self, width, capacity=1024, path=None):
+        if capacity < 1:
+            raise ValueError(f"capacity must be >= 1, got {capacity}")
+        self.width = int(width)
+        self.path = None if path is None else os.fspath(path)
+        self.n = 0
+        if self.path is None:
+            self._data = np.full((capacity, self.width), np.nan)
+        else:
+            self._data = np.memmap(self.path, dtype=np.float64, mode="w+",
+                                   shape=(capacity, self.width))
+            self._data[:] = np.nan
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def capacity(self):
+        return self._data.shape[0]
+
+    @property
+    def data(self):
+        """The rows written so far, as a view (no copy)."""
+        return self._data[:self.n]
+
+    def append(self, row):
+        """Write ``row`` (length ``width``) after the last row; return its index."""
+        if self.n == self.capacity:
+            self._grow(max(2 * self.capacity, 1))
+        self._data[self.n] = row
+        self.n += 1
+        return self.n - 1
+
+    def extend(self, rows):
+        """Write a ``(k, width)`` block of rows after the last row."""
+        rows = np.asarray(rows, dtype=float).reshape(-1, self.width)
+        need = self.n + len(rows)
+        if need > self.capacity:
+            capacity = max(self.capacity, 1)
+            while capacity < need:
+                capacity *= 2
+            self._grow(capacity)
+        self._data[self.n:need] = rows
+        self.n = need
+
+    def clear(self):
+        """Drop the rows (keeping the allocation), e.g. once they are written out."""
+        self._data[:self.n] = np.nan
+        self.n = 0
+
+    def _grow(self, capacity):
+        old = self.capacity
+        if self.path is None:
+            data = np.full((capacity, self.width), np.nan)
+            data[:old] = self._data
+        else:
+            # Extend the file in place and remap it; views taken before the
+            # remap keep the old mapping alive, so they stay valid.
+            self._data.flush()
+            with open(self.path, "r+b") as f:
+                f.truncate(capacity * self.width * _ITEMSIZE)
+            data = np.memmap(self.path, dtype=np.float64, mode="r+",
+                             shape=(capacity, self.width))
+            data[old:] = np.nan
+        self._data = data
+
+    def flush(self):
+        """Push the written rows to disk (no-op without ``path``)."""
+        if self.path is not None:
+            self._data.flush()
+
+    def close(self):
+        """Flush and trim the file to the rows written; the in-memory rows
+        stay readable. No-op without ``path``."""
+        if self.path is None:
+            return
+        self._data.flush()
+        self._data = np.array(self._data[:self.n])
+        with open(self.path, "r+b") as f:
+            f.truncate(self.n * self.width * _ITEMSIZE)
+        self.path = None
+
+
+def read_rows(path, width):
+    """Read a :class:`RowStore` file back as a ``(rows, width)`` array.
+
+    Works on a file left by a run that never closed it: the preallocated rows
+    it had not reached yet (all NaN) are dropped.
+    """
+    data = np.fromfile(path, dtype=np.float64)
+    data = data[:data.size - data.size % width].reshape(-1, width)
+    written = ~np.all(np.isnan(data), axis=1)
+    n = written.nonzero()[0][-1] + 1 if written.any() else 0
+    return data[:n]
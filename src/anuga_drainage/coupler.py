@@ -22,6 +22,7 @@ example); the backends expose the underlying sim/superlink handles for that.
 See CLAUDE.md for the coupling-loop background and the pyswmm 2.1.0 / numpy 2.x
 environment constraints.
 """
+import os
 from collections import namedtuple
 
 import numpy as np
@@ -30,6 +31,13 @@ from .coupling import calculate_Q
 
 CouplingStep = namedtuple("CouplingStep", ["Q_in", "anuga_flux"])
 
+# Entry of a steady-state cache file recording what the state was settled
+# under: the per-superjunction base inflow, then dt and tol.
+_STEADY_INPUTS = "steady_inputs"
+# Pseudo-time steps without a smaller largest change before initialize_steady
+# halves its dt.
+_STALL_STEPS = 20
+
 
 def smooth_Q(Q_new, Q_old, dt, time_average):
     """Time-average the coupling flux to damp oscillations.
@@ -140,6 +148,47 @@ class SwmmBackend:
         self.sim.close()
 
 
+def swmm_hotstart(inp_path, duration, cache_dir=None):
+    """Path to a SWMM hotstart file holding the network's state after a 1D-only
+    warm-up of ``duration`` seconds, running the warm-up only if not cached.
+
+    A cold SWMM run starts every node at its ``InitDepth`` and needs a base-flow
+    spin-up (the ``.inp``'s own ``[INFLOWS]`` / ``[DWF]``) before its heads are
+    meaningful to couple against. The warm-up runs SWMM alone from the ``.inp``
+    start time and saves the state; the file is keyed by the ``.inp`` content
+    hash, the duration and the pyswmm version, so a scenario batch pays for it
+    once. Load it with ``Simulation.use_hotstart(path)`` before ``start()`` (as
+    ``couple_from_inp(..., warmup=...)`` does); the coupled run still starts at
+    the ``.inp`` start time. SWMM advances in whole seconds, so ``duration`` is
+    rounded to one (and must be at least 1). ``cache_dir`` defaults to the
+    system temp directory.
+    """
+    import pyswmm
+    from pyswmm import Simulation
+    from .cache import file_digest, digest, cache_path
+
+    if not duration >= 1:
+        raise ValueError(f"warm-up duration must be at least 1 s, got {duration}")
+    duration = int(round(duration))
+    key = digest(file_digest(inp_path), duration, pyswmm.__version__)
+    path = cache_path(cache_dir, "swmm_hotstart", key, ".hsf")
+    if os.path.exists(path):
+        return path
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with Simulation(inp_path) as sim:
+        total = (sim.end_time - sim.start_time).total_seconds()
+        if not 0 < duration < total:
+            raise ValueError(f"warm-up duration {duration} s must lie within the "
+                             f"{total:g} s simulation period of {inp_path}")
+        sim.step_advance(duration)
+        for _ in sim:
+            sim.save_hotstart(tmp)
+            break
+    os.replace(tmp, path)   # atomic: a concurrent run never sees a partial file
+    return path
+
+
 class PipedreamBackend:
     """Coupling backend for pipedream's SuperLink.
 
@@ -177,7 +226,91 @@ class PipedreamBackend:
                             if int(superlink._J_dk[k]) in outs]
         self._outfall_uk = [k for k in range(len(superlink._J_uk))
                             if int(superlink._J_uk[k]) in outs]
+        # Orifices, weirs and pumps discharging at an outfall, as (flow
+        # attribute, into-outfall indices, out-of-outfall indices).
+        self._outfall_structures = []
+        for q, up, down in (("_Qo", "_J_uo", "_J_do"), ("_Qw", "_J_uw", "_J_dw"),
+                            ("_Qp", "_J_up", "_J_dp")):
+            into = [i for i, j in enumerate(getattr(superlink, down, ())) if int(j) in outs]
+            out_of = [i for i, j in enumerate(getattr(superlink, up, ())) if int(j) in outs]
+            if into or out_of:
+                self._outfall_structures.append((q, into, out_of))
         self._outfall_vol = 0.0
+        # Control settings of structure tables that carry a ``u`` column (as
+        # pipedream_structures builds them); pipedream closes any structure
+        # stepped without one.
+        self._controls = {}
+        for u, table in (("u_o", "orifices"), ("u_w", "weirs"), ("u_p", "pumps")):
+            t = getattr(superlink, table, None)
+            if t is not None and "u" in t:
+                self._controls[u] = t["u"].to_numpy(dtype=float)
+
+    def initialize_steady(self, Q_base, dt=30.0, tol=1e-6, max_iter=5000, cache=None):
+        """Settle the network to steady state under a constant base inflow.
+
+        A ``.inp``-built SuperLink starts practically dry (``h_0=1e-5``), and the
+        semi-implicit solver then needs many tiny sub-steps while base flow
+        establishes itself -- where it is most prone to blowing up. This
+        pseudo-time steps the SuperLink with ``Q_base`` (scalar or one value per
+        coupled junction) at the coupled junctions, in large ``dt`` steps, until
+        no head changes by more than ``tol`` (m) and no internal flow by more
+        than ``tol`` (m^3/s) over a step, then resets the solver clock to 0.
+        Whenever the largest change has not shrunk for 20 steps (at a large
+        ``dt`` the solver can settle into a cycle instead of a fixed point),
+        ``dt`` is halved. Only the initial state is set: the base inflow is not kept up during
+        coupling, nor counted in the coupling/outfall volumes.
+
+        ``cache`` is an ``.npz`` path, written once the steady state is reached
+        together with the inflow, ``dt`` and ``tol`` it was reached under. It is
+        loaded into the SuperLink instead of settling again only if those match
+        this call's; otherwise it is recomputed and overwritten. The file does
+        not identify the network itself, so give each network its own path.
+        Returns the number of pseudo-time steps taken (0 when loaded from
+        ``cache``).
+        """
+        s = self.superlink
+        full = np.zeros(len(s.H_j))
+        full[self.coupled] = np.broadcast_to(np.asarray(Q_base, dtype=float),
+                                             self.coupled.shape)
+        inputs = np.concatenate([full, [dt, tol]])
+        if cache is not None and os.path.exists(cache):
+            with np.load(cache) as f:
+                if _STEADY_INPUTS in f.files and np.array_equal(f[_STEADY_INPUTS], inputs):
+                    s.load_state({k: f[k].item() if f[k].ndim == 0 else f[k]
+                                  for k in f.files if k != _STEADY_INPUTS})
+                    return 0
+
+        best, stalled = np.inf, 0
+        for it in range(1, max_iter + 1):
+            H_prev, Q_prev = np.copy(s.H_j), np.copy(s.Q_ik)
+            if self.H_bc is None:
+                s.step(Q_in=full, dt=dt, **self._controls)
+            else:
+                s.step(Q_in=full, H_bc=self.H_bc, dt=dt, **self._controls)
+            dH = np.abs(s.H_j - H_prev).max(initial=0.0)
+            dQ = np.abs(s.Q_ik - Q_prev).max(initial=0.0)
+            if not (np.isfinite(dH) and np.isfinite(dQ)):
+                raise FloatingPointError(
+                    f"pipedream diverged after {it} pseudo-time steps; reduce dt")
+            if dH <= tol and dQ <= tol:
+                break
+            if max(dH, dQ) < best:
+                best, stalled = max(dH, dQ), 0
+            else:
+                stalled += 1
+                if stalled >= _STALL_STEPS:
+                    dt /= 2
+                    best, stalled = np.inf, 0
+        else:
+            raise RuntimeError(f"no steady state after {max_iter} pseudo-time steps "
+                               f"(last max |dH| = {dH:.3g} m, |dQ| = {dQ:.3g} m^3/s)")
+        s.t = 0.0
+        s.save_state()
+        if cache is not None:
+            tmp = f"{cache}.{os.getpid()}.tmp.npz"
+            np.savez(tmp, **s.states, **{_STEADY_INPUTS: inputs})
+            os.replace(tmp, cache)
+        return it
 
     def get_heads(self):
         return self.superlink.H_j[self.coupled]
@@ -208,13 +341,16 @@ class PipedreamBackend:
         sub_dt = dt / nsub
         for _ in range(nsub):
             if self.H_bc is None:
-                self.superlink.step(Q_in=full, dt=sub_dt)
+                self.superlink.step(Q_in=full, dt=sub_dt, **self._controls)
             else:
-                self.superlink.step(Q_in=full, H_bc=self.H_bc, dt=sub_dt)
-            if self._outfall_dk or self._outfall_uk:
+                self.superlink.step(Q_in=full, H_bc=self.H_bc, dt=sub_dt, **self._controls)
+            if self._outfall_dk or self._outfall_uk or self._outfall_structures:
                 s = self.superlink
                 out = (sum(float(s.Q_dk[k]) for k in self._outfall_dk)
                        - sum(float(s.Q_uk[k]) for k in self._outfall_uk))
+                for q, into, out_of in self._outfall_structures:
+                    flow = getattr(s, q)
+                    out += float(flow[into].sum() - flow[out_of].sum())
                 self._outfall_vol += out * sub_dt
 
     def anuga_flux(self, Q_in, dt):
@@ -263,6 +399,201 @@ class PipedreamBackend:
         """No external resources to release for pipedream."""
 
 
+def _send_error(conn, e):
+    """Hand ``e`` back to the parent; if it does not pickle, its traceback."""
+    try:
+        conn.send(("err", e))
+    except Exception:
+        import traceback
+        conn.send(("err", RuntimeError("".join(traceback.format_exception(e)))))
+
+
+def _serve_backend(conn, factory, args):
+    """Child-process loop for :class:`ProcessBackend`: build the backend and
+    report how that went, then answer ``(method, args)`` requests until told
+    to close."""
+    try:
+        backend = factory(*args)
+    except Exception as e:
+        _send_error(conn, e)
+        conn.close()
+        return
+    conn.send(("ok", None))
+    while True:
+        name, call_args = conn.recv()
+        try:
+            result = getattr(backend, name)(*call_args)
+        except Exception as e:
+            _send_error(conn, e)
+        else:
+            conn.send(("ok", result))
+        if name == "close":
+            break
+    conn.close()
+
+
+class ProcessBackend:
+    """A coupling backend running in its own child process.
+
+    ``factory(*args)`` is called in the child to build the real backend (so it
+    must be a picklable, module-level callable); every backend method called on
+    this proxy is forwarded over a pipe and the result returned. This is how
+    SWMM sub-networks run concurrently: the SWMM engine allows one open
+    simulation per process. An exception raised by ``factory`` or a method in
+    the child is re-raised here. :meth:`close` closes the remote backend and
+    joins the child.
+    """
+
+    def __init__(self, factory, *args):
+        import multiprocessing as mp
+
+        ctx = mp.get_context("spawn")   # a fresh interpreter: no inherited SWMM state
+        self._conn, child = ctx.Pipe()
+        self._proc = ctx.Process(target=_serve_backend, args=(child, factory, args),
+                                 daemon=True)
+        self._proc.start()
+        child.close()
+        try:
+            self._result()              # wait until the backend is built
+        except BaseException:
+            self._conn.close()
+            self._proc.join()
+            raise
+
+    def _result(self):
+        try:
+            status, result = self._conn.recv()
+        except EOFError:
+            self._proc.join()
+            raise RuntimeError(f"backend process exited with code "
+                               f"{self._proc.exitcode}") from None
+        if status == "err":
+            raise result
+        return result
+
+    def _call(self, name, *args):
+        self._conn.send((name, args))
+        return self._result()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda *args: self._call(name, *args)
+
+    def close(self):
+        """Close the remote backend and wait for the child process to exit."""
+        if self._proc.is_alive():
+            try:
+                self._call("close")
+            finally:
+                self._conn.close()
+                self._proc.join()
+
+
+class CompositeBackend:
+    """Several independent backends presented to the Coupler as one.
+
+    A council's drainage is usually many disconnected networks, one per outfall
+    catchment. Each is built as its own backend and they are advanced
+    concurrently, so the wall time of an exchange step scales with the largest
+    part rather than the sum of all of them.
+
+    Parameters
+    ----------
+    parts : sequence of ``(backend, indices)`` pairs; ``indices`` are the
+        positions of that backend's coupled junctions in the combined (Coupler)
+        order. Together they must cover ``0..n-1`` exactly once.
+    max_workers : thread-pool size (default one thread per part). pipedream
+        parts step in these threads, so they overlap only as far as its solver
+        releases the GIL; wrap a part in a :class:`ProcessBackend` (as
+        ``couple_from_inp`` does for SWMM) to step it in its own process.
+    finalizers : callables run after the parts are closed (e.g. removing the
+        temporary sub-network ``.inp`` files).
+    """
+
+    def __init__(self, parts, max_workers=None, finalizers=()):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.backends = [b for b, _ in parts]
+        self.indices = [np.asarray(ix, dtype=int) for _, ix in parts]
+        self.n = sum(len(ix) for ix in self.indices)
+        covered = np.sort(np.concatenate(self.indices)) if self.indices else np.array([])
+        if not np.array_equal(covered, np.arange(self.n)):
+            raise ValueError("CompositeBackend part indices must cover 0..n-1 exactly once")
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or len(self.backends) or 1)
+        self._finalizers = list(finalizers)
+
+    def _map(self, name, *per_part_args):
+        """Call method ``name`` on every part concurrently; results in part order."""
+        args = per_part_args or [()] * len(self.backends)
+        futures = [self._pool.submit(getattr(b, name), *a)
+                   for b, a in zip(self.backends, args)]
+        return [f.result() for f in futures]
+
+    def _scatter(self, per_part):
+        """Place per-part arrays at their combined positions."""
+        out = np.zeros(self.n)
+        for ix, vals in zip(self.indices, per_part):
+            out[ix] = vals
+        return out
+
+    def get_heads(self):
+        return self._scatter(self._map("get_heads"))
+
+    def node_depths(self):
+        """Water depth above the invert at each coupled node."""
+        return self._scatter(self._map("node_depths"))
+
+    def conduit_names(self):
+        """Name of each conduit, part by part (parallel to conduit_flows())."""
+        return [name for names in self._map("conduit_names") for name in names]
+
+    def conduit_flows(self):
+        """Flow in each conduit, part by part."""
+        return np.concatenate([np.asarray(f, dtype=float)
+                               for f in self._map("conduit_flows")])
+
+    def step(self, Q_in, dt):
+        Q_in = np.asarray(Q_in, dtype=float)
+        self._map("step", *[(Q_in[ix], dt) for ix in self.indices])
+
+    def anuga_flux(self, Q_in, dt):
+        Q_in = np.asarray(Q_in, dtype=float)
+        return self._scatter(self._map("anuga_flux", *[(Q_in[ix], dt) for ix in self.indices]))
+
+    def link_volume(self):
+        return float(sum(self._map("link_volume")))
+
+    # --- independent pipe-side volume accounting (for VolumeBalance) ---
+    def pipe_volume(self):
+        """Water currently held in all parts."""
+        return float(sum(self._map("pipe_volume")))
+
+    def coupling_inflow_volumes(self):
+        """Per-junction cumulative net injected volume, in combined order."""
+        per_part = self._map("coupling_inflow_volumes")
+        if any(len(v) == 0 for v in per_part):   # a pipedream part before its first step
+            return []
+        return list(self._scatter(per_part))
+
+    def coupling_inflow_volume(self):
+        """Cumulative net volume injected at the coupling junctions of all parts."""
+        return float(sum(self._map("coupling_inflow_volume")))
+
+    def outfall_volume(self):
+        """Cumulative volume that has left all parts at their outfalls."""
+        return float(sum(self._map("outfall_volume")))
+
+    def close(self):
+        """Close every part, then run the finalizers."""
+        try:
+            self._map("close")
+        finally:
+            self._pool.shutdown()
+            for fn in self._finalizers:
+                fn()
+
+
 class Coupler:
     """Drives the per-step 2D<->1D exchange for a set of inlets and a backend.
 
@@ -287,6 +618,7 @@ class Coupler:
         self.g = g  # gravity for calculate_Q; None -> ANUGA's value (see calculate_Q)
         self.logger = logger  # optional HydrographLogger; records each step if set
         self.Q_in = np.zeros(len(self.inlets))
+        self._approach = None  # cached inlet-region gather for _log_step
 
     def depths(self):
         return np.array([op.inlet.get_average_depth() for op in self.inlets])
@@ -323,10 +655,31 @@ class Coupler:
         Approach flow is estimated per inlet from the region-averaged specific
         discharge (momentum) times a representative width (sqrt of the inlet
         area) -- the same surface-side heuristic as the standalone capture model.
+        The averages for all inlets come from one gather over the domain's
+        momentum centroids (see :meth:`_approach_gather`).
         """
-        uh = np.array([op.inlet.get_average_xmom() for op in self.inlets])
-        vh = np.array([op.inlet.get_average_ymom() for op in self.inlets])
-        widths = np.sqrt([op.inlet.get_area() for op in self.inlets])
-        approach = np.sqrt(uh ** 2 + vh ** 2) * widths
         time = self.inlets[0].domain.get_time() if self.inlets else 0.0
+        if self.inlets:
+            idx, inlet, weights, widths = self._approach_gather()
+            q = self.inlets[0].domain.quantities
+            n = len(self.inlets)
+            uh = np.bincount(inlet, q["xmomentum"].centroid_values[idx] * weights, n)
+            vh = np.bincount(inlet, q["ymomentum"].centroid_values[idx] * weights, n)
+            approach = np.sqrt(uh ** 2 + vh ** 2) * widths
+        else:
+            approach = np.zeros(0)
         self.logger.record(time, dt, depths, heads, approach, Q)
+
+    def _approach_gather(self):
+        """The inlet regions' triangles flattened once, for batched averages:
+        ``(triangle indices, inlet id per triangle, area / inlet-area weights,
+        sqrt(inlet area) widths)``. The regions never change, so it is cached."""
+        if self._approach is None:
+            tris = [np.asarray(op.inlet.triangle_indices, dtype=int)
+                    for op in self.inlets]
+            area = np.array([op.inlet.get_area() for op in self.inlets], dtype=float)
+            idx = np.concatenate(tris)
+            inlet = np.repeat(np.arange(len(tris)), [len(t) for t in tris])
+            weights = self.inlets[0].domain.areas[idx] / area[inlet]
+            self._approach = (idx, inlet, weights, np.sqrt(area))
+        return self._approach
@@ -6,14 +6,18 @@ auto-creates the ANUGA inlet operators at each junction, and returns a ready
 ``Coupler``. So a coupled model becomes "write one ``.inp``, pick a backend,
 run the evolve loop". The junctions are coupled to the surface; outfalls are
 treated as boundaries (free drainage for pipedream; SWMM handles its own).
+Storage units, orifices, weirs and pumps are part of the 1D network only.
 """
 from dataclasses import dataclass, field
 
 import numpy as np
 
-from .inp import read_inp, inp_to_pipedream
-from .inlet_initialization import n_sided_inlet
-from .coupler import Coupler, SwmmBackend, PipedreamBackend
+from .inp import (read_inp, inp_to_pipedream, network_components, subset_network,
+                  control_rule_elements, write_inp, internal_link_counts, pipedream_elements,
+                  pipedream_structures)
+from .inlet_initialization import inlet_triangle_indices, n_sided_inlet
+from .coupler import (Coupler, SwmmBackend, PipedreamBackend, CompositeBackend,
+                      ProcessBackend, swmm_hotstart)
 from .hydrograph import HydrographLogger
 
 
@@ -38,7 +42,8 @@ class Coupling:
     coupler: object
     inlets: dict          # junction name -> ANUGA Inlet_operator
     backend: object       # SwmmBackend / PipedreamBackend
-    handle: object        # pyswmm Simulation (swmm) or pipedream SuperLink
+    handle: object        # pyswmm Simulation (swmm) or pipedream SuperLink; with
+                          # workers=, the list of per-group backends
     inp: object           # parsed InpNetwork
     domain: object        # the ANUGA domain
     volume_balance: object = None
@@ -46,24 +51,41 @@ class Coupling:
 
     def step(self, dt):
         """Run one coupled exchange step; if a VolumeBalance is attached, record
-        it first (at the loop top, with the previous step, so the reads align)."""
-        if self.volume_balance is not None:
-            self.volume_balance.step(self.domain.get_time(), dt, self._prev_step)
+        it first (at the loop top, with the previous step, so the reads align).
+
+        Returns None, without stepping, once a ``on_breach="stop"`` watchdog on
+        the VolumeBalance has tripped, so the loop can ``break`` on it.
+        """
+        vb = self.volume_balance
+        if vb is not None:
+            if vb.breach is None:
+                vb.step(self.domain.get_time(), dt, self._prev_step)
+            if vb.breach is not None:
+                return None
         self._prev_step = self.coupler.step(dt)
         return self._prev_step
 
-    def add_volume_balance(self, inflow_operators=(), outfall_inlet=None):
+    def add_volume_balance(self, inflow_operators=(), outfall_inlet=None,
+                           **options):
         """Attach a :class:`~anuga_drainage.VolumeBalance`; subsequent
-        :meth:`step` calls update it. Returns the VolumeBalance."""
+        :meth:`step` calls update it. ``options`` (``path``, ``capacity``,
+        ``per_inlet_every``, ``every``, ``interval``, ``dense_above``, and the
+        watchdog's ``tolerances`` / ``on_breach``) are passed on to it. Returns
+        the VolumeBalance."""
         from .volume_balance import VolumeBalance
         self.volume_balance = VolumeBalance(
             self.domain, list(self.inlets.values()), self.backend,
-            inflow_operators=inflow_operators, outfall_inlet=outfall_inlet)
+            inflow_operators=inflow_operators, outfall_inlet=outfall_inlet,
+            **options)
         return self.volume_balance
 
     def close(self):
         """Release backend resources (closes the SWMM simulation; no-op for
-        pipedream)."""
+        pipedream) and close any volume-balance file and hydrograph stream."""
+        if self.volume_balance is not None:
+            self.volume_balance.close()
+        if getattr(self.coupler, "logger", None) is not None:
+            self.coupler.logger.close()
         self.backend.close()
 
 
@@ -86,19 +108,266 @@ def _polygon_perimeter(p):
     return float(np.sum(np.hypot(d[:, 0], d[:, 1])))
 
 
+def _inlet_setup(domain, jnames, coords, areas_in, n_sides, rotation,
+                 inlet_polygons, specs):
+    """Resolve each junction's coupling footprint on the mesh.
+
+    Returns ``(tri_indices, beds, footprint_areas, hyd_weirs, hyd_areas)``: the
+    triangle indices of each inlet region, its area-weighted bed elevation, the
+    footprint area, and the hydraulic perimeter/area fed to ``calculate_Q``.
+    """
+    # The polygon sets the surface coupling footprint (the ANUGA region, and the
+    # pipedream storage area). The *hydraulic* area/perimeter fed to calculate_Q
+    # come from an assigned inlet_spec if any, else the footprint geometry — so a
+    # small grate opening drives the flux without shrinking the footprint.
+    polygons, expands = [], []
+    footprint_areas, hyd_weirs, hyd_areas = [], [], []
+    for name, area in zip(jnames, areas_in):
+        if name in inlet_polygons:
+            vertices = [[float(x), float(y)] for x, y in inlet_polygons[name]]
+            eff_area = _polygon_area(vertices)
+            weir = _polygon_perimeter(vertices)
+            # Honour the given footprint exactly: don't expand it across nearby
+            # steep terrain (e.g. a channel bank), or returned surcharge gets
+            # distributed onto those high cells and strands as a thin film.
+            expand = False
+        else:
+            if name not in coords.index:
+                raise ValueError(f"junction {name!r} has no [COORDINATES] entry")
+            xy = [float(coords.loc[name, "x"]), float(coords.loc[name, "y"])]
+            vertices, side = n_sided_inlet(n_sides, float(area), xy, rotation)
+            eff_area = float(area)
+            weir = n_sides * side
+            expand = True   # a small auto polygon may not contain a cell centroid
+        polygons.append(vertices)
+        expands.append(expand)
+        footprint_areas.append(eff_area)
+        spec = specs.get(name)
+        if spec is not None:
+            hyd_areas.append(spec.operational_area)
+            hyd_weirs.append(spec.operational_perimeter)
+        else:
+            hyd_areas.append(eff_area)
+            hyd_weirs.append(weir)
+    # Resolve every footprint against one spatial index of the mesh, rather
+    # than letting each Region scan all triangles.
+    tri_indices = inlet_triangle_indices(
+        domain.get_centroid_coordinates(absolute=True),
+        domain.get_vertex_coordinates(absolute=True), polygons, expands)
+    elevation = domain.quantities["elevation"].centroid_values
+    beds = []
+    for name, ix in zip(jnames, tri_indices):
+        if len(ix) == 0:
+            raise ValueError(f"inlet region for junction {name!r} contains no triangles")
+        # as Inlet.get_average_elevation
+        areas = domain.areas[ix]
+        beds.append(np.sum(elevation[ix] * areas) / np.sum(areas))
+    return (tri_indices, np.array(beds), np.array(footprint_areas),
+            np.array(hyd_weirs), np.array(hyd_areas))
+
+
+def _cached_inlet_setup(domain, inp_path, cache_dir, jnames, coords, areas_in,
+                        n_sides, rotation, inlet_polygons, specs):
+    """:func:`_inlet_setup` through an ``.npz`` cache under ``cache_dir``.
+
+    The key hashes the mesh geometry, the elevation, the ``.inp`` content and
+    the inlet arguments, so changing any of them is simply a miss. The ragged
+    triangle sets are stored flattened, with offsets.
+    """
+    import os
+    from .cache import file_digest, digest, cache_path
+
+    key = digest(np.ascontiguousarray(domain.get_vertex_coordinates(absolute=True)).tobytes(),
+                 np.ascontiguousarray(domain.quantities["elevation"].centroid_values).tobytes(),
+                 file_digest(inp_path), np.asarray(areas_in, dtype=float).tobytes(),
+                 n_sides, float(rotation),
+                 sorted((name, np.asarray(p, dtype=float).tolist())
+                        for name, p in inlet_polygons.items()),
+                 sorted(specs.items()))
+    path = cache_path(cache_dir, "coupling_setup", key, ".npz")
+    if os.path.exists(path):
+        with np.load(path) as z:
+            return (np.split(z["indices"], z["offsets"][1:-1]), z["beds"],
+                    z["footprint_areas"], z["hyd_weirs"], z["hyd_areas"])
+
+    tri_indices, beds, footprint_areas, hyd_weirs, hyd_areas = _inlet_setup(
+        domain, jnames, coords, areas_in, n_sides, rotation, inlet_polygons, specs)
+    offsets = np.concatenate([[0], np.cumsum([len(ix) for ix in tri_indices])])
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, indices=np.concatenate(tri_indices), offsets=offsets, beds=beds,
+             footprint_areas=footprint_areas, hyd_weirs=hyd_weirs, hyd_areas=hyd_areas)
+    os.replace(tmp, path)   # atomic: a concurrent run never sees a partial file
+    return tri_indices, beds, footprint_areas, hyd_weirs, hyd_areas
+
+
+def _pipedream_backend(inp, manhole_area, pit_area, internal_links,
+                       superlink_kwargs, max_step, cache=None, target_dx=None,
+                       courant=None):
+    """Build a PipedreamBackend coupling every junction of ``inp``, in order.
+
+    ``cache`` is an optional ``.npz`` path: the constructed SuperLink's arrays
+    (geometry, connectivity, solver matrices and tables) are restored from it
+    when present, otherwise it is built and its arrays stored there. A
+    SuperLink holding anything :func:`~anuga_drainage.cache.save_arrays`
+    cannot store (transect or tabular storage objects) is not cached. With
+    ``target_dx`` or ``courant``, each conduit gets its own number of internal
+    links (at most ``internal_links``, see
+    :func:`~anuga_drainage.internal_link_counts`).
+    """
+    import os
+    from pipedream_solver.hydraulics import SuperLink
+    from .cache import save_arrays, load_arrays
+    if cache is not None and os.path.exists(cache):
+        superlink = SuperLink.__new__(SuperLink)     # restored, not constructed
+        vars(superlink).update(load_arrays(cache))
+    else:
+        sj, sl = inp_to_pipedream(inp, manhole_area=manhole_area, pit_area=pit_area)
+        kwargs = {**pipedream_structures(inp), **(superlink_kwargs or {})}
+        if target_dx is None and courant is None:
+            superlink = SuperLink(sl, sj, internal_links=internal_links, **kwargs)
+        else:
+            n = internal_link_counts(sl, internal_links, target_dx=target_dx,
+                                     courant=courant, max_step=max_step)
+            sl, links, junctions = pipedream_elements(sj, sl, n)
+            superlink = SuperLink(sl, sj, links=links, junctions=junctions, **kwargs)
+        if cache is not None:
+            try:
+                save_arrays(cache, vars(superlink))
+            except TypeError:
+                pass                 # holds objects; rebuilt on every run
+    n_j = len(inp.junctions)
+    coupled = list(range(n_j))                          # junctions are listed first
+    outfalls = list(range(n_j, n_j + len(inp.outfalls)))  # outfalls follow them
+    H_bc = superlink._z_inv_j.copy() if outfalls else None  # free-drain outfalls
+    return PipedreamBackend(superlink, coupled_indices=coupled, H_bc=H_bc,
+                            outfall_indices=outfalls, max_step=max_step)
+
+
+def _superlink_cache(inp_key, names, params, cache_dir):
+    """Cache path for the SuperLink over junctions ``names`` of the ``.inp``
+    with digest ``inp_key``, built with ``params`` by this pipedream version."""
+    from importlib.metadata import version, PackageNotFoundError
+    from .cache import digest, cache_path
+    try:
+        solver = version("pipedream-solver")
+    except PackageNotFoundError:
+        solver = None
+    key = digest(inp_key, list(names), params, solver)
+    return cache_path(cache_dir, "pipedream_superlink", key, ".npz")
+
+
+def _swmm_backend(inp_path, junction_names, warmup=None, cache_dir=None):
+    """Open, start and wrap a SWMM simulation, from a warm-up hotstart if
+    ``warmup`` is given (also run inside a ProcessBackend for ``workers=``)."""
+    from pyswmm import Simulation, Nodes
+    # The warm-up is its own simulation, so it must finish before this one opens.
+    hotstart = swmm_hotstart(inp_path, warmup, cache_dir) if warmup else None
+    sim = Simulation(inp_path)
+    if hotstart:
+        sim.use_hotstart(hotstart)
+    sim.start()
+    nodes = Nodes(sim)
+    return SwmmBackend(sim, junctions=[nodes[name] for name in junction_names])
+
+
+def _partition(components, n_groups):
+    """Pack connected components into at most ``n_groups`` node groups.
+
+    Largest component first into the currently smallest group, so the groups'
+    sizes (and so their step costs) come out as even as the components allow.
+    Never more groups than components that contain a conduit, so no group is
+    left holding only isolated nodes.
+    """
+    linked = sum(1 for c in components if len(c) > 1)
+    n_groups = max(1, min(n_groups, linked))
+    groups = [[] for _ in range(n_groups)]
+    for comp in sorted(components, key=len, reverse=True):
+        min(groups, key=len).extend(comp)
+    return [g for g in groups if g]
+
+
+def _composite_backend(inp, inp_path, backend, jnames, workers, manhole_area,
+                       pit_area, internal_links, superlink_kwargs, max_step,
+                       warmup, cache_dir, superlink_params=None, target_dx=None,
+                       courant=None):
+    """One backend per group of connected components, as a CompositeBackend.
+
+    pipedream groups are SuperLinks stepped on a thread pool; SWMM groups run as
+    sub-network ``.inp`` files in their own processes (the SWMM engine allows
+    one open simulation per process); each keeps the ``[CONTROLS]`` rules on its
+    own elements. With ``superlink_params``, each group's SuperLink goes
+    through the array cache, keyed by its junctions.
+    """
+    import os
+    import tempfile
+    from .cache import file_digest
+
+    inp_key = file_digest(inp_path) if superlink_params is not None else None
+
+    position = {name: i for i, name in enumerate(jnames)}
+    parts, finalizers = [], []
+    workdir = None
+    if backend == "swmm":
+        workdir = tempfile.TemporaryDirectory(prefix="anuga_drainage_")
+        finalizers.append(workdir.cleanup)
+    # A [CONTROLS] rule can only act within one SWMM process, so the
+    # components it refers to share a group.
+    joined = control_rule_elements(inp_path) if backend == "swmm" else ()
+    for g, group in enumerate(_partition(network_components(inp, joined), workers)):
+        sub = subset_network(inp, group)
+        if not len(sub.junctions):
+            continue                                    # outfalls only: nothing to couple
+        names = list(sub.junctions["name"])
+        if backend == "swmm":
+            path = os.path.join(workdir.name, f"part{g}.inp")
+            write_inp(sub, path, source=inp_path)
+            part = ProcessBackend(_swmm_backend, path, names, warmup, cache_dir)
+        else:
+            cache = (_superlink_cache(inp_key, names, superlink_params, cache_dir)
+                     if inp_key else None)
+            part = _pipedream_backend(sub, manhole_area, pit_area, internal_links,
+                                      superlink_kwargs, max_step, cache,
+                                      target_dx, courant)
+        parts.append((part, [position[n] for n in names]))
+    return CompositeBackend(parts, max_workers=workers, finalizers=finalizers)
+
+
+def _initialize_steady(be, composite, inp_path, jnames, base, cache_dir, params):
+    """Steady-state initialise each pipedream (part) backend from the disk cache.
+
+    The cache key covers everything the steady state depends on: the ``.inp``
+    content, the part's junctions, their base inflow and the SuperLink build
+    parameters ``params``.
+    """
+    from .cache import file_digest, digest, cache_path
+
+    inp_key = file_digest(inp_path)
+    parts = (zip(be.backends, be.indices) if composite
+             else [(be, np.arange(len(jnames)))])
+    for part, ix in parts:
+        key = digest(inp_key, [jnames[i] for i in ix], base[ix].tolist(), params)
+        part.initialize_steady(base[ix],
+                               cache=cache_path(cache_dir, "pipedream_steady", key, ".npz"))
+
+
 def couple_from_inp(domain, inp_path, backend="swmm", *,
                     manhole_area=1.0, n_sides=6, rotation=0.0, inlet_polygons=None,
                     inlet_specs=None, library=None, blockage=0.0,
                     time_average=1.0, clamp=True, cw=0.67, co=0.67,
-                    internal_links=20, pit_area=1.0, pipedream_max_step=None,
-                    superlink_kwargs=None, log_hydrographs=False):
+                    internal_links=20, target_dx=None, courant=None,
+                    pit_area=1.0, pipedream_max_step=None,
+                    superlink_kwargs=None, log_hydrographs=False, workers=None,
+                    warmup=None, base_inflow=None, cache_dir=None,
+                    cache_setup=False, cache_superlink=False):
     """Build a ready :class:`~anuga_drainage.Coupler` from a SWMM ``.inp``.
 
     Parameters
     ----------
     domain : the ANUGA domain (meshed, elevation set).
     inp_path : path to the SWMM ``.inp`` describing the sewer network.
-    backend : ``"swmm"`` (pyswmm) or ``"pipedream"``.
+    backend : ``"swmm"`` (pyswmm) or ``"pipedream"``. pipedream takes the
+        ``.inp``'s storage units, orifices, weirs and pumps as mapped by
+        :func:`~anuga_drainage.pipedream_structures`.
     manhole_area : surface area of each inlet coupling region (scalar or one per
         junction); also used as the pipedream superjunction storage area.
     n_sides, rotation : geometry of the regular-polygon inlet regions (used for
@@ -126,8 +395,18 @@ def couple_from_inp(domain, inp_path, backend="swmm", *,
     log_hydrographs : if True, attach a :class:`~anuga_drainage.HydrographLogger`
         that records a per-inlet hydrograph each step; access it via
         ``coupling.coupler.logger`` and dump CSVs with ``logger.write_csv(dir)``.
+        A dict instead is passed to the logger as options, e.g.
+        ``{"stream_dir": "hydrographs/", "flush_every": 100}`` to stream the
+        CSVs during the run.
     internal_links, pit_area, superlink_kwargs : pipedream-only (discretisation,
         internal-junction storage, extra ``SuperLink`` kwargs).
+    target_dx, courant : pipedream-only. Discretise each conduit by its own
+        length instead of giving all of them ``internal_links`` sub-links:
+        ``target_dx`` caps the sub-link length (m); ``courant`` keeps each
+        sub-link at least as long as a full-depth gravity wave travels in
+        ``pipedream_max_step / courant`` seconds, so short conduits no longer
+        force a tiny step. ``internal_links`` is then the per-conduit maximum
+        (see :func:`~anuga_drainage.internal_link_counts`).
     pipedream_max_step : pipedream-only cap on the solver's *internal* hydraulic
         timestep (s). The coupling ``dt`` (ANUGA yieldstep / exchange frequency)
         can stay coarse — e.g. 1 s — while each pipedream step is subdivided into
@@ -135,7 +414,37 @@ def couple_from_inp(domain, inp_path, backend="swmm", *,
         needs for stability. ``None`` steps once at ``dt`` (was unstable at 1 s).
         The more ``internal_links``, the shorter each sub-conduit, so the smaller
         this must be (CFL): the default 20 links needs a finer step than the
-        hand-built run_pipedream.py's 6 links @ 0.05 s.
+        hand-built run_pipedream.py's 6 links @ 0.05 s. The shortest conduit
+        sets the bound, unless ``target_dx`` / ``courant`` size them apart.
+    workers : split the network into its connected components (one per outfall
+        catchment), pack them into at most ``workers`` groups of similar size,
+        and build one backend per group inside a
+        :class:`~anuga_drainage.CompositeBackend` that steps them concurrently.
+        pipedream groups step on a thread pool; SWMM groups each run a
+        sub-network ``.inp`` in their own process. ``handle`` is then the list of
+        per-group backends. ``None`` (default) builds a single backend.
+    warmup : SWMM-only. Start the network from its state after a 1D-only
+        warm-up of this many seconds (see :func:`~anuga_drainage.swmm_hotstart`)
+        instead of from the ``.inp`` ``InitDepth``. The hotstart file is cached
+        under ``cache_dir`` by the ``.inp`` content hash, so repeated runs of the
+        same network skip the warm-up. ``None`` (default) is a cold start.
+    base_inflow : pipedream-only. Base inflow (m^3/s; scalar or one per
+        junction) to settle the network under before coupling starts, via
+        :meth:`PipedreamBackend.initialize_steady`, instead of starting it
+        practically dry. The steady state is cached under ``cache_dir``.
+    cache_setup : if True, store the parsed ``.inp`` (see :func:`read_inp`) and
+        the resolved inlet setup (each region's triangles, bed elevation,
+        footprint and hydraulic arrays) under ``cache_dir``, the latter keyed by
+        the mesh, elevation, ``.inp`` and inlet arguments, and load them instead
+        of recomputing on later runs.
+    cache_superlink : pipedream-only. If True, store each constructed
+        ``SuperLink``'s arrays (no pickle) under ``cache_dir``, keyed by the ``.inp`` content,
+        ``manhole_area``, ``pit_area``, the discretisation, ``superlink_kwargs``
+        and the pipedream version, and load it instead of converting and
+        building it again on later runs.
+    cache_dir : directory for cached setup artefacts (default: a directory
+        private to the user under the system temp directory, see
+        :func:`~anuga_drainage.cache.default_cache_dir`).
 
     Returns
     -------
@@ -145,7 +454,7 @@ def couple_from_inp(domain, inp_path, backend="swmm", *,
     from anuga import Inlet_operator, Region   # lazy: pure callers don't need ANUGA
     from .inlet_catalogue import resolve_inlet_spec
 
-    inp = read_inp(inp_path)
+    inp = read_inp(inp_path, cache=cache_setup, cache_dir=cache_dir)
     jnames = list(inp.junctions["name"])
     if not jnames:
         raise ValueError(f"{inp_path}: no [JUNCTIONS] to couple")
@@ -167,70 +476,59 @@ def couple_from_inp(domain, inp_path, backend="swmm", *,
              for name, ref in inlet_specs.items()}
 
     # --- ANUGA inlet operators at each junction (backend-agnostic) ---
-    # The polygon sets the surface coupling footprint (the ANUGA region, and the
-    # pipedream storage area). The *hydraulic* area/perimeter fed to calculate_Q
-    # come from an assigned inlet_spec if any, else the footprint geometry — so a
-    # small grate opening drives the flux without shrinking the footprint.
-    inlets, beds = [], []
-    footprint_areas, hyd_weirs, hyd_areas = [], [], []
-    for name, area in zip(jnames, areas_in):
-        if name in inlet_polygons:
-            vertices = [[float(x), float(y)] for x, y in inlet_polygons[name]]
-            eff_area = _polygon_area(vertices)
-            weir = _polygon_perimeter(vertices)
-            # Honour the given footprint exactly: don't expand it across nearby
-            # steep terrain (e.g. a channel bank), or returned surcharge gets
-            # distributed onto those high cells and strands as a thin film.
-            expand = False
-        else:
-            if name not in coords.index:
-                raise ValueError(f"junction {name!r} has no [COORDINATES] entry")
-            xy = [float(coords.loc[name, "x"]), float(coords.loc[name, "y"])]
-            vertices, side = n_sided_inlet(n_sides, float(area), xy, rotation)
-            eff_area = float(area)
-            weir = n_sides * side
-            expand = True   # a small auto polygon may not contain a cell centroid
-        op = Inlet_operator(domain, Region(domain, polygon=vertices, expand_polygon=expand),
-                            Q=0.0, zero_velocity=True)
-        inlets.append(op)
-        beds.append(op.inlet.get_average_elevation())
-        footprint_areas.append(eff_area)
-        spec = specs.get(name)
-        if spec is not None:
-            hyd_areas.append(spec.operational_area)
-            hyd_weirs.append(spec.operational_perimeter)
-        else:
-            hyd_areas.append(eff_area)
-            hyd_weirs.append(weir)
-    beds = np.array(beds)
-    footprint_areas = np.array(footprint_areas)
-    hyd_weirs = np.array(hyd_weirs)
-    hyd_areas = np.array(hyd_areas)
+    setup = (jnames, coords, areas_in, n_sides, rotation, inlet_polygons, specs)
+    tri_indices, beds, footprint_areas, hyd_weirs, hyd_areas = (
+        _cached_inlet_setup(domain, inp_path, cache_dir, *setup) if cache_setup
+        else _inlet_setup(domain, *setup))
+    inlets = [Inlet_operator(domain, Region(domain, indices=ix), Q=0.0, zero_velocity=True)
+              for ix in tri_indices]
 
     # --- 1D backend, junctions ordered to match the inlets ---
-    if backend == "swmm":
-        from pyswmm import Simulation, Nodes
-        sim = Simulation(inp_path)
-        sim.start()
-        nodes = Nodes(sim)
-        be = SwmmBackend(sim, junctions=[nodes[name] for name in jnames])
-        handle = sim
-    elif backend == "pipedream":
-        from pipedream_solver.hydraulics import SuperLink
-        sj, sl = inp_to_pipedream(inp, manhole_area=float(footprint_areas[0]), pit_area=pit_area)
-        superlink = SuperLink(sl, sj, internal_links=internal_links,
-                              **(superlink_kwargs or {}))
-        n_j = len(jnames)
-        coupled = list(range(n_j))                          # junctions are listed first
-        outfalls = list(range(n_j, n_j + len(inp.outfalls)))  # outfalls follow them
-        H_bc = superlink._z_inv_j.copy() if outfalls else None  # free-drain outfalls
-        be = PipedreamBackend(superlink, coupled_indices=coupled, H_bc=H_bc,
-                              outfall_indices=outfalls, max_step=pipedream_max_step)
-        handle = superlink
-    else:
+    if backend not in ("swmm", "pipedream"):
         raise ValueError(f"backend must be 'swmm' or 'pipedream', got {backend!r}")
+    if backend != "pipedream":
+        if base_inflow is not None:
+            raise ValueError("base_inflow is pipedream-only; use warmup= for SWMM")
+        if cache_superlink:
+            raise ValueError("cache_superlink is pipedream-only")
+        if target_dx is not None or courant is not None:
+            raise ValueError("target_dx and courant are pipedream-only")
+    elif warmup is not None:
+        raise ValueError("warmup is SWMM-only; use base_inflow= for pipedream")
+    if target_dx is not None and courant is not None:
+        raise ValueError("give at most one of target_dx or courant")
+    if courant is not None and not pipedream_max_step:
+        raise ValueError("courant needs pipedream_max_step")
+    # Everything a pipedream SuperLink (and its steady state) is built from.
+    params = (float(footprint_areas[0]), pit_area, internal_links, target_dx, courant,
+              pipedream_max_step if courant is not None else None,
+              sorted((superlink_kwargs or {}).items()))
+    if workers is not None:
+        be = _composite_backend(inp, inp_path, backend, jnames, workers,
+                                float(footprint_areas[0]), pit_area, internal_links,
+                                superlink_kwargs, pipedream_max_step, warmup, cache_dir,
+                                params if cache_superlink else None, target_dx, courant)
+        handle = be.backends
+    elif backend == "swmm":
+        be = _swmm_backend(inp_path, jnames, warmup, cache_dir)
+        handle = be.sim
+    else:
+        from .cache import file_digest
+        cache = (_superlink_cache(file_digest(inp_path), jnames, params, cache_dir)
+                 if cache_superlink else None)
+        be = _pipedream_backend(inp, float(footprint_areas[0]), pit_area, internal_links,
+                                superlink_kwargs, pipedream_max_step, cache,
+                                target_dx, courant)
+        handle = be.superlink
+
+    if base_inflow is not None:
+        _initialize_steady(be, workers is not None, inp_path, jnames,
+                           _as_array(base_inflow, len(jnames)), cache_dir, params)
 
-    logger = HydrographLogger(jnames) if log_hydrographs else None
+    logger = None
+    if log_hydrographs:
+        opts = log_hydrographs if isinstance(log_hydrographs, dict) else {}
+        logger = HydrographLogger(jnames, **opts)
     coupler = Coupler(inlets=inlets, beds=beds, weir_lengths=hyd_weirs,
                       manhole_areas=hyd_areas, backend=be,
                       time_average=time_average, clamp=clamp, cw=cw, co=co,
@@ -8,12 +8,24 @@ schema, so the same viewer can open the files.
 
 ``HydrographLogger.record`` takes plain arrays (no ANUGA), so it is unit-testable
 standalone; the :class:`~anuga_drainage.Coupler` supplies the per-step samples.
+
+:meth:`HydrographLogger.write_binary` is the single-file alternative to one CSV
+per inlet: a small JSON header (inlet names, fields) followed by the raw float64
+rows, which :func:`read_hydrographs` memory-maps back (as do the viewer and
+``combine_hydrographs``).
+
+With ``stream_dir`` the rows are appended to those CSVs in chunks during the run
+and then dropped from memory, so a long run's footprint stays bounded, a crash
+keeps everything flushed so far, and the viewer can open the files mid-run.
 """
+import json
 import os
 
 import numpy as np
 import pandas as pd
 
+from .columns import FlushSchedule, LogCadence, RowStore
+
 # Per-row schema. The first seven names are exactly the Simple_SW_Inlets viewer's
 # required headers (so it opens these CSVs); Head1D_m / Surcharge / Cum_Inflow /
 # Cum_Surcharged are the coupled extras.
@@ -23,22 +35,181 @@ COLUMNS = [
     "Cum_Inflow_m3", "Cum_Captured_m3", "Cum_Surcharged_m3", "Cum_Bypassed_m3",
 ]
 
+# Binary hydrograph file: magic, uint64 header length, JSON header padded so the
+# data starts 64-byte aligned, then the logger's rows as little-endian float64.
+BINARY_EXT = ".hyd"
+_MAGIC = b"ADHYDRO1"
+_ALIGN = 64
+
+
+def _dense_columns(n, i):
+    """Columns of inlet ``i`` (``Time_s`` first) in a ``(steps, 1 + fields*n)``
+    table, where each field is one block of ``n`` inlets."""
+    return np.concatenate([[0], 1 + np.arange(len(COLUMNS) - 1) * n + i])
+
+
+def _samples_frame(name, samples):
+    """A ``(rows, len(COLUMNS))`` sample array as a per-inlet DataFrame."""
+    cols = {"Asset_ID": name}
+    for k, field in enumerate(COLUMNS):
+        cols[field] = samples[:, k]
+    return pd.DataFrame(cols, columns=["Asset_ID"] + COLUMNS)
+
+
+def _inlet_frame(names, i, data):
+    """Inlet ``i``'s rows of a ``(steps, 1 + fields*inlets)`` table as a DataFrame."""
+    return _samples_frame(names[i], data[:, _dense_columns(len(names), i)])
+
+
+def _field_block(data, n, field):
+    if field == "Time_s":
+        return data[:, 0]
+    if field not in COLUMNS:
+        raise ValueError(f"unknown hydrograph field {field!r}; expected one of {COLUMNS}")
+    j = COLUMNS.index(field) - 1
+    return data[:, 1 + j * n:1 + (j + 1) * n]
+
+
+def _write_inlet_csvs(names, samples, paths, float_format):
+    """Pool job of :meth:`HydrographLogger.write_csv`: one CSV per inlet from
+    its sample array."""
+    for name, rows, path in zip(names, samples, paths):
+        _samples_frame(name, rows).to_csv(path, index=False, float_format=float_format)
+
+
+class HydrographFile:
+    """A binary hydrograph file, memory-mapped (see :func:`read_hydrographs`).
+
+    ``names`` are the inlet ids; :meth:`column` and :meth:`to_dataframe` mirror
+    the :class:`HydrographLogger` accessors without reading the whole file.
+    """
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        with open(self.path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{self.path} is not a binary hydrograph file")
+            size = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(size).decode("utf-8"))
+        self.names = header["names"]
+        if header["fields"] != COLUMNS:
+            raise ValueError(f"{self.path} has fields {header['fields']}, "
+                             f"expected {COLUMNS}")
+        offset = len(_MAGIC) + 8 + size
+        width = 1 + (len(COLUMNS) - 1) * len(self.names)
+        rows = (os.path.getsize(self.path) - offset) // (width * 8)
+        self._data = (np.memmap(self.path, dtype="<f8", mode="r", offset=offset,
+                                shape=(rows, width))
+                      if rows else np.empty((0, width)))
+
+    def column(self, field):
+        """``field`` for every inlet as a ``(steps, inlets)`` array
+        (``(steps,)`` for ``Time_s``)."""
+        return _field_block(self._data, len(self.names), field)
+
+    def to_dataframe(self, name):
+        """Inlet ``name`` in the per-inlet CSV schema (Asset_ID + ``COLUMNS``)."""
+        return _inlet_frame(self.names, self.names.index(name), self._data)
+
+
+def read_hydrographs(path):
+    """Open a :meth:`HydrographLogger.write_binary` file (memory-mapped)."""
+    return HydrographFile(path)
+
+
+# Per-inlet run statistics kept online (see HydrographLogger.summary).
+SUMMARY_COLUMNS = [
+    "Asset_ID", "Peak_Captured_Q_cms", "Time_to_Peak_s", "Peak_Surcharge_Q_cms",
+    "Total_Captured_m3", "Total_Bypassed_m3", "Hours_Surcharged",
+]
+
+# The change thresholds (``tolerances``) a logger accepts, and the tolerance
+# each compared quantity falls under: depth, head, then the exchange, approach
+# and bypass discharges.
+_TOLERANCE_KEYS = ("depth", "head", "Q")
+_COMPARED = ("depth", "head", "Q", "Q", "Q")
+
 
 class HydrographLogger:
     """Accumulates per-inlet hydrograph rows over a coupled run.
 
+    The rows are held column-wise: one ``(steps, inlets)`` float64 block per
+    ``COLUMNS`` field (``Time_s`` once), appended and split for every inlet in
+    one vectorised :meth:`record`.
+
     Parameters
     ----------
     names : sequence of str
         Inlet/junction ids, in the same order as the Coupler's inlets.
+    stream_dir : str, optional
+        Append the rows to ``<stream_dir>/<prefix><name>.csv`` during the run
+        (the files are started afresh), keeping only the unflushed rows in memory.
+    prefix : str
+        File-name prefix of the streamed CSVs.
+    flush_every, flush_interval : int, float, optional
+        Stream cadence: flush after this many :meth:`record` calls and/or this
+        many seconds of wall-clock time (default: every 100 records).
+    log_every, log_interval : int, float, optional
+        Logging cadence, separate from the coupling's: keep a row only every
+        ``log_every`` records and/or once ``log_interval`` seconds of simulated
+        time have passed (default: every record).
+    tolerances : dict, optional
+        Delta compression, e.g. ``{"depth": 1e-3, "head": 1e-3, "Q": 1e-4}``:
+        on a logged step keep an inlet's row only when its depth [m], head [m]
+        or any of its exchange, approach and bypass Q [m^3/s] has moved by
+        more than the tolerance since its last kept row. Rows are then held per inlet, so :meth:`column` and
+        :meth:`write_binary` are unavailable.
+    summary_only : bool
+        Keep no rows at all, only the per-inlet :meth:`summary` statistics
+        (O(inlets) memory), for runs too large for per-step logging.
+
+    The cumulative volumes integrate every :meth:`record` call, so every kept
+    row is exact however sparse the log; each inlet's first sample is always
+    kept, and its latest sample ends every view of the log that is read or
+    written out (it is stored, and streamed, only by :meth:`close`).
+    :meth:`summary` is maintained on every call whatever the mode.
     """
 
-    def __init__(self, names):
+    def __init__(self, names, stream_dir=None, prefix="hydrograph_",
+                 flush_every=None, flush_interval=None,
+                 log_every=None, log_interval=None, tolerances=None,
+                 summary_only=False):
         self.names = list(names)
-        self._logs = {n: [] for n in self.names}
-        self._cum = {n: {"inflow": 0.0, "captured": 0.0,
-                         "surcharged": 0.0, "bypassed": 0.0}
-                     for n in self.names}
+        self._index = {n: i for i, n in enumerate(self.names)}
+        n = len(self.names)
+        if summary_only and stream_dir is not None:
+            raise ValueError("summary_only keeps no rows to stream")
+        self.summary_only = summary_only
+        self._t0 = None
+        self._peak = np.zeros((2, n))          # peak captured, peak surcharge
+        self._t_peak = np.full(n, np.nan)      # time of the peak capture
+        self._surcharged = np.zeros(n)         # seconds with a surcharge
+        if tolerances is not None:
+            unknown = set(tolerances) - set(_TOLERANCE_KEYS)
+            if unknown:
+                raise ValueError(f"unknown tolerances {sorted(unknown)}; "
+                                 f"expected any of {_TOLERANCE_KEYS}")
+            self.tolerances = dict(tolerances)
+            # One row per kept (step, inlet) sample: time, inlet index, fields.
+            self._rows = RowStore(len(COLUMNS) + 1, 64)
+            self._ref = np.full((len(_COMPARED), n), np.nan)  # last kept
+            self._tol = np.array([[self.tolerances.get(k, np.inf)] for k in _COMPARED])
+        else:
+            self.tolerances = None
+            self._rows = RowStore(1 + (len(COLUMNS) - 1) * n, 64)
+        self._cum = np.zeros((4, n))   # inflow, captured, surcharged, bypassed
+        self._log = (None if log_every is None and log_interval is None
+                     else LogCadence(log_every, log_interval))
+        self._latest = None              # the last record()'s full row
+        self._pending = np.zeros(n, dtype=bool)  # latest sample not kept yet
+        self.stream_dir = stream_dir
+        self.prefix = prefix
+        if flush_every is None and flush_interval is None:
+            flush_every = 100
+        self._flush = FlushSchedule(flush_every, flush_interval)
+        self._streamed = set()   # names whose stream file has been started
+        if stream_dir is not None:
+            os.makedirs(stream_dir, exist_ok=True)
 
     def record(self, time, dt, depths, heads, approach_Q, exchange_Q):
         """Append one row per inlet for a coupling step.
@@ -59,54 +230,275 @@ class HydrographLogger:
         approach_Q = np.asarray(approach_Q, dtype=float)
         exchange_Q = np.asarray(exchange_Q, dtype=float)
 
-        for i, name in enumerate(self.names):
-            q = float(exchange_Q[i])
-            captured = max(0.0, q)
-            surcharge = max(0.0, -q)
-            approach = float(approach_Q[i])
-            bypass = max(0.0, approach - captured)
-
-            c = self._cum[name]
-            c["inflow"] += approach * dt
-            c["captured"] += captured * dt
-            c["surcharged"] += surcharge * dt
-            c["bypassed"] += bypass * dt
-
-            self._logs[name].append({
-                "Time_s": float(time),
-                "Depth_m": float(depths[i]),
-                "Head1D_m": float(heads[i]),
-                "Approach_Q_cms": approach,
-                "Captured_Q_cms": captured,
-                "Surcharge_Q_cms": surcharge,
-                "Bypass_Q_cms": bypass,
-                "Cum_Inflow_m3": c["inflow"],
-                "Cum_Captured_m3": c["captured"],
-                "Cum_Surcharged_m3": c["surcharged"],
-                "Cum_Bypassed_m3": c["bypassed"],
-            })
+        captured = np.maximum(exchange_Q, 0.0)
+        surcharge = np.maximum(-exchange_Q, 0.0)
+        bypass = np.maximum(approach_Q - captured, 0.0)
+        flows = np.stack([approach_Q, captured, surcharge, bypass])
+        self._cum += flows * dt
+
+        time = float(time)
+        if self._t0 is None:
+            self._t0 = time
+        higher = captured > self._peak[0]
+        self._t_peak[higher] = time
+        np.maximum(self._peak, flows[1:3], out=self._peak)
+        self._surcharged += np.where(surcharge > 0.0, dt, 0.0)
+        if self.summary_only:
+            return
+
+        row = np.concatenate(
+            [[time], depths, heads, flows.ravel(), self._cum.ravel()])
+        self._latest = row
+        self._pending[:] = True
+        if self._log is None or self._log.due(time):
+            if self.tolerances is None:
+                self._keep(row, None)
+            else:
+                moved = np.abs(np.stack([depths, heads, exchange_Q, approach_Q, bypass])
+                               - self._ref)
+                changed = (~(moved <= self._tol)).any(axis=0)  # a NaN ref: first sample
+                self._keep(row, changed)
+
+        if self.stream_dir is not None and self._flush.tick():
+            self.flush()
+
+    def summary(self):
+        """One row per inlet of run statistics (``SUMMARY_COLUMNS``): peak
+        captured Q and its time from the first record, peak surcharge Q, total
+        captured and bypassed volume, and hours with a surcharge."""
+        return pd.DataFrame({
+            "Asset_ID": self.names,
+            "Peak_Captured_Q_cms": self._peak[0],
+            "Time_to_Peak_s": self._t_peak - (self._t0 if self._t0 is not None else 0.0),
+            "Peak_Surcharge_Q_cms": self._peak[1],
+            "Total_Captured_m3": self._cum[1],
+            "Total_Bypassed_m3": self._cum[3],
+            "Hours_Surcharged": self._surcharged / 3600.0,
+        }, columns=SUMMARY_COLUMNS)
+
+    def write_summary(self, path):
+        """Write :meth:`summary` as one CSV; returns ``path``."""
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self.summary().to_csv(path, index=False)
+        return path
+
+    def _check_rows(self):
+        if self.summary_only:
+            raise ValueError("summary_only keeps no rows; use summary()")
+
+    def _keep(self, row, which):
+        """Store ``row`` -- for the inlets in the bool mask ``which`` when
+        compressing (None: all)."""
+        if self.tolerances is None:
+            self._rows.append(row)
+            self._pending[:] = False
+            return
+        n = len(self.names)
+        idx = np.arange(n) if which is None else np.flatnonzero(which)
+        if not idx.size:
+            return
+        values = row[1:].reshape(len(COLUMNS) - 1, n)[:, idx]
+        self._rows.extend(np.column_stack(
+            [np.full(idx.size, row[0]), idx, values.T]))
+        # depth, head, exchange Q (= captured - surcharge), approach and
+        # bypass Q of the kept samples
+        self._ref[:, idx] = [values[0], values[1], values[3] - values[4],
+                             values[2], values[5]]
+        self._pending[idx] = False
+
+    def _latest_rows(self):
+        """Each inlet's latest sample that the cadence skipped, as rows of the
+        store (none if all were kept)."""
+        if self._latest is None or not self._pending.any():
+            return self._rows.data[:0]
+        if self.tolerances is None:
+            return self._latest[None]
+        n = len(self.names)
+        idx = np.flatnonzero(self._pending)
+        values = self._latest[1:].reshape(len(COLUMNS) - 1, n)[:, idx]
+        return np.column_stack([np.full(idx.size, self._latest[0]), idx, values.T])
+
+    def _data(self):
+        """The stored rows followed by :meth:`_latest_rows`, so the log ends on
+        each inlet's latest sample (exact final cumulative volumes) without
+        storing it out of cadence."""
+        latest = self._latest_rows()
+        if not len(latest):
+            return self._rows.data
+        return np.concatenate([self._rows.data, latest])
+
+    def _samples(self, i=None, data=None):
+        """``(rows, len(COLUMNS))`` sample array of inlet ``i`` -- or, for
+        ``i=None``, the list of them for every inlet -- of ``data`` (default:
+        :meth:`_data`)."""
+        data = self._data() if data is None else data
+        n = len(self.names)
+        fields = [0] + list(range(2, len(COLUMNS) + 1))
+        if self.tolerances is None:
+            if i is not None:
+                return data[:, _dense_columns(n, i)]
+            return [data[:, _dense_columns(n, k)] for k in range(n)]
+        if i is not None:
+            return data[data[:, 1] == i][:, fields]
+        inlet = data[:, 1].astype(int)
+        order = np.argsort(inlet, kind="stable")
+        counts = np.bincount(inlet, minlength=n)
+        return np.split(data[order][:, fields], np.cumsum(counts)[:-1])
+
+    def column(self, field):
+        """The buffered rows of ``field`` (one of ``COLUMNS``), ending on the
+        latest sample, as a ``(steps, inlets)`` array -- ``(steps,)`` for
+        ``Time_s``; a view when the latest sample is already stored."""
+        self._check_rows()
+        if self.tolerances is not None:
+            raise ValueError("column() needs the full table; with tolerances "
+                             "rows are kept per inlet (use to_dataframe)")
+        return _field_block(self._data(), len(self.names), field)
+
+    def _stream_path(self, name):
+        return os.path.join(self.stream_dir, f"{self.prefix}{name}.csv")
+
+    def flush(self):
+        """Append the buffered rows to the stream files and drop them from
+        memory (no-op without ``stream_dir``)."""
+        if self.stream_dir is None:
+            return
+        if len(self._rows):
+            for name, rows in zip(self.names, self._samples(data=self._rows.data)):
+                if not len(rows):
+                    continue
+                started = name in self._streamed
+                _samples_frame(name, rows).to_csv(
+                    self._stream_path(name), mode="a" if started else "w",
+                    header=not started, index=False)
+                self._streamed.add(name)
+            self._rows.clear()
+        self._flush.reset()
+
+    def close(self):
+        """Store each inlet's latest sample if the cadence skipped it, and flush
+        the buffered rows to the stream files."""
+        if self._latest is not None and self._pending.any():
+            self._keep(self._latest, None if self.tolerances is None else self._pending)
+        self.flush()
 
     def to_dataframe(self, name):
-        """Per-inlet log as a DataFrame with an Asset_ID column prepended."""
-        rows = self._logs.get(name)
-        if not rows:
+        """Per-inlet log as a DataFrame with an Asset_ID column prepended.
+
+        When streaming, this flushes and reads the inlet's file back (plus its
+        latest sample, until :meth:`close` streams that too).
+        """
+        self._check_rows()
+        i = self._index.get(name)
+        if i is None:
             return pd.DataFrame(columns=["Asset_ID"] + COLUMNS)
-        df = pd.DataFrame(rows)
-        df.insert(0, "Asset_ID", name)
-        return df
+        if self.stream_dir is not None:
+            self.flush()
+            if name in self._streamed:
+                df = pd.read_csv(self._stream_path(name), dtype={"Asset_ID": str})
+                latest = self._samples(i, self._latest_rows())
+                if not len(latest):
+                    return df
+                return pd.concat([df, _samples_frame(name, latest)], ignore_index=True)
+        rows = self._samples(i)
+        if not len(rows):
+            return pd.DataFrame(columns=["Asset_ID"] + COLUMNS)
+        return _samples_frame(name, rows)
 
-    def write_csv(self, directory=".", prefix="hydrograph_"):
+    def write_csv(self, directory=".", prefix="hydrograph_", workers=1,
+                  float_format=None, pool="process"):
         """Write one ``<prefix><name>.csv`` per inlet; returns the paths written.
 
-        ``directory`` is created if it does not exist.
+        ``directory`` is created if it does not exist. When streaming into the
+        same files this just flushes them (each inlet's latest sample follows
+        at :meth:`close`).
+
+        ``workers > 1`` (``None``: one per CPU) formats and writes the files
+        concurrently, in chunks of inlets, on a ``pool="process"`` pool (text
+        formatting holds the GIL, so threads barely help) or ``"thread"`` pool.
+        ``float_format`` (e.g. ``"%.6g"``) is passed to ``DataFrame.to_csv``.
         """
+        self._check_rows()
         os.makedirs(directory, exist_ok=True)
-        paths = []
-        for name in self.names:
-            df = self.to_dataframe(name)
+        self.flush()
+        paths = [os.path.join(directory, f"{prefix}{name}.csv") for name in self.names]
+        if self.stream_dir is None and (workers is None or workers > 1):
+            return self._write_csv_parallel(paths, workers, float_format, pool)
+        samples = self._samples() if self.stream_dir is None else None
+        written = []
+        for i, (name, path) in enumerate(zip(self.names, paths)):
+            if (name in self._streamed and os.path.abspath(path)
+                    == os.path.abspath(self._stream_path(name))):
+                written.append(path)
+                continue
+            if samples is None:
+                df = self.to_dataframe(name)
+            elif len(samples[i]):
+                df = _samples_frame(name, samples[i])
+            else:
+                continue
             if df.empty:
                 continue
-            path = os.path.join(directory, f"{prefix}{name}.csv")
-            df.to_csv(path, index=False)
-            paths.append(path)
-        return paths
+            df.to_csv(path, index=False, float_format=float_format)
+            written.append(path)
+        return written
+
+    def _write_csv_parallel(self, paths, workers, float_format, pool):
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        if pool not in ("process", "thread"):
+            raise ValueError(f"pool must be 'process' or 'thread', got {pool!r}")
+        samples = self._samples()
+        keep = [i for i, rows in enumerate(samples) if len(rows)]
+        if not keep:
+            return []
+        workers = workers or os.cpu_count() or 1
+        # A few chunks per worker balances the load; each job gets only its
+        # inlets' samples, not the whole table.
+        chunks = [c for c in np.array_split(np.array(keep), 4 * workers) if c.size]
+        jobs = [([self.names[i] for i in c], [samples[i] for i in c],
+                 [paths[i] for i in c], float_format) for c in chunks]
+        workers = min(workers, len(jobs))
+        if pool == "process":
+            import multiprocessing as mp
+            # a fresh interpreter: a fork of a process running ANUGA (MPI,
+            # OpenMP threads) or SWMM can deadlock on the locks it inherits
+            executor = ProcessPoolExecutor(max_workers=workers,
+                                           mp_context=mp.get_context("spawn"))
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+        with executor as ex:
+            for _ in ex.map(_write_inlet_csvs, *zip(*jobs)):
+                pass
+        return [paths[i] for i in keep]
+
+    def write_binary(self, path):
+        """Write every inlet into one binary file (``.hyd`` by convention) and
+        return its path; read it back with :func:`read_hydrographs`.
+
+        Needs the full table in memory, so not available with ``stream_dir``
+        or ``tolerances``.
+        """
+        self._check_rows()
+        if self.stream_dir is not None:
+            raise ValueError("write_binary needs the rows in memory; "
+                             "stream_dir sends them to CSV instead")
+        if self.tolerances is not None:
+            raise ValueError("write_binary needs the full table; with tolerances "
+                             "rows are kept per inlet (use write_csv)")
+        data = self._data()
+        header = json.dumps({"names": self.names, "fields": COLUMNS,
+                             "dtype": "<f8"}).encode("utf-8")
+        pad = -(len(_MAGIC) + 8 + len(header)) % _ALIGN
+        header += b" " * pad
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            np.ascontiguousarray(data, dtype="<f8").tofile(f)
+        return path
+
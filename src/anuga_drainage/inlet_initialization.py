@@ -2,6 +2,8 @@ import math
 import numpy as np
 import pandas as pd
 
+from .inp import read_inp_section
+
 # pyswmm and anuga are imported lazily inside initialize_inlets() so that the
 # pure helpers below (read_inp_coordinates, n_sided_inlet) can be imported and
 # unit-tested without a full ANUGA/SWMM install.
@@ -13,20 +15,11 @@ def read_inp_coordinates(inp_path):
     Returns a DataFrame indexed by node id with X_Coord/Y_Coord columns,
     e.g. coords.loc[nodeid].X_Coord. Replaces the former hymo dependency
     (node coordinates are map metadata, not exposed by the pyswmm API).
+    Only [COORDINATES] is tokenised (see ``read_inp_section``).
     """
-    names, xs, ys = [], [], []
-    in_section = False
-    with open(inp_path) as f:
-        for line in f:
-            s = line.strip()
-            if s.startswith('['):
-                in_section = s.upper().startswith('[COORDINATES')
-                continue
-            if not in_section or not s or s.startswith(';'):
-                continue
-            name, x, y = s.split()[:3]
-            names.append(name); xs.append(float(x)); ys.append(float(y))
-    return pd.DataFrame({'X_Coord': xs, 'Y_Coord': ys}, index=names)
+    coords = read_inp_section(inp_path, "COORDINATES")
+    return pd.DataFrame({'X_Coord': coords['x'].to_numpy(), 'Y_Coord': coords['y'].to_numpy()},
+                        index=coords['node'].to_numpy())
 
 def n_sided_inlet(n_sides, area, inlet_coordinate, rotation):
     # Computes the vertex coordinates and side length of a regular polygon with:
@@ -87,3 +80,120 @@ def initialize_inlets(domain, sim, coordinates, n_sides = 6, manhole_areas = [1]
     circumferences   = np.array(circumferences)
 
     return inlet_operators,inlet_elevations,circumferences,vertices
+
+
+def _take_ranges(lo, hi):
+    """Concatenate ``arange(lo[i], hi[i])`` over ``i`` without a Python loop."""
+    lengths = hi - lo
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=int)
+    ends = np.cumsum(lengths)
+    offsets = np.repeat(lo - (ends - lengths), lengths)
+    return np.arange(total) + offsets
+
+
+def _points_in_polygon(points, polygon):
+    """Boolean mask of ``points`` inside ``polygon``, boundary counted as inside
+    (ANUGA's ``inside_polygon(closed=True)`` convention)."""
+    x, y = points[:, 0, None], points[:, 1, None]
+    x0, y0 = polygon[:, 0], polygon[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    # Crossing number on a ray cast towards +x.
+    straddle = (y0 > y) != (y1 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xc = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    inside = np.count_nonzero(straddle & (x < xc), axis=1) % 2 == 1
+    # Points lying on an edge.
+    cross = (x1 - x0) * (y - y0) - (y1 - y0) * (x - x0)
+    tol = 1.0e-12 * ((x1 - x0) ** 2 + (y1 - y0) ** 2)
+    on_edge = ((np.abs(cross) <= tol)
+               & (np.minimum(x0, x1) <= x) & (x <= np.maximum(x0, x1))
+               & (np.minimum(y0, y1) <= y) & (y <= np.maximum(y0, y1)))
+    return inside | on_edge.any(axis=1)
+
+
+def _segment_hits_triangles(triangles, a, b):
+    """Boolean mask of ``triangles`` (``(m, 3, 2)``) touching segment ``a``-``b``.
+
+    Separating-axis test on closed sets: the segment misses a triangle only if
+    the segment's own line, or one of the triangle's edges, strictly separates
+    them.
+    """
+    d = b - a
+    side = d[0] * (triangles[..., 1] - a[1]) - d[1] * (triangles[..., 0] - a[0])
+    hit = ~((side > 0).all(axis=1) | (side < 0).all(axis=1))
+    p, q = triangles, np.roll(triangles, -1, axis=1)
+    e = q - p
+    orient = np.sign(e[:, 0, 0] * e[:, 1, 1] - e[:, 0, 1] * e[:, 1, 0])[:, None]
+
+    def outside(end):
+        return orient * (e[..., 0] * (end[1] - p[..., 1])
+                         - e[..., 1] * (end[0] - p[..., 0])) < 0
+
+    return hit & ~(outside(a) & outside(b)).any(axis=1)
+
+
+def inlet_triangle_indices(centroids, vertex_coordinates, polygons, expand_polygon=True):
+    """Triangle indices inside each of ``polygons``, resolved in one pass.
+
+    Equivalent to building ``anuga.Region(domain, polygon=p,
+    expand_polygon=e).indices`` for every polygon, but the mesh is indexed once
+    (a uniform grid over the triangle bounding boxes) and each polygon then
+    only tests the triangles in the cells it overlaps, instead of scanning the
+    whole mesh. ``centroids`` is ``(N, 2)`` and ``vertex_coordinates`` is
+    ``(3N, 2)`` or ``(N, 3, 2)``, both in absolute coordinates (as returned by
+    ``domain.get_centroid_coordinates(absolute=True)`` and
+    ``domain.get_vertex_coordinates(absolute=True)``). ``expand_polygon`` is a
+    bool or one per polygon; when set, triangles crossed by a polygon edge are
+    added too, so a polygon smaller than a cell still catches one.
+
+    Returns a list of sorted integer index arrays, one per polygon, ready for
+    ``anuga.Region(domain, indices=...)``.
+    """
+    centroids = np.asarray(centroids, dtype=float)
+    tris = np.asarray(vertex_coordinates, dtype=float).reshape(-1, 3, 2)
+    polygons = [np.asarray(p, dtype=float) for p in polygons]
+    expand = np.broadcast_to(np.asarray(expand_polygon, dtype=bool), (len(polygons),))
+    if len(tris) == 0 or not polygons:
+        return [np.empty(0, dtype=int) for _ in polygons]
+
+    # Grid over the triangle bounding boxes; each triangle is listed in every
+    # cell its box overlaps. The cell size tracks the typical triangle, and is
+    # widened if needed so the grid stays no larger than a few cells per triangle.
+    lo, hi = tris.min(axis=1), tris.max(axis=1)
+    origin, top = lo.min(axis=0), hi.max(axis=0)
+    span = np.maximum(top - origin, 1.0e-12)
+    h = max(float(np.median((hi - lo).max(axis=1))), 1.0e-12)
+    h = max(h, math.sqrt(span[0] * span[1] / (4.0 * len(tris))))
+    nx, ny = (np.floor(span / h).astype(int) + 1)
+
+    def cells(xy):
+        c = np.floor((xy - origin) / h).astype(int)
+        return np.clip(c[..., 0], 0, nx - 1), np.clip(c[..., 1], 0, ny - 1)
+
+    ix0, iy0 = cells(lo)
+    ix1, iy1 = cells(hi)
+    wy = iy1 - iy0 + 1
+    count = (ix1 - ix0 + 1) * wy
+    owner = np.repeat(np.arange(len(tris)), count)
+    k = np.arange(int(count.sum())) - np.repeat(np.cumsum(count) - count, count)
+    wy_o = wy[owner]
+    cell = (ix0[owner] + k // wy_o) * ny + iy0[owner] + k % wy_o
+    order = np.argsort(cell, kind='stable')
+    entries = owner[order]
+    starts = np.searchsorted(cell[order], np.arange(nx * ny + 1))
+
+    out = []
+    for poly, exp in zip(polygons, expand):
+        (cx0, cy0), (cx1, cy1) = cells(poly.min(axis=0)), cells(poly.max(axis=0))
+        cols = np.arange(cx0, cx1 + 1) * ny
+        cand = np.unique(entries[_take_ranges(starts[cols + cy0], starts[cols + cy1 + 1])])
+        found = cand[_points_in_polygon(centroids[cand], poly)]
+        if exp:
+            hit = np.zeros(len(cand), dtype=bool)
+            for a, b in zip(poly, np.roll(poly, -1, axis=0)):
+                hit |= _segment_hits_triangles(tris[cand], a, b)
+            found = np.union1d(found, cand[hit])
+        out.append(found.astype(int))
+    return out
@@ -8,9 +8,11 @@ either the SWMM or the pipedream coupling backend (and both then model the
 *same* sewer).
 
 Pure parsing/mapping — no ANUGA or pyswmm needed, so it is unit-testable
-standalone, like ``read_inp_coordinates``.
+standalone, like ``read_inp_coordinates`` (which reads its one section through
+:func:`read_inp_section`).
 """
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
+from functools import cached_property
 
 import numpy as np
 import pandas as pd
@@ -24,15 +26,62 @@ _SECTION_COLUMNS = {
                     "in_offset", "out_offset", "init_flow", "max_flow"],
     "XSECTIONS":   ["link", "shape", "geom1", "geom2", "geom3", "geom4", "barrels", "culvert"],
     "COORDINATES": ["node", "x", "y"],
+    # The shape's parameters shift with the shape (three numbers for
+    # FUNCTIONAL, one curve name for TABULAR), so they are kept positionally.
+    "STORAGE":     ["name", "elevation", "max_depth", "init_depth", "shape",
+                    "p1", "p2", "p3", "p4", "p5", "p6", "p7", "p8"],
+    "ORIFICES":    ["name", "from_node", "to_node", "type", "offset", "discharge_coeff",
+                    "gated", "close_time"],
+    "WEIRS":       ["name", "from_node", "to_node", "type", "crest_height",
+                    "discharge_coeff", "gated", "end_contractions", "end_coeff",
+                    "surcharge", "road_width", "road_surface", "coeff_curve"],
+    "PUMPS":       ["name", "from_node", "to_node", "curve", "status", "startup",
+                    "shutoff"],
+    # The divider type's parameters (none to three) come before the depths.
+    "DIVIDERS":    ["name", "elevation", "diverted_link", "type",
+                    "p1", "p2", "p3", "p4", "p5", "p6", "p7"],
+    # Coefficient and exponent for a FUNCTIONAL rating, a curve name for a
+    # TABULAR one; then the flap gate. Kept positionally like STORAGE's.
+    "OUTLETS":     ["name", "from_node", "to_node", "offset", "type", "p1", "p2", "p3"],
+    # Only a curve's first row names its type; read_inp fills it in on all.
+    "CURVES":      ["name", "type", "x", "y"],
 }
+# How the sections are read when that differs from the table: a [CURVES] line
+# may hold several x-y pairs, so its fields after the name are kept whole
+# and split into one row per pair by read_inp.
+_READ_COLUMNS = {**_SECTION_COLUMNS, "CURVES": ["name", "points"]}
+# Sections whose last read column takes the rest of the line.
+_REMAINDER = {"CURVES"}
 _NUMERIC = {
     "JUNCTIONS":   ["elevation", "max_depth", "init_depth", "sur_depth", "aponded"],
     "OUTFALLS":    ["elevation"],
     "CONDUITS":    ["length", "roughness", "in_offset", "out_offset", "init_flow", "max_flow"],
     "XSECTIONS":   ["geom1", "geom2", "geom3", "geom4", "barrels"],
     "COORDINATES": ["x", "y"],
+    "STORAGE":     ["elevation", "max_depth", "init_depth"],
+    "ORIFICES":    ["offset", "discharge_coeff", "close_time"],
+    "WEIRS":       ["crest_height", "discharge_coeff", "end_contractions", "end_coeff",
+                    "road_width"],
+    "PUMPS":       ["startup", "shutoff"],
+    "DIVIDERS":    ["elevation"],
+    "OUTLETS":     ["offset"],
+    "CURVES":      ["x", "y"],
 }
 
+# XSECTION shapes whose Geom1 or Geom2 names another object (a transect, a
+# shape curve, a street section) rather than giving a size; read_inp keeps
+# that column as text for those rows.
+_NAMED_GEOMETRY = {"IRREGULAR": "geom1", "STREET": "geom1", "CUSTOM": "geom2"}
+
+# InpNetwork attribute -> the section it is read from / written to.
+_TABLES = [("junctions", "JUNCTIONS"), ("outfalls", "OUTFALLS"),
+           ("conduits", "CONDUITS"), ("xsections", "XSECTIONS"),
+           ("coordinates", "COORDINATES"), ("storage", "STORAGE"),
+           ("orifices", "ORIFICES"), ("weirs", "WEIRS"), ("pumps", "PUMPS"),
+           ("outlets", "OUTLETS"), ("dividers", "DIVIDERS"), ("curves", "CURVES")]
+# The link tables besides conduits; each row runs from_node -> to_node.
+_STRUCTURES = ["orifices", "weirs", "pumps", "outlets"]
+
 # SWMM XSECTION shape -> pipedream geometry name. Common shapes map 1:1; SWMM
 # shapes with no pipedream equivalent (EGG, HORSESHOE, ...) raise on conversion.
 SHAPE_MAP = {
@@ -60,7 +109,8 @@ def _shape_geometry(swmm_shape, g1, g2, g3, g4):
     Most shapes are positional (height/width), but pipedream parametrises
     triangular/trapezoidal channels by side slope ``m`` while SWMM gives a top
     width / two bank slopes, and pipedream's force_main ``g2`` is a slot ratio,
-    not SWMM's roughness. Returns ``(g1, g2, g3, g4)`` for pipedream.
+    not SWMM's roughness. Returns ``(g1, g2, g3, g4)`` for pipedream; works
+    elementwise when ``g1..g4`` are arrays (one shape, many conduits).
     """
     if swmm_shape == "CIRCULAR":
         return g1, 0.0, 0.0, 0.0                       # diameter
@@ -70,7 +120,9 @@ def _shape_geometry(swmm_shape, g1, g2, g3, g4):
                       "HORIZ_ELLIPSE", "VERT_ELLIPSE", "ELLIPTICAL"):
         return g1, g2, 0.0, 0.0                        # height, width (direct)
     if swmm_shape == "TRIANGULAR":
-        m = g2 / (2.0 * g1) if g1 else 0.0             # SWMM top width -> pipedream slope
+        with np.errstate(divide="ignore", invalid="ignore"):   # SWMM top width -> pipedream slope
+            m = np.where(np.asarray(g1) != 0, np.divide(g2, 2.0 * np.asarray(g1, dtype=float)),
+                         0.0)[()]
         return g1, m, 0.0, 0.0
     if swmm_shape == "TRAPEZOIDAL":
         return g1, g2, (g3 + g4) / 2.0, 0.0            # height, base, mean of the two bank slopes
@@ -80,54 +132,828 @@ def _shape_geometry(swmm_shape, g1, g2, g3, g4):
     raise ValueError(f"SWMM shape {swmm_shape!r} has no pipedream equivalent")
 
 
+def _empty(section):
+    return field(default_factory=lambda: _section_df(
+        {c: [] for c in _SECTION_COLUMNS[section]}, _NUMERIC[section]))
+
+
 @dataclass
 class InpNetwork:
-    """Parsed SWMM ``.inp`` network sections (each a DataFrame)."""
+    """Parsed SWMM ``.inp`` network sections (each a DataFrame).
+
+    ``storage``, ``orifices``, ``weirs``, ``pumps``, ``outlets``, ``dividers``
+    and ``curves`` default to empty tables, so a network built from the first five alone is complete.
+    ``curves`` carries each row's curve ``type``. ``source`` is the ``.inp`` the
+    tables were read from (``None`` for a network built by hand);
+    :func:`skeletonize` looks up the loaded and controlled nodes there.
+    """
     junctions: pd.DataFrame
     outfalls: pd.DataFrame
     conduits: pd.DataFrame
     xsections: pd.DataFrame
     coordinates: pd.DataFrame
+    storage: pd.DataFrame = _empty("STORAGE")
+    orifices: pd.DataFrame = _empty("ORIFICES")
+    weirs: pd.DataFrame = _empty("WEIRS")
+    pumps: pd.DataFrame = _empty("PUMPS")
+    outlets: pd.DataFrame = _empty("OUTLETS")
+    dividers: pd.DataFrame = _empty("DIVIDERS")
+    curves: pd.DataFrame = _empty("CURVES")
+    source: str = None
+
+    @cached_property
+    def graph(self):
+        """The conduit topology as a :class:`NetworkGraph`, built on first use.
+
+        It is not rebuilt if the tables are edited in place afterwards; make a
+        new ``InpNetwork`` (e.g. via :func:`subset_network`) instead.
+        """
+        return NetworkGraph(self)
+
+
+class NetworkGraph:
+    """CSR adjacency over the links of an :class:`InpNetwork`.
+
+    Nodes are the junctions, then the outfalls, then the storage units, then
+    the flow dividers, numbered ``0..n-1`` in that order (for a network without
+    dividers, the pipedream superjunction order;
+    ``names[i]`` / ``index[name]`` convert). Each conduit, orifice, weir, pump
+    and outlet whose two ends are nodes is an edge directed ``from_node -> to_node``;
+    the conduits come first, and ``kinds[e]`` / ``links[e]`` give the table and
+    row of edge ``e``. The queries take and return node ids and run in time
+    linear in the part of the network they touch.
+    """
+
+    def __init__(self, inp):
+        self.names = np.concatenate([inp.junctions["name"].to_numpy(dtype=object),
+                                     inp.outfalls["name"].to_numpy(dtype=object),
+                                     inp.storage["name"].to_numpy(dtype=object),
+                                     inp.dividers["name"].to_numpy(dtype=object)])
+        self.n_junctions = len(inp.junctions)
+        self.n_outfalls = len(inp.outfalls)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        links, kinds, src, dst = [], [], [], []
+        for kind in ["conduits"] + _STRUCTURES:
+            table = getattr(inp, kind)
+            u = table["from_node"].map(self.index)
+            v = table["to_node"].map(self.index)
+            ok = (u.notna() & v.notna()).to_numpy()
+            links.append(np.flatnonzero(ok))
+            kinds.append(np.full(ok.sum(), kind, dtype=object))
+            src.append(u[ok].to_numpy(dtype=np.int64))
+            dst.append(v[ok].to_numpy(dtype=np.int64))
+        self.links = np.concatenate(links)       # row of each edge in its table
+        self.kinds = np.concatenate(kinds)
+        self.src = np.concatenate(src)
+        self.dst = np.concatenate(dst)
+        n = len(self.names)
+        self.down_ptr, self.down_nodes, self.down_edges = _csr(self.src, self.dst, n)
+        self.up_ptr, self.up_nodes, self.up_edges = _csr(self.dst, self.src, n)
+
+    @property
+    def n_nodes(self):
+        return len(self.names)
+
+    @property
+    def outfalls(self):
+        """Node ids of the outfalls."""
+        return np.arange(self.n_junctions, self.n_junctions + self.n_outfalls)
+
+    def downstream(self, node):
+        """Sorted ids of the nodes reachable from ``node`` along the flow
+        direction, including ``node``."""
+        return _reach(self.down_ptr, self.down_nodes, [node], self.n_nodes)
+
+    def upstream(self, node):
+        """Sorted ids of the nodes that drain to ``node``, including ``node``."""
+        return _reach(self.up_ptr, self.up_nodes, [node], self.n_nodes)
+
+    def topological_order(self):
+        """Node ids ordered so every link runs from an earlier to a later node.
+
+        Raises ``ValueError`` if the links form a loop.
+        """
+        indegree = np.bincount(self.dst, minlength=self.n_nodes)
+        ptr, nodes = self.down_ptr.tolist(), self.down_nodes.tolist()
+        order = np.flatnonzero(indegree == 0).tolist()
+        remaining = indegree.tolist()
+        for i in order:                          # grows while iterating (Kahn)
+            for j in nodes[ptr[i]:ptr[i + 1]]:
+                remaining[j] -= 1
+                if remaining[j] == 0:
+                    order.append(j)
+        if len(order) < self.n_nodes:
+            raise ValueError("the links form a loop; no topological order exists")
+        return np.array(order, dtype=np.int64)
 
+    def component_labels(self):
+        """Per-node label of its connected component (flow direction ignored):
+        the smallest node id in that component."""
+        label = np.arange(self.n_nodes)
+        u, v = self.src, self.dst
+        while True:
+            # Hook each edge's larger root under its smaller one, then compress
+            # every path to its root; repeat until no edge spans two roots.
+            lu, lv = label[u], label[v]
+            np.minimum.at(label, np.maximum(lu, lv), np.minimum(lu, lv))
+            while True:
+                parent = label[label]
+                if np.array_equal(parent, label):
+                    break
+                label = parent
+            if np.array_equal(label[u], label[v]):
+                return label
 
-def _read_sections(inp_path):
-    """Return ``{SECTION: [row_tokens, ...]}`` for every ``[SECTION]``."""
-    sections, current = {}, None
+    def components(self):
+        """Connected components as arrays of node ids (ascending), largest
+        first; ties keep the order of their first node."""
+        label = self.component_labels()
+        order = np.argsort(label, kind="stable")
+        starts = np.flatnonzero(np.r_[True, np.diff(label[order]) != 0])
+        groups = np.split(order, starts[1:])
+        return sorted(groups, key=len, reverse=True)
+
+    def catchments(self):
+        """``{outfall id: ids of the nodes draining to it}`` (including the
+        outfall). A node below a flow split belongs to each outfall it reaches."""
+        return {int(o): self.upstream(o) for o in self.outfalls}
+
+
+def _read_sections(inp_path, sections=None):
+    """Stream ``inp_path`` once, tokenising only the requested sections.
+
+    ``sections`` maps ``SECTION -> column names`` (default: the network
+    sections as in ``_READ_COLUMNS``). Returns ``{SECTION: {column: [token,
+    ...]}}`` with every requested section present; rows missing trailing
+    fields are padded with None and extra fields are dropped (kept, unsplit,
+    in the last column for the sections in ``_REMAINDER``). Lines of other
+    sections (often the bulk of the file: ``[VERTICES]``, ``[TAGS]``, ...) are
+    passed over without being split.
+    """
+    sections = _READ_COLUMNS if sections is None else sections
+    out = {name: {c: [] for c in columns} for name, columns in sections.items()}
+    current, nsplit = None, 0   # column lists of the section being read
     with open(inp_path) as f:
         for line in f:
+            if current is None and "[" not in line:
+                continue        # inside a skipped section: no header here
             s = line.strip()
-            if not s or s.startswith(";"):
+            if not s or s[0] == ";":
                 continue
-            if s.startswith("["):
-                current = s.strip("[]").upper()
-                sections.setdefault(current, [])
+            if s[0] == "[":
+                name = s.strip("[]").upper()
+                table = out.get(name)
+                current = list(table.values()) if table is not None else None
+                nsplit = len(current) if current else 0
+                if name in _REMAINDER:
+                    nsplit -= 1
+                continue
+            if current is None:
                 continue
-            if current is not None:
-                sections[current].append(s.split())
-    return sections
+            tokens = s.split(None, nsplit)
+            for col, t in zip(current, tokens):
+                col.append(t)
+            for col in current[len(tokens):]:
+                col.append(None)
+    return out
+
+
+def _to_numeric(tokens):
+    """``tokens`` as a numeric array; missing or non-numeric entries become NaN."""
+    return pd.to_numeric(pd.Series(tokens, dtype=object), errors="coerce").to_numpy()
+
 
+def _section_df(columns, numeric):
+    return pd.DataFrame({c: _to_numeric(v) if c in numeric else pd.Series(v, dtype=object)
+                         for c, v in columns.items()})
 
-def _section_df(rows, columns, numeric):
-    padded = [list(r[:len(columns)]) + [None] * (len(columns) - len(r)) for r in rows]
-    df = pd.DataFrame(padded, columns=columns)
-    for c in numeric:
-        df[c] = pd.to_numeric(df[c], errors="coerce")
-    return df
 
+def read_inp(inp_path, cache=False, cache_dir=None):
+    """Parse the network sections of a SWMM ``.inp`` into an :class:`InpNetwork`.
 
-def read_inp(inp_path):
-    """Parse the network sections of a SWMM ``.inp`` into an :class:`InpNetwork`."""
+    With ``cache=True`` the parsed tables are also stored as arrays (no
+    pickle) under ``cache_dir`` (default: a per-user directory, see
+    :func:`anuga_drainage.cache.default_cache_dir`), and later calls load them
+    instead of re-parsing while the file is unchanged: a matching size and
+    mtime is trusted as is, and otherwise the content hash decides.
+    """
+    if cache:
+        return _cached_read_inp(inp_path, cache_dir)
     sec = _read_sections(inp_path)
-    return InpNetwork(**{
-        attr: _section_df(sec.get(name, []), _SECTION_COLUMNS[name], _NUMERIC[name])
-        for attr, name in [("junctions", "JUNCTIONS"), ("outfalls", "OUTFALLS"),
-                           ("conduits", "CONDUITS"), ("xsections", "XSECTIONS"),
-                           ("coordinates", "COORDINATES")]
-    })
+    return InpNetwork(**{attr: _table(name, sec[name]) for attr, name in _TABLES},
+                      source=inp_path)
+
+
+def read_inp_section(inp_path, section):
+    """One network section of ``inp_path`` (``"COORDINATES"``, ``"CONDUITS"``,
+    ...) as the DataFrame :func:`read_inp` would give for it.
+
+    Only that section is tokenised, so this is the cheaper call when a caller
+    needs just one table of a large file.
+    """
+    name = section.upper()
+    if name not in _READ_COLUMNS:
+        raise ValueError(f"{section!r} is not one of the network sections "
+                         f"({', '.join(_READ_COLUMNS)})")
+    return _table(name, _read_sections(inp_path, {name: _READ_COLUMNS[name]})[name])
+
+
+def _table(name, columns):
+    """The table of section ``name`` from its read columns."""
+    if name == "CURVES":
+        return _curve_rows(columns)
+    df = _section_df(columns, _NUMERIC[name])
+    return _named_geometry(df, columns) if name == "XSECTIONS" else df
+
 
+def _named_geometry(xsections, tokens):
+    """Put back the object names that some shapes give in place of a size
+    (see ``_NAMED_GEOMETRY``), which the numeric parse turned into NaN."""
+    shape = xsections["shape"].astype(str).str.upper().to_numpy()
+    if not np.isin(shape, list(_NAMED_GEOMETRY)).any():
+        return xsections
+    xsections = xsections.astype({c: object for c in ("geom1", "geom2")})
+    for name, column in _NAMED_GEOMETRY.items():
+        rows = shape == name
+        xsections.loc[rows, column] = np.asarray(tokens[column], dtype=object)[rows]
+    return xsections
+
+
+def _curve_rows(columns):
+    """The ``[CURVES]`` table, one row per x-y pair, from its read columns.
+
+    A line holds an optional type keyword (on a curve's first line only) and
+    one or more x-y pairs; every row gets its curve's type.
+    """
+    names, xs, ys = [], [], []
+    types = {}
+    for name, points in zip(columns["name"], columns["points"]):
+        tokens = (points or "").partition(";")[0].split()
+        if tokens and np.isnan(_to_numeric(tokens[:1])[0]):
+            types[name], tokens = tokens[0], tokens[1:]
+        pairs = len(tokens) // 2
+        names += [name] * pairs
+        xs += tokens[0:2 * pairs:2]
+        ys += tokens[1:2 * pairs:2]
+    return _section_df({"name": names, "type": [types.get(n) for n in names],
+                        "x": xs, "y": ys}, _NUMERIC["CURVES"])
+
+
+def _cached_read_inp(inp_path, cache_dir):
+    """:func:`read_inp` through a per-file array cache.
+
+    The ``.npz`` holds a small stamp (size, mtime, SHA-256 and the parser's
+    table layout) next to the tables, so a stale entry is detected without
+    reading them. Nothing is unpickled (see :mod:`anuga_drainage.cache`).
+    """
+    import os
+    from .cache import file_digest, digest, cache_path, load_arrays, save_arrays
+
+    names = [attr for attr, _ in _TABLES]
+    layout = digest(names, _READ_COLUMNS, _NUMERIC)
+    path = cache_path(cache_dir, "inp", digest(os.path.realpath(inp_path)), ".npz")
+    st = os.stat(inp_path)
+    stamp = None
+    if os.path.exists(path):
+        stamp = load_arrays(path, key="stamp")
+        if stamp["layout"] == layout and stamp["size"] == st.st_size:
+            if stamp["mtime_ns"] == st.st_mtime_ns:
+                return InpNetwork(**load_arrays(path, key="tables"), source=inp_path)
+        else:
+            stamp = None
+    sha = file_digest(inp_path)
+    if stamp is not None and stamp["sha256"] == sha:
+        # touched but unchanged
+        network = InpNetwork(**load_arrays(path, key="tables"), source=inp_path)
+    else:
+        network = read_inp(inp_path)
+    save_arrays(path, {"stamp": {"layout": layout, "size": st.st_size,
+                                 "mtime_ns": st.st_mtime_ns, "sha256": sha},
+                       "tables": {n: getattr(network, n) for n in names}})
+    return network
+
+
+def _csr(rows, cols, n):
+    """CSR of the edges ``rows[k] -> cols[k]`` over ``n`` nodes.
+
+    Returns ``(indptr, neighbours, edge ids)``; node ``i``'s neighbours are
+    ``neighbours[indptr[i]:indptr[i + 1]]``, in edge order.
+    """
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr, cols[order], order
+
+
+def _reach(indptr, neighbours, start, n):
+    """Sorted ids of the nodes reachable from ``start`` through a CSR."""
+    ptr, nbr = indptr.tolist(), neighbours.tolist()
+    seen = bytearray(n)
+    stack = list(start)
+    for i in stack:
+        seen[i] = 1
+    while stack:
+        i = stack.pop()
+        for j in nbr[ptr[i]:ptr[i + 1]]:
+            if not seen[j]:
+                seen[j] = 1
+                stack.append(j)
+    return np.flatnonzero(np.frombuffer(seen, dtype=np.uint8))
+
+
+def network_components(inp, joined=()):
+    """Split the network into its connected components (one per outfall catchment).
+
+    Returns a list of node-name lists (junctions, outfalls, storage units and
+    flow dividers), largest first. Connectivity is through the conduits,
+    orifices, weirs, pumps and outlets, regardless of flow direction; a node no
+    link touches is a component of its own.
+
+    ``joined`` is a sequence of node/link name collections whose components
+    are merged into one, e.g. :func:`control_rule_elements`, so no ``[CONTROLS]``
+    rule spans two components. Names not in the network are ignored.
+    """
+    g = inp.graph
+    groups = g.components()
+    if not len(joined):
+        return [list(g.names[ids]) for ids in groups]
+    comp = np.empty(g.n_nodes, dtype=np.int64)
+    for k, ids in enumerate(groups):
+        comp[ids] = k
+    where = {name: comp[i] for name, i in g.index.items()}
+    for kind in ["conduits"] + _STRUCTURES:
+        table = getattr(inp, kind)
+        where.update((name, comp[g.index[node]]) for name, node
+                     in zip(table["name"], table["from_node"]) if node in g.index)
+    root = list(range(len(groups)))
+
+    def find(k):
+        while root[k] != k:
+            root[k] = k = root[root[k]]
+        return k
+
+    for names in joined:
+        ks = sorted({find(where[n]) for n in names if n in where})
+        for k in ks[1:]:
+            root[k] = ks[0]
+    merged = {}
+    for k, ids in enumerate(groups):
+        merged.setdefault(find(k), []).append(ids)
+    merged = [np.sort(np.concatenate(parts)) for parts in merged.values()]
+    return [list(g.names[ids]) for ids in sorted(merged, key=len, reverse=True)]
+
+
+def subset_network(inp, nodes):
+    """Return the :class:`InpNetwork` restricted to ``nodes``.
+
+    Keeps the junctions, outfalls, storage units, dividers and coordinates of
+    ``nodes``, plus every conduit, orifice, weir, pump and outlet (and its
+    cross-section) with both ends in ``nodes``; the curves are kept whole. Row
+    order is preserved, so junction order within the subset follows the source
+    ``.inp``.
+    """
+    keep = set(nodes)
+    links = {kind: getattr(inp, kind) for kind in ["conduits"] + _STRUCTURES}
+    links = {kind: t[t["from_node"].isin(keep) & t["to_node"].isin(keep)]
+                     .reset_index(drop=True) for kind, t in links.items()}
+    names = set().union(*(t["name"] for t in links.values()))
+    return InpNetwork(
+        junctions=inp.junctions[inp.junctions["name"].isin(keep)].reset_index(drop=True),
+        outfalls=inp.outfalls[inp.outfalls["name"].isin(keep)].reset_index(drop=True),
+        xsections=inp.xsections[inp.xsections["link"].isin(names)].reset_index(drop=True),
+        coordinates=inp.coordinates[inp.coordinates["node"].isin(keep)]
+                    .reset_index(drop=True),
+        storage=inp.storage[inp.storage["name"].isin(keep)].reset_index(drop=True),
+        dividers=inp.dividers[inp.dividers["name"].isin(keep)].reset_index(drop=True),
+        curves=inp.curves,
+        source=inp.source,
+        **links,
+    )
+
+
+def skeletonize(inp, keep=(), stub_length=0.0):
+    """Shrink the network to fewer solver unknowns, returning a new :class:`InpNetwork`.
+
+    Two reductions are applied until neither changes anything:
+
+    - **series merge** — a junction with exactly one conduit in and one out,
+      both of the same cross-section and meeting at the same invert (equal
+      outlet and inlet offsets, so no drop is lost), is removed and the two
+      conduits become one (named after the upstream one) of the summed length,
+      with the upstream conduit's inlet offset and the downstream one's outlet
+      offset. Its Manning roughness ``n = sqrt(sum(n_i**2 L_i) / sum(L_i))``
+      keeps the full-pipe friction loss of the pair;
+    - **stub removal** — a junction whose only conduit is shorter than
+      ``stub_length`` is dropped together with that conduit (so a chain of short
+      dead-end laterals goes too). ``0`` (default) keeps all stubs.
+
+    Outfalls, storage units, dividers and the junctions named in ``keep`` (pass
+    the ones to be coupled to the surface) are never removed, nor is a junction
+    an orifice, weir, pump or outlet connects to. Neither are the junctions
+    that ``inp.source`` gives ``[INFLOWS]`` or ``[DWF]`` or names in a
+    ``[CONTROLS]`` rule, whose rows :func:`write_inp` would otherwise drop; a
+    network built by hand (no ``source``) has only ``keep`` to protect them.
+
+    Returns ``(reduced, node_map, link_map)``: ``node_map`` sends each original
+    node to the node of ``reduced`` that now receives its flow (itself if
+    kept), ``link_map`` each original conduit to the conduit now carrying it
+    (``None`` if dropped as a stub).
+    """
+    g = inp.graph
+    keep = set(keep)
+    if inp.source is not None:
+        keep |= _referenced_nodes(inp.source)
+    n_j = g.n_junctions
+    conduits = inp.conduits
+    is_conduit = g.kinds == "conduits"
+    rows = conduits.iloc[g.links[is_conduit]]
+    n_other = int((~is_conduit).sum())
+    # Orifices, weirs, pumps and outlets are edges that never merge nor count
+    # as stubs.
+    length = _column(rows, "length").tolist() + [np.inf] * n_other
+    n2l = (_column(rows, "roughness") ** 2 * _column(rows, "length")).tolist()
+    in_offset = _column(rows, "in_offset").tolist() + [np.nan] * n_other
+    out_offset = _column(rows, "out_offset").tolist() + [np.nan] * n_other
+    xs = inp.xsections.drop_duplicates("link").set_index("link")
+    xs = xs.astype(object).where(xs.notna(), None)
+    section = [tuple(r) if ok else None for r, ok in zip(
+        xs.reindex(rows["name"]).itertuples(index=False, name=None),
+        rows["name"].isin(xs.index))] + [None] * n_other
+
+    src, dst = g.src.tolist(), g.dst.tolist()
+    last = list(range(len(src)))                 # last original edge merged into each
+    ins = [set() for _ in range(g.n_nodes)]
+    outs = [set() for _ in range(g.n_nodes)]
+    for e, (a, b) in enumerate(zip(src, dst)):
+        outs[a].add(e)
+        ins[b].add(e)
+    removable = [j < n_j and g.names[j] not in keep for j in range(g.n_nodes)]
+    node_to, edge_to = {}, {}
+
+    changed = True
+    while changed:
+        changed = False
+        if stub_length > 0:
+            queue = [j for j in range(g.n_nodes)
+                     if removable[j] and len(ins[j]) + len(outs[j]) == 1]
+            while queue:
+                j = queue.pop()
+                if not removable[j] or len(ins[j]) + len(outs[j]) != 1:
+                    continue
+                (e,) = ins[j] | outs[j]
+                if length[e] >= stub_length:
+                    continue
+                other = src[e] if dst[e] == j else dst[e]
+                outs[src[e]].discard(e)
+                ins[dst[e]].discard(e)
+                edge_to[e] = None
+                node_to[j] = other
+                removable[j] = False
+                changed = True
+                if removable[other] and len(ins[other]) + len(outs[other]) == 1:
+                    queue.append(other)
+        for j in range(n_j):
+            if not removable[j] or len(ins[j]) != 1 or len(outs[j]) != 1:
+                continue
+            (a,), (b,) = ins[j], outs[j]
+            if src[a] == dst[b] or section[a] is None or section[a] != section[b] \
+                    or out_offset[a] != in_offset[b]:
+                continue
+            ins[dst[b]].discard(b)
+            ins[dst[b]].add(a)
+            dst[a] = dst[b]
+            length[a] += length[b]
+            n2l[a] += n2l[b]
+            out_offset[a] = out_offset[b]
+            last[a] = last[b]
+            ins[j].clear()
+            outs[j].clear()
+            edge_to[b] = a
+            node_to[j] = dst[a]
+            removable[j] = False
+            changed = True
 
-def _f(x, default=0.0):
-    return default if x is None or (isinstance(x, float) and np.isnan(x)) else float(x)
+    def node_target(j):
+        while j in node_to:
+            j = node_to[j]
+        return j
+
+    def edge_target(e):
+        while e is not None and e in edge_to:
+            e = edge_to[e]
+        return e
+
+    alive = [e for e in range(len(rows)) if e not in edge_to]
+    merged = rows.iloc[alive].copy()
+    merged["from_node"] = g.names[[src[e] for e in alive]]
+    merged["to_node"] = g.names[[dst[e] for e in alive]]
+    total = np.array(length)[alive]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n_eq = np.sqrt(np.array(n2l)[alive] / total)
+    merged["roughness"] = np.where(total > 0, n_eq, merged["roughness"])
+    merged["length"] = total
+    merged["out_offset"] = rows["out_offset"].to_numpy()[[last[e] for e in alive]]
+    # Conduits with an unknown end node were never graph edges; keep them as is.
+    untouched = np.setdiff1d(np.arange(len(conduits)), g.links[is_conduit])
+    out_conduits = pd.concat([merged, conduits.iloc[untouched]]).sort_index()
+
+    gone = {g.names[j] for j in node_to}
+    structures = {kind: getattr(inp, kind).reset_index(drop=True) for kind in _STRUCTURES}
+    links = set(out_conduits["name"]).union(*(t["name"] for t in structures.values()))
+    reduced = InpNetwork(
+        junctions=inp.junctions[~inp.junctions["name"].isin(gone)].reset_index(drop=True),
+        outfalls=inp.outfalls.reset_index(drop=True),
+        conduits=out_conduits.reset_index(drop=True),
+        xsections=inp.xsections[inp.xsections["link"].isin(links)].reset_index(drop=True),
+        coordinates=inp.coordinates[~inp.coordinates["node"].isin(gone)]
+                    .reset_index(drop=True),
+        storage=inp.storage.reset_index(drop=True),
+        dividers=inp.dividers.reset_index(drop=True),
+        curves=inp.curves,
+        source=inp.source,
+        **structures,
+    )
+    node_map = {name: g.names[node_target(j)] for j, name in enumerate(g.names)}
+    link_map = {name: name for name in conduits["name"].iloc[untouched]}
+    names = rows["name"].tolist()
+    for e, name in enumerate(names):
+        t = edge_target(e)
+        link_map[name] = None if t is None else names[t]
+    return reduced, node_map, link_map
+
+
+# Sections whose rows are keyed (first token) by a node, a link or a
+# subcatchment name; write_inp drops the rows of elements no longer in the
+# network. Other sections (OPTIONS, CURVES, TIMESERIES, ...) apply network-wide
+# and are copied through unchanged.
+_NODE_SECTIONS = {"JUNCTIONS", "OUTFALLS", "STORAGE", "DIVIDERS", "COORDINATES",
+                  "INFLOWS", "DWF", "RDII", "TREATMENT"}
+_LINK_SECTIONS = {"CONDUITS", "PUMPS", "ORIFICES", "WEIRS", "OUTLETS",
+                  "XSECTIONS", "LOSSES", "VERTICES"}
+_SUBCATCH_SECTIONS = {"SUBAREAS", "INFILTRATION", "POLYGONS", "LID_USAGE",
+                      "COVERAGES", "LOADINGS", "GROUNDWATER", "GWF"}
+
+
+# [CONTROLS] keywords that are followed by the name of a node or link.
+_ELEMENT_KEYWORDS = {"NODE", "JUNCTION", "OUTFALL", "STORAGE", "DIVIDER",
+                     "LINK", "CONDUIT", "PUMP", "ORIFICE", "WEIR", "OUTLET"}
+# [CONTROLS] statements that start a block: a rule, or a named variable or
+# expression that rules (and other expressions) may use.
+_CONTROL_BLOCKS = {"RULE", "VARIABLE", "EXPRESSION"}
+
+
+def _control_blocks(lines):
+    """Split ``[CONTROLS]`` section lines into ``(lines, elements)`` blocks.
+
+    Each block is a rule, variable or expression with the lines (comments
+    included) up to the next one; ``elements`` are the names of the nodes and
+    links it refers to, directly or through the variables and expressions it
+    uses. Lines before the first block form a block that refers to nothing.
+    """
+    blocks, names, tokens = [([], set())], [None], [[]]
+    for line in lines:
+        words = line.split(";", 1)[0].split()
+        if words and words[0].upper() in _CONTROL_BLOCKS:
+            blocks.append(([], set()))
+            names.append(words[1] if len(words) > 1 else None)
+            tokens.append([])
+        blocks[-1][0].append(line)
+        tokens[-1].extend(words)
+    named = {}
+    for (_, elements), words, name in zip(blocks, tokens, names):
+        elements.update(b for a, b in zip(words, words[1:])
+                        if a.upper() in _ELEMENT_KEYWORDS)
+        if name is not None:
+            named[name] = elements
+    changed = True
+    while changed:                          # expressions of variables, rules of both
+        changed = False
+        for (_, elements), words, name in zip(blocks, tokens, names):
+            for w in words:
+                if w in named and w != name and not named[w] <= elements:
+                    elements.update(named[w])
+                    changed = True
+    return blocks
+
+
+def control_rule_elements(inp_path):
+    """The node and link names each ``[CONTROLS]`` rule of ``inp_path`` refers
+    to, as a list of sets (one per rule, in file order)."""
+    lines, section = [], None
+    with open(inp_path) as f:
+        for line in f:
+            s = line.strip()
+            if s.startswith("["):
+                section = s.strip("[]").upper()
+            elif section == "CONTROLS":
+                lines.append(line)
+    return [elements for block, elements in _control_blocks(lines)[1:]
+            if block[0].split()[0].upper() == "RULE"]
+
+
+def _referenced_nodes(inp_path):
+    """Names of the nodes ``inp_path`` gives ``[INFLOWS]`` or ``[DWF]``, and of
+    the nodes and links its ``[CONTROLS]`` rules refer to."""
+    sec = _read_sections(inp_path, {"INFLOWS": ["node"], "DWF": ["node"]})
+    return set(sec["INFLOWS"]["node"]).union(sec["DWF"]["node"],
+                                             *control_rule_elements(inp_path))
+
+
+def _filter_names(line, names, listing):
+    """``line`` of ``[REPORT]`` (``listing``: a keyword then element names) or
+    ``[TAGS]`` (a keyword, one element name, its tag) restricted to the
+    elements in ``names``; ``None`` when nothing of it is left."""
+    body, _, comment = line.partition(";")
+    tokens = body.split()
+    if not listing:
+        return line if len(tokens) > 1 and tokens[1] in names else None
+    if len(tokens) < 2 or tokens[1].upper() in ("ALL", "NONE"):
+        return line
+    kept = [t for t in tokens[1:] if t in names]
+    if not kept:
+        return None
+    return " ".join([tokens[0]] + kept) + (f" ;{comment}" if comment else "\n")
+
+
+def _table_lines(df, columns):
+    """``.inp`` rows of ``df``'s ``columns``, aligned; trailing missing fields
+    are omitted and inner ones written as ``*``."""
+    if df.empty:
+        return []
+    cols = [df[c] if c in df else pd.Series(None, index=df.index, dtype=object)
+            for c in columns]
+    present = np.column_stack([c.notna().to_numpy() for c in cols])
+    texts = [np.where(ok, c.astype(str), "*") for c, ok in zip(cols, present.T)]
+    pads = [max(len(t) for t in text) for text in texts]
+    used = np.where(present.any(axis=1),
+                    len(columns) - np.argmax(present[:, ::-1], axis=1), 0)
+    return [" ".join(t.ljust(w) for t, w in zip(row[:n], pads)).rstrip() + "\n"
+            for row, n in zip(zip(*texts), used.tolist())]
+
+
+def write_inp(inp, path, source=None):
+    """Write ``inp`` as a SWMM ``.inp`` file.
+
+    The network sections (``[JUNCTIONS]``, ``[OUTFALLS]``, ``[STORAGE]``,
+    ``[DIVIDERS]``, ``[CONDUITS]``, ``[ORIFICES]``, ``[WEIRS]``, ``[PUMPS]``, ``[OUTLETS]``,
+    ``[XSECTIONS]``, ``[CURVES]``, ``[COORDINATES]``) are written from ``inp``'s tables. With
+    ``source`` — the ``.inp`` that ``inp`` was read (and then subset,
+    skeletonized, ...) from — every other section is copied verbatim and in
+    place, comments included, so SWMM runs the result with the source's options,
+    curves and time series. Rows keyed by a node, link or subcatchment no longer
+    in ``inp`` are dropped so the file stays consistent; a subcatchment is kept
+    when it drains to a kept node. The element lists of ``[REPORT]`` and the
+    rows of ``[TAGS]`` are cut down to the kept elements, and a ``[CONTROLS]``
+    rule (or variable or expression) is kept when every node and link it refers
+    to is kept. A table whose section ``source`` lacks is appended if it has
+    rows; an empty one is left out rather than written as a bare header.
+    """
+    tables = {name: _table_lines(getattr(inp, attr), _SECTION_COLUMNS[name])
+              for attr, name in _TABLES if name != "CURVES"}
+    # SWMM reads a curve's type from its first row only (a type on any other
+    # row is an error), so it is blanked on the rest.
+    curves = inp.curves.copy()
+    curves.loc[curves["name"].duplicated(), "type"] = ""
+    tables["CURVES"] = _table_lines(curves, _SECTION_COLUMNS["CURVES"])
+    link_tables = [inp.conduits] + [getattr(inp, kind) for kind in _STRUCTURES]
+    nodes = set().union(*(getattr(inp, kind)["name"]
+                          for kind in ("junctions", "outfalls", "storage", "dividers")))
+    nodes = nodes.union(*(t["from_node"] for t in link_tables),
+                        *(t["to_node"] for t in link_tables))
+    links = set().union(*(t["name"] for t in link_tables))
+    subcatchments = set()
+    written = set()
+    elements = nodes | links
+    controls = []
+
+    def write_controls():
+        for lines, refs in _control_blocks(controls):
+            if refs <= elements:
+                out.writelines(lines)
+        controls.clear()
+
+    with open(path, "w") as out:
+        if source is not None:
+            with open(source) as f:
+                section, keep, pending = None, None, None
+                for line in f:
+                    s = line.strip()
+                    if pending is not None and not s.startswith(";"):
+                        out.writelines(pending)     # after the section's ;; header
+                        pending = None
+                    if section == "CONTROLS" and not s.startswith("["):
+                        controls.append(line)
+                        continue
+                    if s.startswith("["):
+                        write_controls()
+                        section = s.strip("[]").upper()
+                        if section in tables and section not in written:
+                            pending = tables[section]
+                            written.add(section)
+                        keep = (nodes if section in _NODE_SECTIONS
+                                else links if section in _LINK_SECTIONS
+                                else subcatchments if section in _SUBCATCH_SECTIONS
+                                else None)
+                    elif s and not s.startswith(";"):
+                        if section in tables:
+                            continue                # replaced by inp's table
+                        tokens = s.split()
+                        if section == "SUBCATCHMENTS":
+                            if len(tokens) < 3 or tokens[2] not in nodes:
+                                continue
+                            subcatchments.add(tokens[0])
+                        elif section in ("REPORT", "TAGS"):
+                            # [REPORT] NODES/LINKS/SUBCATCHMENTS name lists;
+                            # [TAGS] Node/Link/Subcatch rows.
+                            named = {"NODES": nodes, "LINKS": links,
+                                     "SUBCATCHMENTS": subcatchments, "NODE": nodes,
+                                     "LINK": links, "SUBCATCH": subcatchments,
+                                     }.get(tokens[0].upper())
+                            if named is not None:
+                                line = _filter_names(line, named, section == "REPORT")
+                                if line is None:
+                                    continue
+                        elif keep is not None and tokens[0] not in keep:
+                            continue
+                    out.write(line)
+                write_controls()
+                if pending is not None:
+                    out.writelines(pending)
+        for name, lines in tables.items():
+            if name not in written and lines:
+                out.write(f"[{name}]\n" if out.tell() == 0 else f"\n[{name}]\n")
+                out.writelines(lines)
+
+
+def _column(df, column, default=0.0):
+    """``df[column]`` as floats, with missing values set to ``default``."""
+    return (pd.to_numeric(df[column], errors="coerce").astype(float)
+            .fillna(default).to_numpy())
+
+
+def _shape_columns(shapes, g1, g2, g3, g4):
+    """:func:`_shape_geometry` over all conduits, one call per distinct shape.
+
+    Returns a ``(4, n)`` array of pipedream ``g1..g4``.
+    """
+    out = np.zeros((4, len(shapes)))
+    for shape in pd.unique(shapes):
+        m = shapes == shape
+        for k, v in enumerate(_shape_geometry(shape, g1[m], g2[m], g3[m], g4[m])):
+            out[k, m] = v
+    return out
+
+
+def _node_ids(inp):
+    """``name -> superjunction id`` (junctions, outfalls, then storage units;
+    a repeated name keeps its last id)."""
+    names = pd.concat([inp.junctions["name"], inp.outfalls["name"], inp.storage["name"]],
+                      ignore_index=True)
+    name_to_id = pd.Series(np.arange(len(names)), index=names)
+    return name_to_id[~name_to_id.index.duplicated(keep="last")]
+
+
+def _storage_curves(storage):
+    """pipedream ``(storage, a, b, c, table)`` columns for ``[STORAGE]`` rows."""
+    kind, table = [], []
+    a, b, c = (np.zeros(len(storage)) for _ in range(3))
+    for i, row in enumerate(storage.itertuples(index=False)):
+        shape = str(row.shape).upper()
+        if shape == "TABULAR":
+            kind.append("tabular")
+            table.append(row.p1)
+            continue
+        p = _to_numeric([row.p1, row.p2, row.p3])
+        if shape == "FUNCTIONAL":             # A0 + A1 * d**A2, given as A1 A2 A0
+            a[i], b[i], c[i] = np.nan_to_num(p)
+        elif shape == "CYLINDRICAL":          # elliptical plan: major, minor axis
+            c[i] = np.pi / 4 * p[0] * p[1]
+        else:
+            raise ValueError(f"storage {row.name!r}: SWMM storage shape {shape!r} "
+                             "has no pipedream equivalent")
+        kind.append("functional")
+        table.append(None)
+    return kind, a, b, c, table
+
+
+def _conduit_error(c, xsections, name_to_id):
+    """Raise the conversion error for conduit row ``c`` (which has one)."""
+    link = c["name"]
+    xs = xsections[xsections["link"] == link]
+    if xs.empty:
+        raise ValueError(f"conduit {link!r} has no [XSECTIONS] entry")
+    shape_raw = str(xs["shape"].iloc[0]).upper()
+    if shape_raw not in SHAPE_MAP:
+        raise ValueError(
+            f"conduit {link!r}: SWMM shape {shape_raw!r} has no pipedream equivalent")
+    for end in ("from_node", "to_node"):
+        if c[end] not in name_to_id.index:
+            raise ValueError(
+                f"conduit {link!r}: node {c[end]!r} is not a junction/outfall/storage")
+    try:
+        _shape_geometry(shape_raw, 0.0, 0.0, 0.0, 0.0)
+    except (ValueError, NotImplementedError) as e:
+        raise type(e)(f"conduit {link!r}: {e}") from None
 
 
 def inp_to_pipedream(inp, manhole_area=1.0, pit_area=1.0, h_0=1e-5,
@@ -150,71 +976,344 @@ def inp_to_pipedream(inp, manhole_area=1.0, pit_area=1.0, h_0=1e-5,
     pipe head exceeds the surface). Set ``cap_max_depth=True`` to honour the
     ``.inp`` MaxDepth (and accept the associated loss).
 
-    Outfalls become **boundary** superjunctions (``bc=True``). ``internal_links``
-    is a ``SuperLink()`` constructor kwarg (not a column), so pass it there.
+    Outfalls become **boundary** superjunctions (``bc=True``). ``[STORAGE]``
+    units follow them with their own storage curve: ``FUNCTIONAL`` (SWMM's
+    ``A0 + A1 * d**A2`` is pipedream's ``c + a * h**b``), ``CYLINDRICAL``
+    (constant area) or ``TABULAR`` (``table`` names the curve; see
+    :func:`pipedream_structures` for the ``storages`` it needs).
+    ``[DIVIDERS]`` have no pipedream counterpart and are rejected.
+    ``internal_links`` is a ``SuperLink()`` constructor kwarg (not a column), so
+    pass it there.
     """
-    # Node table: junctions first, then outfalls; each gets a sequential id.
-    nodes = []  # (name, z_inv, h_0, bc, max_depth)
-    for _, r in inp.junctions.iterrows():
-        d = _f(r["init_depth"], h_0) or h_0
-        md = r["max_depth"]
-        md = (float(md) if cap_max_depth and md and not np.isnan(md) and md > 0
-              else np.inf)
-        nodes.append((r["name"], _f(r["elevation"]), d, False, md))
-    for _, r in inp.outfalls.iterrows():
-        nodes.append((r["name"], _f(r["elevation"]), h_0, True, np.inf))
-    name_to_id = {n[0]: i for i, n in enumerate(nodes)}
+    if len(inp.dividers):
+        raise ValueError(f"[DIVIDERS] nodes have no pipedream equivalent: "
+                         f"{list(inp.dividers['name'])}")
+    # Node table: junctions, outfalls, then storage units; sequential ids.
+    junctions, outfalls, storage = inp.junctions, inp.outfalls, inp.storage
+    conduits = inp.conduits
+    n_j, n_o, n_s = len(junctions), len(outfalls), len(storage)
+    n_fixed = n_j + n_o                           # nodes with the manhole storage
+    names = pd.concat([junctions["name"], outfalls["name"], storage["name"]],
+                      ignore_index=True)
+    init = np.concatenate([_column(junctions, "init_depth"), _column(storage, "init_depth")])
+    if cap_max_depth:
+        max_depth = np.concatenate([_column(junctions, "max_depth", np.nan),
+                                    _column(storage, "max_depth", np.nan)])
+        max_depth = np.where(max_depth > 0, max_depth, np.inf)
+    else:
+        max_depth = np.full(n_j + n_s, np.inf)
+    name_to_id = _node_ids(inp)
+    kind, a, b, c, table = _storage_curves(storage)
 
-    coords = inp.coordinates.set_index("node") if len(inp.coordinates) else None
-
-    def xy(name):
-        if coords is not None and name in coords.index:
-            return _f(coords.loc[name, "x"]), _f(coords.loc[name, "y"])
-        return 0.0, 0.0
+    coords = inp.coordinates.drop_duplicates("node").set_index("node")
+    xy = coords.reindex(names)
 
+    h_init = np.where(init != 0, init, h_0)
     superjunctions = pd.DataFrame({
-        "name": [n[0] for n in nodes],
-        "id": list(range(len(nodes))),
-        "z_inv": [n[1] for n in nodes],
-        "h_0": [n[2] for n in nodes],
-        "bc": [n[3] for n in nodes],
-        "storage": ["functional"] * len(nodes),
-        "a": [0.0] * len(nodes),
-        "b": [0.0] * len(nodes),
-        "c": [float(manhole_area)] * len(nodes),
-        "max_depth": [n[4] for n in nodes],
-        "map_x": [xy(n[0])[0] for n in nodes],
-        "map_y": [xy(n[0])[1] for n in nodes],
+        "name": names,
+        "id": np.arange(n_fixed + n_s),
+        "z_inv": np.concatenate([_column(junctions, "elevation"),
+                                 _column(outfalls, "elevation"),
+                                 _column(storage, "elevation")]),
+        "h_0": np.concatenate([h_init[:n_j], np.full(n_o, h_0), h_init[n_j:]]),
+        "bc": np.r_[np.zeros(n_j, dtype=bool), np.ones(n_o, dtype=bool),
+                    np.zeros(n_s, dtype=bool)],
+        "storage": ["functional"] * n_fixed + kind,
+        "a": np.r_[np.zeros(n_fixed), a],
+        "b": np.r_[np.zeros(n_fixed), b],
+        "c": np.r_[np.full(n_fixed, float(manhole_area)), c],
+        "table": pd.Series([None] * n_fixed + table, dtype=object),
+        "max_depth": np.concatenate([max_depth[:n_j], np.full(n_o, np.inf), max_depth[n_j:]]),
+        "map_x": _column(xy, "x"),
+        "map_y": _column(xy, "y"),
     })
 
-    xs = inp.xsections.set_index("link") if len(inp.xsections) else None
-    rows = []
-    for i, (_, c) in enumerate(inp.conduits.iterrows()):
-        link = c["name"]
-        if xs is None or link not in xs.index:
-            raise ValueError(f"conduit {link!r} has no [XSECTIONS] entry")
-        shape_raw = str(xs.loc[link, "shape"]).upper()
-        if shape_raw not in SHAPE_MAP:
-            raise ValueError(
-                f"conduit {link!r}: SWMM shape {shape_raw!r} has no pipedream equivalent")
-        for end in ("from_node", "to_node"):
-            if c[end] not in name_to_id:
-                raise ValueError(f"conduit {link!r}: node {c[end]!r} is not a junction/outfall")
-        try:
-            g1, g2, g3, g4 = _shape_geometry(
-                shape_raw, _f(xs.loc[link, "geom1"]), _f(xs.loc[link, "geom2"]),
-                _f(xs.loc[link, "geom3"]), _f(xs.loc[link, "geom4"]))
-        except (ValueError, NotImplementedError) as e:
-            raise type(e)(f"conduit {link!r}: {e}") from None
-        rows.append({
-            "name": link, "id": i,
-            "sj_0": name_to_id[c["from_node"]], "sj_1": name_to_id[c["to_node"]],
-            "in_offset": _f(c["in_offset"]), "out_offset": _f(c["out_offset"]),
-            "dx": _f(c["length"]), "n": _f(c["roughness"]),
-            "shape": SHAPE_MAP[shape_raw],
-            "g1": g1, "g2": g2, "g3": g3, "g4": g4,
-            "Q_0": _f(c["init_flow"]), "h_0": h_0,
-            "ctrl": False, "A_s": float(pit_area), "A_c": 0.0, "C": 0.0,
-        })
-    superlinks = pd.DataFrame(rows)
+    # Conduits joined to their cross-sections and end-node ids, in .inp order.
+    xs = inp.xsections.drop_duplicates("link").set_index("link").reindex(conduits["name"])
+    shape_raw = xs["shape"].astype(str).str.upper().to_numpy()
+    sj_0 = name_to_id.reindex(conduits["from_node"]).to_numpy()
+    sj_1 = name_to_id.reindex(conduits["to_node"]).to_numpy()
+    bad = (~conduits["name"].isin(inp.xsections["link"]).to_numpy()
+           | ~np.isin(shape_raw, list(SHAPE_MAP)) | (shape_raw == "IRREGULAR")
+           | np.isnan(sj_0) | np.isnan(sj_1))
+    if bad.any():
+        _conduit_error(conduits.iloc[int(np.argmax(bad))], inp.xsections, name_to_id)
+    g = _shape_columns(shape_raw, *(_column(xs, c) for c in ("geom1", "geom2", "geom3", "geom4")))
+    n_c = len(conduits)
+    superlinks = pd.DataFrame({
+        "name": conduits["name"].to_numpy(),
+        "id": np.arange(n_c),
+        "sj_0": sj_0.astype(int), "sj_1": sj_1.astype(int),
+        "in_offset": _column(conduits, "in_offset"),
+        "out_offset": _column(conduits, "out_offset"),
+        "dx": _column(conduits, "length"), "n": _column(conduits, "roughness"),
+        "shape": [SHAPE_MAP[v] for v in shape_raw],
+        "g1": g[0], "g2": g[1], "g3": g[2], "g4": g[3],
+        "Q_0": _column(conduits, "init_flow"), "h_0": np.full(n_c, float(h_0)),
+        "ctrl": np.zeros(n_c, dtype=bool), "A_s": np.full(n_c, float(pit_area)),
+        "A_c": np.zeros(n_c), "C": np.zeros(n_c),
+    })
     return superjunctions, superlinks
+
+
+def pipedream_structures(inp):
+    """pipedream ``SuperLink`` kwargs for the ``.inp``'s orifices, weirs, pumps
+    and tabular storage curves, to pass alongside :func:`inp_to_pipedream`'s
+    tables: ``SuperLink(superlinks, superjunctions, **pipedream_structures(inp))``.
+
+    Only the kinds present are returned (``orifices``, ``weirs``, ``pumps`` as
+    DataFrames, ``storages`` as ``{curve: {"h": depths, "A": areas}}``). Each
+    structure table has a ``u`` column, its initial control setting — ``1``
+    (open), or ``0`` for a pump listed ``OFF`` — which
+    :class:`~anuga_drainage.PipedreamBackend` applies every step, since
+    ``[CONTROLS]`` are not mapped. The mapping:
+
+    - **orifices** — ``CIRCULAR`` or ``RECT_CLOSED`` opening, ``SIDE`` or
+      ``BOTTOM``, with the ``.inp`` offset and discharge coefficient. A circular
+      opening becomes the rectangle of its height and area (pipedream's
+      circular orifice geometry fails while the orifice is closed, as it is
+      during construction);
+    - **weirs** — pipedream's weir is ``Cr L H**1.5 + Ct s H**2.5``:
+      ``TRANSVERSE`` / ``SIDEFLOW`` use the rectangular term (no end
+      contractions), ``V-NOTCH`` the triangular one, ``TRAPEZOIDAL`` both
+      (``EndCoeff`` for the sides, their mean slope); ``ROADWAY`` is rejected;
+    - **pumps** — pipedream's pump curve is ``dH = a - b Q**c``, fitted by least
+      squares to a ``PUMP3`` (head vs flow) curve and applied over its head
+      range; the startup depth is the inlet offset. Other curve types (and
+      ideal pumps) are rejected.
+
+    ``[OUTLETS]`` (rating-curve links) have no pipedream counterpart and are
+    rejected.
+    """
+    if len(inp.outlets):
+        raise ValueError(f"[OUTLETS] links have no pipedream equivalent: "
+                         f"{list(inp.outlets['name'])}")
+    name_to_id = _node_ids(inp)
+    xs = inp.xsections.drop_duplicates("link").set_index("link")
+    out = {}
+    if len(inp.orifices):
+        o = inp.orifices
+        shape, g1, g2 = _structure_xsections("orifice", o, xs,
+                                             ("CIRCULAR", "RECT_CLOSED"))
+        sj_0, sj_1 = _structure_ends("orifice", o, name_to_id)
+        width = np.where(shape == "CIRCULAR", np.pi / 4 * g1, g2)
+        out["orifices"] = pd.DataFrame({
+            "name": o["name"].to_numpy(), "id": np.arange(len(o)),
+            "sj_0": sj_0, "sj_1": sj_1,
+            "orientation": o["type"].astype(str).str.lower().to_numpy(),
+            "C": _column(o, "discharge_coeff"),
+            "A": g1 * width, "y_max": g1, "z_o": _column(o, "offset"),
+            "shape": "rect_closed", "g1": g1, "g2": width,
+            "g3": np.zeros(len(o)), "u": np.ones(len(o)),
+        })
+    if len(inp.weirs):
+        w = inp.weirs
+        weir_type = w["type"].astype(str).str.upper().to_numpy()
+        bad = ~np.isin(weir_type, ["TRANSVERSE", "SIDEFLOW", "V-NOTCH", "TRAPEZOIDAL"])
+        if bad.any():
+            i = int(np.argmax(bad))
+            raise ValueError(f"weir {w['name'].iloc[i]!r}: SWMM weir type "
+                             f"{weir_type[i]!r} has no pipedream equivalent")
+        _, g1, g2 = _structure_xsections("weir", w, xs,
+                                         ("RECT_OPEN", "TRAPEZOIDAL", "TRIANGULAR"))
+        g = xs.reindex(w["name"])
+        side = (_column(g, "geom3") + _column(g, "geom4")) / 2
+        sj_0, sj_1 = _structure_ends("weir", w, name_to_id)
+        notch = weir_type == "V-NOTCH"
+        trapezoid = weir_type == "TRAPEZOIDAL"
+        cd = _column(w, "discharge_coeff")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            notch_slope = np.where(g1 > 0, g2 / (2 * g1), 0.0)
+        out["weirs"] = pd.DataFrame({
+            "name": w["name"].to_numpy(), "id": np.arange(len(w)),
+            "sj_0": sj_0, "sj_1": sj_1,
+            "z_w": _column(w, "crest_height"), "y_max": g1,
+            "Cr": np.where(notch, 0.0, cd),
+            "Ct": np.where(notch, cd, np.where(trapezoid, _column(w, "end_coeff"), 0.0)),
+            "L": np.where(notch, 0.0, g2),
+            "s": np.where(notch, notch_slope, np.where(trapezoid, side, 0.0)),
+            "u": np.ones(len(w)),
+        })
+    if len(inp.pumps):
+        p = inp.pumps
+        sj_0, sj_1 = _structure_ends("pump", p, name_to_id)
+        curves = {name: c for name, c in inp.curves.groupby("name", sort=False)}
+        fits = []
+        for name, curve in zip(p["name"], p["curve"]):
+            c = curves.get(curve)
+            if c is None or str(c["type"].iloc[0]).upper() != "PUMP3":
+                kind = "an ideal pump" if curve in (None, "*") else (
+                    f"curve {curve!r} is not a PUMP3 curve" if c is not None
+                    else f"curve {curve!r} is not in [CURVES]")
+                raise ValueError(f"pump {name!r}: {kind}; pipedream needs a "
+                                 "head-flow (PUMP3) curve")
+            head, flow = c["x"].to_numpy(), c["y"].to_numpy()
+            try:
+                fits.append((*_fit_pump_curve(head, flow), head.min(), head.max()))
+            except ValueError as e:
+                raise ValueError(f"pump {name!r}: {e}") from None
+        a_p, b_p, c_p, dh_min, dh_max = np.array(fits, dtype=float).reshape(-1, 5).T
+        out["pumps"] = pd.DataFrame({
+            "name": p["name"].to_numpy(), "id": np.arange(len(p)),
+            "sj_0": sj_0, "sj_1": sj_1, "z_p": _column(p, "startup"),
+            "a_p": a_p, "b_p": b_p, "c_p": c_p, "dH_min": dh_min, "dH_max": dh_max,
+            "u": np.where(p["status"].astype(str).str.upper() == "OFF", 0.0, 1.0),
+        })
+    tabular = inp.storage.loc[inp.storage["shape"].astype(str).str.upper() == "TABULAR", "p1"]
+    if len(tabular):
+        curves = inp.curves[inp.curves["name"].isin(set(tabular))]
+        missing = set(tabular) - set(curves["name"])
+        if missing:
+            raise ValueError(f"storage curves not in [CURVES]: {sorted(missing)}")
+        out["storages"] = {name: {"h": c["x"].to_numpy(), "A": c["y"].to_numpy()}
+                           for name, c in curves.groupby("name", sort=False)}
+    return out
+
+
+def _structure_ends(kind, table, name_to_id):
+    """Superjunction ids of the ``from_node`` / ``to_node`` of each row."""
+    ends = []
+    for end in ("from_node", "to_node"):
+        ids = name_to_id.reindex(table[end]).to_numpy()
+        bad = np.isnan(ids)
+        if bad.any():
+            i = int(np.argmax(bad))
+            raise ValueError(f"{kind} {table['name'].iloc[i]!r}: node "
+                             f"{table[end].iloc[i]!r} is not a junction/outfall/storage")
+        ends.append(ids.astype(int))
+    return ends
+
+
+def _structure_xsections(kind, table, xs, shapes):
+    """``(shape, geom1, geom2)`` of each row's ``[XSECTIONS]`` entry, which
+    must exist and be one of ``shapes``."""
+    g = xs.reindex(table["name"])
+    shape = g["shape"].astype(str).str.upper().to_numpy()
+    bad = ~table["name"].isin(xs.index).to_numpy() | ~np.isin(shape, shapes)
+    if bad.any():
+        i = int(np.argmax(bad))
+        name = table["name"].iloc[i]
+        if name not in xs.index:
+            raise ValueError(f"{kind} {name!r} has no [XSECTIONS] entry")
+        raise ValueError(f"{kind} {name!r}: shape {shape[i]!r} is not one of {list(shapes)}")
+    return shape, _column(g, "geom1"), _column(g, "geom2")
+
+
+def _fit_pump_curve(head, flow):
+    """Least-squares ``(a, b, c)`` of ``head = a - b * flow**c`` over the points
+    of a head-flow curve. ``c`` is searched over 0.5..4 (2 with fewer than
+    three points, which can't pin it down)."""
+    head, flow = np.asarray(head, dtype=float), np.asarray(flow, dtype=float)
+    if len(head) < 2:
+        raise ValueError("a pump curve needs at least two points")
+    exponents = np.arange(0.5, 4.0001, 0.05) if len(head) > 2 else np.array([2.0])
+    best = None
+    for c in exponents:
+        x = np.column_stack([np.ones_like(flow), -np.maximum(flow, 0.0) ** c])
+        (a, b), *_ = np.linalg.lstsq(x, head, rcond=None)
+        err = float(((x @ (a, b) - head) ** 2).sum())
+        if best is None or err < best[0] - 1e-12:
+            best = (err, a, b, c)
+    _, a, b, c = best
+    if not b > 0:
+        raise ValueError("pump curve head must fall as the flow rises")
+    return float(a), float(b), float(c)
+
+
+def internal_link_counts(superlinks, max_links=20, *, target_dx=None, courant=None,
+                         max_step=None, min_links=2, g=9.81):
+    """Number of internal links for each pipedream superlink.
+
+    One global ``internal_links`` gives a 3 m connector the same 20 sub-links
+    as a 300 m trunk, and the resulting 0.15 m cells then set the stable step
+    for the whole network. Instead, size each conduit from its own length
+    (``superlinks["dx"]``):
+
+    - ``target_dx`` — sub-links no longer than this (m):
+      ``ceil(length / target_dx)``;
+    - ``courant`` with ``max_step`` — sub-links no shorter than a gravity wave
+      travels in ``max_step / courant`` seconds, with the full-depth celerity
+      ``sqrt(g * g1)``: ``floor(courant * length / (celerity * max_step))``.
+
+    Either way the counts are clipped to ``[min_links, max_links]``; a conduit
+    shorter than ``min_links`` such cells still limits the step.
+    """
+    if (target_dx is None) == (courant is None):
+        raise ValueError("give exactly one of target_dx or courant")
+    if not 1 <= min_links <= max_links:
+        raise ValueError(f"need 1 <= min_links <= max_links, got {min_links}, {max_links}")
+    length = superlinks["dx"].to_numpy(dtype=float)
+    if target_dx is not None:
+        if target_dx <= 0:
+            raise ValueError(f"target_dx must be positive, got {target_dx}")
+        n = np.ceil(length / target_dx)
+    else:
+        if courant <= 0 or not max_step or max_step <= 0:
+            raise ValueError("courant needs a positive courant and max_step")
+        celerity = np.sqrt(g * np.maximum(superlinks["g1"].to_numpy(dtype=float), 0.0))
+        with np.errstate(divide="ignore"):
+            n = np.floor(courant * length / (celerity * max_step))
+    return np.clip(np.nan_to_num(n, posinf=max_links), min_links, max_links).astype(int)
+
+
+def pipedream_elements(superjunctions, superlinks, internal_links):
+    """Explicit internal ``(superlinks, links, junctions)`` tables for pipedream.
+
+    ``SuperLink(internal_links=n)`` can only give every superlink the same
+    ``n``; passing these tables (``SuperLink(superlinks, superjunctions,
+    links=links, junctions=junctions)``) gives superlink ``k`` its own
+    ``internal_links[k]`` equal sub-links instead. The layout is the one
+    pipedream generates for fixed elements (inverts interpolated between the
+    superlink ends, including its orientation of each superlink by invert), so
+    a uniform count reproduces pipedream's own tables. The returned superlinks
+    are a copy carrying the ``j_0`` / ``j_1`` end junctions pipedream needs.
+    """
+    n_k = len(superlinks)
+    n = np.broadcast_to(np.asarray(internal_links, dtype=int), (n_k,))
+    if (n < 1).any():
+        raise ValueError("every superlink needs at least one internal link")
+    superlinks = superlinks.copy()
+    z = superjunctions["z_inv"].to_numpy(dtype=float)
+    sj_0 = superlinks["sj_0"].to_numpy(dtype=int)
+    sj_1 = superlinks["sj_1"].to_numpy(dtype=int)
+    in_offset = _column(superlinks, "in_offset")
+    out_offset = _column(superlinks, "out_offset")
+    # pipedream runs each superlink from its higher invert; offsets stay put.
+    flip = z[sj_0] + in_offset < z[sj_1] + out_offset
+    up, down = np.where(flip, sj_1, sj_0), np.where(flip, sj_0, sj_1)
+    length = _column(superlinks, "dx")
+    dx_uk, dx_dk = (_column(superlinks, c) if c in superlinks else 0.0
+                    for c in ("dx_uk", "dx_dk"))
+    slope = (z[down] + out_offset - z[up] - in_offset) / (length + dx_uk + dx_dk)
+    z_0 = z[up] + in_offset + slope * dx_uk
+
+    # Junctions: n + 1 per superlink, equally spaced along it.
+    n_j = n + 1
+    first = np.cumsum(n_j) - n_j
+    last = first + n
+    k_j = np.repeat(np.arange(n_k), n_j)
+    x = (np.arange(n_j.sum()) - first[k_j]) * (length / n)[k_j]
+    x[last] = length                                  # ends exactly, as np.linspace
+    junctions = pd.DataFrame({
+        "A_s": superlinks["A_s"].to_numpy()[k_j],
+        "h_0": superlinks["h_0"].to_numpy()[k_j],
+        "id": np.arange(len(k_j)),
+        "k": k_j,
+        "z_inv": slope[k_j] * x + z_0[k_j],
+    })
+
+    # Links: one between each pair of consecutive junctions of a superlink.
+    k_i = np.repeat(np.arange(n_k), n)
+    j_0 = np.delete(np.arange(len(k_j)), last)
+    links = pd.DataFrame({"id": np.arange(len(k_i)), "k": k_i,
+                          "j_0": j_0, "j_1": j_0 + 1, "dx": x[j_0 + 1] - x[j_0]})
+    for c in ("A_c", "C", "Q_0", "ctrl", "shape", "g1", "g2", "g3", "g4",
+              "g5", "g6", "g7", "friction_method"):
+        if c in superlinks:
+            links[c] = superlinks[c].to_numpy()[k_i]
+    links["roughness"] = superlinks["roughness" if "roughness" in superlinks
+                                    else "n"].to_numpy()[k_i]
+    if "friction_method" not in links:
+        links["friction_method"] = "cm"
+    superlinks["j_0"], superlinks["j_1"] = first, last
+    return superlinks, links, junctions
@@ -1,7 +1,8 @@
 """Tkinter hydrograph viewer for anuga_drainage / Simple_SW_Inlets CSV logs.
 
 Scans a folder for per-inlet hydrograph CSVs (the schema written by
-``HydrographLogger`` -- a superset of the Simple_SW_Inlets columns) and renders,
+``HydrographLogger`` -- a superset of the Simple_SW_Inlets columns), and for its
+binary ``.hyd`` files (listed one entry per inlet), and renders,
 per inlet, four diagnostic subplots; a View menu also shows a folder-combined
 hydrograph. HiDPI-aware (reads ``Xft.dpi``) with live UI / plot font sliders.
 
@@ -18,6 +19,22 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 
+from .hydrograph import BINARY_EXT, read_hydrographs
+
+
+def _read_totals(fp):
+    """``Time_s``/``Captured_Q_cms``/``Bypass_Q_cms`` of a hydrograph file; a
+    binary ``.hyd`` file contributes its inlets already summed (they share the
+    time axis), read straight from the memory map."""
+    if fp.lower().endswith(BINARY_EXT):
+        h = read_hydrographs(fp)
+        return pd.DataFrame({
+            "Time_s": h.column("Time_s"),
+            "Captured_Q_cms": h.column("Captured_Q_cms").sum(axis=1),
+            "Bypass_Q_cms": h.column("Bypass_Q_cms").sum(axis=1),
+        })
+    return pd.read_csv(fp, usecols=["Time_s", "Captured_Q_cms", "Bypass_Q_cms"])
+
 
 def combine_hydrographs(csv_paths):
     """Sum Captured/Bypass across per-inlet hydrograph CSVs onto a common time axis.
@@ -27,7 +44,9 @@ def combine_hydrographs(csv_paths):
     with ``Time_s``, the per-step totals (``Captured_total_cms`` /
     ``Bypass_total_cms`` / ``Combined_total_cms``) and their cumulative volumes
     (``*_cum_m3``); ``skipped`` lists files lacking the required columns.
-    ``combined`` is empty when no file qualifies. Pure (no GUI) -- unit tested.
+    ``combined`` is empty when no file qualifies. A file's flow is held between
+    its own samples and zero outside them. Binary ``.hyd`` files may be
+    mixed in; each adds all of its inlets. Pure (no GUI) -- unit tested.
     """
     cols = ["Time_s", "Captured_total_cms", "Bypass_total_cms", "Combined_total_cms",
             "Captured_cum_m3", "Bypass_cum_m3", "Combined_cum_m3"]
@@ -35,7 +54,7 @@ def combine_hydrographs(csv_paths):
     skipped = []
     for fp in csv_paths:
         try:
-            df = pd.read_csv(fp, usecols=["Time_s", "Captured_Q_cms", "Bypass_Q_cms"])
+            df = _read_totals(fp)
         except (ValueError, OSError):
             skipped.append(os.path.basename(fp))   # missing columns / unreadable
             continue
@@ -50,8 +69,10 @@ def combine_hydrographs(csv_paths):
     merged = merged.sort_values("Time_s").reset_index(drop=True)
     cap_cols = [c for c in merged.columns if c.startswith("Captured__")]
     byp_cols = [c for c in merged.columns if c.startswith("Bypass__")]
-    merged[cap_cols] = merged[cap_cols].fillna(0.0)
-    merged[byp_cols] = merged[byp_cols].fillna(0.0)
+    # Between a file's own samples its flow is held (a change-threshold log
+    # only writes a row when the flow moves); outside its span it is zero.
+    flows = merged[cap_cols + byp_cols]
+    merged[cap_cols + byp_cols] = flows.ffill().where(flows.bfill().notna()).fillna(0.0)
 
     captured = merged[cap_cols].sum(axis=1)
     bypass = merged[byp_cols].sum(axis=1)
@@ -88,6 +109,7 @@ class HydrographViewerApp:
 
         self.selected_dir = tk.StringVar(value=os.getcwd())
         self.csv_files = []
+        self.binary_entries = {}   # listbox label -> (.hyd file, inlet name)
         self.canvas = None
         self.toolbar = None
         self.standby_lbl = None
@@ -460,6 +482,18 @@ class HydrographViewerApp:
         for file in sorted(self.csv_files):
             self.file_listbox.insert(tk.END, file)
 
+        # Binary hydrograph files hold many inlets: one entry per inlet.
+        self.binary_entries = {}
+        for file in sorted(f for f in os.listdir(path) if f.lower().endswith(BINARY_EXT)):
+            try:
+                names = read_hydrographs(os.path.join(path, file)).names
+            except (ValueError, OSError):
+                continue
+            for name in names:
+                label = f"{file} : {name}"
+                self.binary_entries[label] = (file, name)
+                self.file_listbox.insert(tk.END, label)
+
     def process_selected_file(self, event):
         """Validates structure schemas and coordinates plotting updates."""
         selection = self.file_listbox.curselection()
@@ -470,7 +504,12 @@ class HydrographViewerApp:
         full_filepath = os.path.join(self.selected_dir.get(), filename)
 
         try:
-            df = pd.read_csv(full_filepath)
+            if filename in self.binary_entries:
+                file, name = self.binary_entries[filename]
+                hyd = read_hydrographs(os.path.join(self.selected_dir.get(), file))
+                df = hyd.to_dataframe(name)
+            else:
+                df = pd.read_csv(full_filepath)
 
             # Strict verification step checking for data log schema columns
             required_headers = [
@@ -514,7 +553,8 @@ class HydrographViewerApp:
             messagebox.showinfo("No Directory", "Select a valid data directory first.")
             return
 
-        csvs = [os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith('.csv')]
+        csvs = [os.path.join(path, f) for f in os.listdir(path)
+                if f.lower().endswith(('.csv', BINARY_EXT))]
         if not csvs:
             messagebox.showinfo("No CSVs", "No CSV files found in the selected directory.")
             return
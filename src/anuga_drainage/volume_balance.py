@@ -24,11 +24,20 @@ Quantities are read from authoritative accessors: ANUGA's
 including the outfall-return override), ``domain.get_water_volume()`` /
 ``get_boundary_flux_integral()``, and the backend's independent pipe-side
 volumes (``pipe_volume`` / ``coupling_inflow_volume`` / ``outfall_volume``).
+
+The records are held column-wise in one float64 table (see
+:class:`~anuga_drainage.columns.RowStore`); with ``path`` it is a memmap file, so
+a run that dies part-way still leaves its balance history on disk for
+:func:`read_volume_balance`.
 """
+import warnings
 from collections import namedtuple
+from collections.abc import Sequence
 
 import numpy as np
 
+from .columns import FlushSchedule, RowStore, read_rows
+
 VolumeRecord = namedtuple("VolumeRecord", [
     "t", "V_anuga", "V_pipe", "inflow", "boundary",
     "inlets_anuga", "inlets_pipe", "outfall",
@@ -36,6 +45,78 @@ VolumeRecord = namedtuple("VolumeRecord", [
 ])
 
 
+class _Records(Sequence):
+    """Read-only ``VolumeRecord`` view of the balance table, so ``records[-1]``
+    and iteration work as they did on the old list of tuples."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, i):
+        rows = self._store.data
+        if isinstance(i, slice):
+            return [VolumeRecord(*map(float, r)) for r in rows[i]]
+        return VolumeRecord(*map(float, rows[i]))
+
+
+class MassBalanceError(RuntimeError):
+    """Raised by the :class:`VolumeBalance` watchdog when an audit breaches its
+    tolerances. ``snapshot`` holds the diagnostic state at the breach."""
+
+    def __init__(self, message, snapshot):
+        super().__init__(message)
+        self.snapshot = snapshot
+
+
+# Residuals the watchdog can bound.
+_WATCHED = ("R_anuga", "R_pipe", "R_couple", "loss")
+
+
+# Per-inlet breakdown quantities, in the order they sit in each history row
+# (after the time): all cumulative volumes per coupling inlet.
+PER_INLET_FIELDS = ("requested", "accepted", "removed", "outfall_return", "drying")
+
+
+class _PerInlet(Sequence):
+    """Dict-per-row view of the per-inlet history table (rows are views)."""
+
+    def __init__(self, vb):
+        self._vb = vb
+
+    def __len__(self):
+        vb = self._vb
+        if vb.per_inlet_every == 0:
+            return int(vb._inlet_latest is not None)
+        return len(vb._inlet_store)
+
+    def __getitem__(self, i):
+        vb = self._vb
+        if vb.per_inlet_every == 0:
+            if len(self) == 0 or i not in (0, -1):
+                raise IndexError("per_inlet index out of range")
+            return vb._inlet_latest
+        row = vb._inlet_store.data[i]
+        return vb._inlet_row(row)
+
+
+def _records_frame(data):
+    import pandas as pd
+    # copy=False: the frame is a view of the table, not a second copy of it.
+    return pd.DataFrame(data, columns=VolumeRecord._fields, copy=False)
+
+
+def read_volume_balance(path):
+    """Read a :class:`VolumeBalance` ``path`` file back as a DataFrame.
+
+    Works on the file of a run that crashed or was never closed: it holds every
+    step recorded before it stopped.
+    """
+    return _records_frame(read_rows(path, len(VolumeRecord._fields)))
+
+
 class VolumeBalance:
     """Records the coupled-system water budget each step.
 
@@ -46,10 +127,38 @@ class VolumeBalance:
     backend : a Coupler backend (SwmmBackend/PipedreamBackend) exposing
         pipe_volume(), coupling_inflow_volume() and outfall_volume().
     inflow_operators : the upstream-source Inlet_operators feeding the domain.
+    path : optional file to hold the records as a memmap (raw float64 rows, in
+        ``VolumeRecord`` field order); read it back with
+        :func:`read_volume_balance`, even after a crash.
+    flush_every, flush_interval : with ``path``, flush the file to disk after
+        this many records and/or this many seconds of wall-clock time, so other
+        processes (dashboards, :func:`read_volume_balance`) see the run so far.
+    capacity : rows to preallocate (the table doubles when it fills), e.g. the
+        expected number of steps.
+    per_inlet_every : keep every k-th per-inlet breakdown row (default every
+        audit); ``0`` keeps only the latest cumulative values, in O(inlets)
+        memory. The final report uses the latest values either way.
+    every, interval : audit only every ``every`` steps and/or once ``interval``
+        seconds of simulated time have passed since the last audit (default:
+        every step). The volume reads are full-mesh / full-network reductions;
+        the cumulative operator volumes they are compared against are exact
+        whenever they are read, so a sparse audit loses no accuracy.
+    dense_above : audit every step while the last audited ``|loss|`` exceeds
+        this volume [m^3], so a developing leak is resolved in time.
+    tolerances : opt-in watchdog, e.g. ``{"R_couple": 1e-3, "R_pipe": 50.0}``:
+        bounds [m^3] on ``|R_anuga|`` / ``|R_pipe|`` / ``|R_couple|`` / ``|loss|``
+        checked at every audit, together with NaN/inf in the backend heads
+        (``{}`` checks only the heads).
+    on_breach : ``"raise"`` a :class:`MassBalanceError`, or ``"stop"``: warn,
+        keep the snapshot in ``breach`` and let the caller end the run
+        (:meth:`Coupling.step <anuga_drainage.Coupling.step>` then returns None).
     """
 
     def __init__(self, domain, coupling_inlets, backend, inflow_operators=(),
-                 outfall_inlet=None):
+                 outfall_inlet=None, path=None, capacity=1024, per_inlet_every=1,
+                 flush_every=None, flush_interval=None,
+                 every=None, interval=None, dense_above=None,
+                 tolerances=None, on_breach="raise"):
         self.domain = domain
         self.coupling_inlets = list(coupling_inlets)
         self.backend = backend
@@ -63,28 +172,73 @@ class VolumeBalance:
         # evolve loop the domain can be in an unphysical initial state (stage
         # below the bed), so domain.get_water_volume() is meaningless until ANUGA
         # has stepped. All budgets are then measured relative to that first step.
+        if every is not None and every < 1:
+            raise ValueError(f"every must be >= 1, got {every}")
+        if interval is not None and interval <= 0:
+            raise ValueError(f"interval must be > 0, got {interval}")
+        self.every = 1 if every is None and interval is None else every
+        self.interval = interval
+        self.dense_above = dense_above
+        if tolerances is not None:
+            unknown = set(tolerances) - set(_WATCHED)
+            if unknown:
+                raise ValueError(f"unknown tolerances {sorted(unknown)}; "
+                                 f"expected any of {_WATCHED}")
+        if on_breach not in ("raise", "stop"):
+            raise ValueError(f"on_breach must be 'raise' or 'stop', got {on_breach!r}")
+        self.tolerances = None if tolerances is None else dict(tolerances)
+        self.on_breach = on_breach
+        self.breach = None       # the watchdog snapshot once tolerances are breached
+        self._since = 0          # steps since the last audit
+        self._last_t = None      # time of the last audit
+        self._dense = False
         self._base = None
         self.V_anuga0 = None
         self.V_pipe0 = None
-        self.records = []
+        self._store = RowStore(len(VolumeRecord._fields), capacity, path)
+        if path is None and (flush_every is not None or flush_interval is not None):
+            raise ValueError("flush_every/flush_interval need a path")
+        self._flush = FlushSchedule(flush_every, flush_interval)
+        self.records = _Records(self._store)
         # Optional per-inlet breakdown (populated when step() is given the
         # CouplingStep): requested (Q_in*dt) vs accepted (into the sewer) vs
         # removed (actual ANUGA exchange). Localises sewer rejection and the
-        # inlet drying-out you flagged.
+        # inlet drying-out you flagged. Each kept step is one row of a
+        # (steps, 1 + 5*inlets) table: t, then the PER_INLET_FIELDS blocks.
+        if per_inlet_every < 0:
+            raise ValueError(f"per_inlet_every must be >= 0, got {per_inlet_every}")
+        self.per_inlet_every = int(per_inlet_every)
         self._requested = None
         self._inlet_base = None
-        self.per_inlet = []
+        self._inlet_count = 0
+        self._inlet_latest = None
+        n = len(self.coupling_inlets)
+        self._inlet_store = RowStore(1 + len(PER_INLET_FIELDS) * n, 16)
+        self.per_inlet = _PerInlet(self)
 
     @staticmethod
     def _applied(ops):
         return sum(op.get_total_applied_volume() for op in ops)
 
-    def step(self, t, dt=None, coupling_step=None):
-        """Record the budget at time ``t`` and return the VolumeRecord.
+    def step(self, t, dt=None, coupling_step=None, force=False):
+        """Record the budget at time ``t`` and return the VolumeRecord, or None
+        on a step the ``every`` / ``interval`` cadence skips (``force=True``
+        audits regardless, e.g. on the last step).
 
         Pass ``dt`` and the ``CouplingStep`` to also record the per-inlet
         requested/accepted/removed breakdown.
         """
+        if coupling_step is not None and dt is not None:
+            # The requested volume has no cumulative counter elsewhere, so it is
+            # accumulated on every step, audited or not.
+            q = np.asarray(coupling_step.Q_in, dtype=float) * dt
+            self._requested = q if self._requested is None else self._requested + q
+        self._since += 1
+        if not (force or self._due(t)):
+            return None
+        self._since = 0
+        self._last_t = t
+
         V_a = self.domain.get_water_volume()
         V_p = self.backend.pipe_volume()
         inflow = self._applied(self.inflow_operators)
@@ -114,17 +268,53 @@ class VolumeBalance:
         loss = (dV_a + dV_p) - (dI + dB) + (dO - outfall_returned)
 
         if coupling_step is not None:
-            self._record_per_inlet(t, dt, coupling_step, dO)
+            self._record_per_inlet(t, dO)
 
         rec = VolumeRecord(t, V_a, V_p, inflow, boundary, inlets_a, inlets_p,
                            outfall, R_anuga, R_pipe, R_couple, loss)
-        self.records.append(rec)
+        self._store.append(rec)
+        if self._flush.tick():
+            self._store.flush()
+            self._flush.reset()
+        if self.dense_above is not None:
+            self._dense = abs(loss) > self.dense_above
+        if self.tolerances is not None and self.breach is None:
+            self._watch(rec)
         return rec
 
-    def _record_per_inlet(self, t, dt, coupling_step, dO):
-        if dt is not None:
-            q = np.asarray(coupling_step.Q_in, dtype=float) * dt
-            self._requested = q if self._requested is None else self._requested + q
+    def _watch(self, rec):
+        breaches = [(k, getattr(rec, k), tol) for k, tol in self.tolerances.items()
+                    if not abs(getattr(rec, k)) <= tol]   # NaN breaches too
+        heads = np.asarray(self.backend.get_heads(), dtype=float)
+        bad_heads = np.flatnonzero(~np.isfinite(heads))
+        if not breaches and bad_heads.size == 0:
+            return
+        self.breach = {
+            "t": rec.t,
+            "breaches": breaches,                 # (residual, value, tolerance)
+            "nonfinite_heads": bad_heads.tolist(),  # backend head indices
+            "record": rec._asdict(),
+            "heads": heads,
+            "per_inlet": self._inlet_latest,
+        }
+        self._store.flush()
+        parts = [f"|{k}| = {abs(v):.3e} > {tol:.3e}" for k, v, tol in breaches]
+        if bad_heads.size:
+            parts.append(f"{bad_heads.size} non-finite pipe head(s) "
+                         f"(first at index {bad_heads[0]})")
+        message = f"mass balance breached at t = {rec.t:g} s: " + "; ".join(parts)
+        if self.on_breach == "raise":
+            raise MassBalanceError(message, self.breach)
+        warnings.warn(message, RuntimeWarning, stacklevel=3)
+
+    def _due(self, t):
+        if self._base is None or self._dense:
+            return True
+        if self.every is not None and self._since >= self.every:
+            return True
+        return self.interval is not None and t - self._last_t >= self.interval
+
+    def _record_per_inlet(self, t, dO):
         n = len(self.coupling_inlets)
         requested = self._requested if self._requested is not None else np.zeros(n)
         accepted = np.asarray(self.backend.coupling_inflow_volumes(), dtype=float)
@@ -138,18 +328,47 @@ class VolumeBalance:
         outfall_return = np.zeros(n)
         if self.outfall_inlet is not None:
             outfall_return[self.outfall_inlet] = dO
-        self.per_inlet.append({
+        self._inlet_latest = {
             "t": t,
             "requested": req,                 # cumulative Q_in*dt asked of the sewer
             "accepted": acc,                  # cumulative volume the sewer took
             "removed": rem,                   # cumulative ANUGA exchange (incl. outfall)
             "outfall_return": outfall_return, # outfall water dumped back at this inlet
             "drying": acc + rem - outfall_return,  # ~0 = inlet not over-drawn
-        })
+        }
+        every = self.per_inlet_every
+        if every and self._inlet_count % every == 0:
+            self._inlet_store.append(np.concatenate(
+                [[t]] + [self._inlet_latest[k] for k in PER_INLET_FIELDS]))
+        self._inlet_count += 1
+
+    def _inlet_row(self, row):
+        n = len(self.coupling_inlets)
+        p = {"t": float(row[0])}
+        for j, k in enumerate(PER_INLET_FIELDS):
+            p[k] = row[1 + j * n:1 + (j + 1) * n]
+        return p
+
+    def per_inlet_array(self, name):
+        """The kept per-inlet history of ``name`` (``"t"`` or one of
+        ``PER_INLET_FIELDS``) as a ``(rows, inlets)`` view (``(rows,)`` for t)."""
+        data = self._inlet_store.data
+        if name == "t":
+            return data[:, 0]
+        if name not in PER_INLET_FIELDS:
+            raise ValueError(f"unknown per-inlet quantity {name!r}; "
+                             f"expected 't' or one of {PER_INLET_FIELDS}")
+        n = len(self.coupling_inlets)
+        j = PER_INLET_FIELDS.index(name)
+        return data[:, 1 + j * n:1 + (j + 1) * n]
 
     def to_dataframe(self):
-        import pandas as pd
-        return pd.DataFrame(self.records, columns=VolumeRecord._fields)
+        """The records as a DataFrame that views the table (no copy)."""
+        return _records_frame(self._store.data)
+
+    def close(self):
+        """Flush the ``path`` file and trim it to the recorded steps."""
+        self._store.close()
 
     def summary(self):
         """Return a short multi-line report of the final-step budget/residuals."""
@@ -173,9 +392,9 @@ class VolumeBalance:
         ] + self._per_inlet_lines())
 
     def _per_inlet_lines(self):
-        if not self.per_inlet:
+        if self._inlet_latest is None:
             return []
-        p = self.per_inlet[-1]
+        p = self._inlet_latest
         has_outfall = bool(np.any(p["outfall_return"]))
         header = "    i   requested    accepted     removed   reject(req-acc)"
         header += "   outfall      drying" if has_outfall else "       drying"
@@ -0,0 +1,46 @@
+"""Tests for the setup-cache helpers (pickle-free array trees, private dir)."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from anuga_drainage.cache import default_cache_dir, load_arrays, save_arrays
+
+
+def test_save_arrays_round_trips_a_tree(tmp_path):
+    frame = pd.DataFrame({"name": ["C1", None], "n": [0.013, 0.02], "k": [1, 2],
+                          "geom1": pd.Series([0.5, "T1"], dtype=object)})
+    tree = {"H": np.arange(3.0), "shape": pd.Series(["circular"] * 2, name="shape"),
+            "t": np.float64(0.5), "flag": True, "none": None, "frame": frame,
+            "factory": {"circular": np.array([0, 1])}, "pair": (1, "a")}
+    path = tmp_path / "tree.npz"
+    save_arrays(path, tree)
+    back = load_arrays(path)
+    np.testing.assert_array_equal(back["H"], tree["H"])
+    pd.testing.assert_series_equal(back["shape"], tree["shape"])
+    pd.testing.assert_frame_equal(back["frame"], frame)
+    assert (back["t"], back["flag"], back["none"], back["pair"]) == (0.5, True, None, (1, "a"))
+    assert back["factory"]["circular"].tolist() == [0, 1]
+    assert load_arrays(path, key="pair") == (1, "a")       # one entry only
+    with np.load(path, allow_pickle=False) as f:           # nothing needs unpickling
+        assert all(f[k].dtype != object for k in f.files)
+
+
+def test_save_arrays_refuses_objects(tmp_path):
+    with pytest.raises(TypeError, match="without pickling"):
+        save_arrays(tmp_path / "x.npz", {"f": object()})
+    with pytest.raises(TypeError, match="strings, numbers and None"):
+        save_arrays(tmp_path / "x.npz", np.array([b"x", "a"], dtype=object))
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="no user ids")
+def test_default_cache_dir_is_private(tmp_path, monkeypatch):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    path = default_cache_dir()
+    assert os.path.basename(path) == f"anuga_drainage-{os.getuid()}"
+    assert os.stat(path).st_mode & 0o777 == 0o700
+    os.chmod(path, 0o777)                                  # opened up, e.g. planted
+    with pytest.raises(PermissionError, match="not private"):
+        default_cache_dir()
@@ -114,3 +114,272 @@ def test_coupler_smoothing_state_persists_across_steps():
     # With heads/depths constant, smoothing ramps the flux up toward the target,
     # so the second step exceeds the first.
     assert second[0] > first[0]
+
+
+# --- CompositeBackend ---------------------------------------------------------
+
+class _PartBackend(_FakeBackend):
+    """A fake part with volume accounting, for the CompositeBackend tests."""
+
+    def __init__(self, heads, volume):
+        super().__init__(heads)
+        self.volume = volume
+        self.closed = False
+
+    def node_depths(self):
+        return self._heads + 1.0
+
+    def conduit_names(self):
+        return [f"C{h:g}" for h in self._heads]
+
+    def conduit_flows(self):
+        return self._heads * 0.0
+
+    def pipe_volume(self):
+        return self.volume
+
+    def coupling_inflow_volumes(self):
+        return list(self._heads * 10.0)
+
+    def coupling_inflow_volume(self):
+        return float(np.sum(self._heads * 10.0))
+
+    def outfall_volume(self):
+        return self.volume / 2.0
+
+    def close(self):
+        self.closed = True
+
+
+def test_composite_backend_scatters_and_gathers_by_index():
+    from anuga_drainage import CompositeBackend
+    a = _PartBackend(heads=[1.0, 3.0], volume=4.0)    # combined positions 0 and 2
+    b = _PartBackend(heads=[2.0], volume=6.0)         # combined position 1
+    cb = CompositeBackend([(a, [0, 2]), (b, [1])])
+
+    assert cb.get_heads() == pytest.approx([1.0, 2.0, 3.0])
+    assert cb.node_depths() == pytest.approx([2.0, 3.0, 4.0])
+    cb.step(np.array([0.1, 0.2, 0.3]), dt=1.0)
+    assert a.stepped_with == pytest.approx([0.1, 0.3])     # each part gets its slice
+    assert b.stepped_with == pytest.approx([0.2])
+    assert cb.anuga_flux(np.array([0.1, 0.2, 0.3]), 1.0) == pytest.approx([-0.1, -0.2, -0.3])
+    assert cb.pipe_volume() == pytest.approx(10.0)
+    assert cb.outfall_volume() == pytest.approx(5.0)
+    assert cb.coupling_inflow_volumes() == pytest.approx([10.0, 20.0, 30.0])
+    assert cb.conduit_names() == ["C1", "C3", "C2"]
+
+    done = []
+    cb._finalizers.append(lambda: done.append(True))
+    cb.close()
+    assert a.closed and b.closed and done == [True]
+
+
+def test_composite_backend_rejects_incomplete_indices():
+    from anuga_drainage import CompositeBackend
+    a = _PartBackend(heads=[1.0], volume=0.0)
+    with pytest.raises(ValueError, match="cover"):
+        CompositeBackend([(a, [1])])
+
+
+# --- SWMM warm-up hotstart -----------------------------------------------------
+
+_BASEFLOW_INP = """\
+[OPTIONS]
+FLOW_UNITS           CMS
+FLOW_ROUTING         DYNWAVE
+START_DATE           01/01/2021
+START_TIME           00:00:00
+END_DATE             01/01/2021
+END_TIME             02:00:00
+ROUTING_STEP         0:00:01
+
+[JUNCTIONS]
+J1      1.0   1.0   0      0    0
+
+[OUTFALLS]
+O1      0.0   FREE         NO
+
+[CONDUITS]
+C1      J1    O1    20.0   0.013   0   0   0   0
+
+[XSECTIONS]
+C1      CIRCULAR   0.5   0   0   0   1
+
+[INFLOWS]
+J1      FLOW   ""   FLOW   1.0   1.0   0.05
+"""
+
+
+def test_swmm_hotstart_is_cached_and_starts_warm(tmp_path):
+    pyswmm = pytest.importorskip("pyswmm")
+    from anuga_drainage import swmm_hotstart
+
+    inp = tmp_path / "base.inp"
+    inp.write_text(_BASEFLOW_INP)
+    cache = tmp_path / "cache"
+    path = swmm_hotstart(str(inp), 1800, cache_dir=str(cache))
+    mtime = (cache / path.split("/")[-1]).stat().st_mtime_ns
+    assert swmm_hotstart(str(inp), 1800, cache_dir=str(cache)) == path   # reused,
+    assert (cache / path.split("/")[-1]).stat().st_mtime_ns == mtime     # not re-run
+    assert swmm_hotstart(str(inp), 900, cache_dir=str(cache)) != path    # keyed by duration
+    assert swmm_hotstart(str(inp), 1800.3, cache_dir=str(cache)) == path # whole seconds
+
+    with pyswmm.Simulation(str(inp)) as sim:
+        sim.use_hotstart(path)
+        sim.start()
+        link = pyswmm.Links(sim)["C1"]
+        assert link.flow == pytest.approx(0.05, rel=0.05)    # base flow already routed
+
+
+def test_swmm_hotstart_rejects_warmup_beyond_the_run(tmp_path):
+    pytest.importorskip("pyswmm")
+    from anuga_drainage import swmm_hotstart
+
+    inp = tmp_path / "base.inp"
+    inp.write_text(_BASEFLOW_INP)
+    with pytest.raises(ValueError, match="simulation period"):
+        swmm_hotstart(str(inp), 3 * 3600, cache_dir=str(tmp_path))
+    with pytest.raises(ValueError, match="at least 1 s"):
+        swmm_hotstart(str(inp), 0.4, cache_dir=str(tmp_path))
+
+
+# --- PipedreamBackend.initialize_steady (fake SuperLink) -----------------------
+
+class _RelaxingSuperLink:
+    """Minimal SuperLink stand-in whose heads/flows relax toward the inflow."""
+
+    def __init__(self):
+        self.H_j = np.zeros(2)
+        self.Q_ik = np.zeros(3)
+        self._J_uk = np.array([0])
+        self._J_dk = np.array([1])
+        self.t = 0.0
+        self.states = {}
+
+    def step(self, Q_in=None, H_bc=None, dt=None):
+        self.H_j = self.H_j + 0.5 * (10.0 * Q_in - self.H_j)
+        self.Q_ik = self.Q_ik + 0.5 * (Q_in.sum() - self.Q_ik)
+        self.t += dt
+
+    def save_state(self):
+        self.states = {"t": self.t, "H_j": self.H_j.copy(), "Q_ik": self.Q_ik.copy()}
+
+    def load_state(self, states):
+        for k, v in states.items():
+            setattr(self, k, v)
+
+
+def test_initialize_steady_converges_and_round_trips_through_cache(tmp_path):
+    from anuga_drainage import PipedreamBackend
+    cache = str(tmp_path / "steady.npz")
+
+    be = PipedreamBackend(_RelaxingSuperLink(), coupled_indices=[0])
+    n = be.initialize_steady(0.1, dt=60.0, tol=1e-9, cache=cache)
+    assert n > 1
+    assert be.superlink.H_j == pytest.approx([1.0, 0.0])
+    assert be.superlink.Q_ik == pytest.approx([0.1, 0.1, 0.1])
+    assert be.superlink.t == 0.0                         # solver clock reset
+    assert be.coupling_inflow_volume() == 0.0            # not counted as coupling
+
+    fresh = PipedreamBackend(_RelaxingSuperLink(), coupled_indices=[0])
+    assert fresh.initialize_steady(0.1, dt=60.0, tol=1e-9, max_iter=10,
+                                   cache=cache) == 0     # loaded; max_iter is not an input
+    assert fresh.superlink.H_j == pytest.approx([1.0, 0.0])
+    assert fresh.superlink.t == 0.0
+
+    # A cache settled under other inputs is recomputed, not loaded.
+    other = PipedreamBackend(_RelaxingSuperLink(), coupled_indices=[0])
+    assert other.initialize_steady(0.2, dt=60.0, tol=1e-9, cache=cache) > 1
+    assert other.superlink.H_j == pytest.approx([2.0, 0.0])
+    again = PipedreamBackend(_RelaxingSuperLink(), coupled_indices=[0])
+    assert again.initialize_steady(0.2, dt=30.0, tol=1e-9, cache=cache) > 1
+
+
+class _CyclingSuperLink(_RelaxingSuperLink):
+    """Relaxes by ``dt / 10`` of the gap per step: at ``dt = 20`` it overshoots
+    into a period-2 cycle instead of converging."""
+
+    def step(self, Q_in=None, H_bc=None, dt=None):
+        k = dt / 10.0
+        self.H_j = self.H_j + k * (10.0 * Q_in - self.H_j)
+        self.Q_ik = self.Q_ik + k * (Q_in.sum() - self.Q_ik)
+        self.t += dt
+
+
+def test_initialize_steady_halves_dt_out_of_a_cycle():
+    from anuga_drainage import PipedreamBackend
+    be = PipedreamBackend(_CyclingSuperLink(), coupled_indices=[0])
+    assert be.initialize_steady(0.1, dt=20.0, tol=1e-9) > 20
+    assert be.superlink.H_j == pytest.approx([1.0, 0.0])
+
+
+def test_initialize_steady_reports_non_convergence():
+    from anuga_drainage import PipedreamBackend
+    be = PipedreamBackend(_RelaxingSuperLink(), coupled_indices=[0])
+    with pytest.raises(RuntimeError, match="no steady state"):
+        be.initialize_steady(0.1, tol=1e-12, max_iter=3)
+
+
+class _WeirSuperLink:
+    """SuperLink stand-in: one weir from superjunction 0 to the outfall 1."""
+
+    def __init__(self):
+        import pandas as pd
+        self.H_j = np.zeros(2)
+        self._J_uk = self._J_dk = np.array([], dtype=int)
+        self._J_uw, self._J_dw = np.array([0]), np.array([1])
+        self._Qw = np.zeros(1)
+        self.weirs = pd.DataFrame({"sj_0": [0], "sj_1": [1], "u": [1.0]})
+        self.controls = []
+
+    def step(self, Q_in=None, H_bc=None, dt=None, u_w=None):
+        self.controls.append(u_w)
+        self._Qw = np.array([Q_in[0]]) if u_w is not None else np.zeros(1)
+
+
+def test_pipedream_backend_opens_structures_and_counts_their_outfall_flow():
+    from anuga_drainage import PipedreamBackend
+    be = PipedreamBackend(_WeirSuperLink(), coupled_indices=[0], outfall_indices=[1],
+                          max_step=0.5)
+    be.step([0.2], 1.0)
+    assert [list(u) for u in be.superlink.controls] == [[1.0], [1.0]]
+    assert be.outfall_volume() == pytest.approx(0.2)
+
+
+def test_log_step_batches_the_approach_flow_gather():
+    anuga = pytest.importorskip("anuga")
+    from anuga_drainage import HydrographLogger
+
+    domain = anuga.rectangular_cross_domain(10, 5, len1=10.0, len2=5.0)
+    domain.set_quantity("elevation", 0.0)
+    domain.set_quantity("stage", 0.5)
+    domain.set_quantity("xmomentum", lambda x, y: 0.1 * x)
+    domain.set_quantity("ymomentum", lambda x, y: -0.05 * y)
+    polys = [[[1.0, 1.0], [3.0, 1.0], [3.0, 3.0], [1.0, 3.0]],
+             [[6.0, 2.0], [9.0, 2.0], [9.0, 4.0], [6.0, 4.0]]]
+    inlets = [anuga.Inlet_operator(domain, anuga.Region(domain, polygon=p), Q=0.0)
+              for p in polys]
+    logger = HydrographLogger(["A", "B"])
+    coupler = Coupler(inlets, beds=[0.0, 0.0], weir_lengths=[1.0, 1.0],
+                      manhole_areas=[1.0, 1.0], backend=_FakeBackend([-1.0, -1.0]),
+                      g=9.81, logger=logger)
+    coupler.step(1.0)
+    coupler.step(1.0)                                # reuses the cached gather
+
+    expected = [np.hypot(op.inlet.get_average_xmom(), op.inlet.get_average_ymom())
+                * np.sqrt(op.inlet.get_area()) for op in inlets]
+    assert logger.column("Approach_Q_cms")[-1] == pytest.approx(expected, rel=1e-12)
+    assert coupler._approach is not None
+
+
+def test_process_backend_reraises_errors_from_the_child():
+    import io
+    from anuga_drainage import ProcessBackend
+    with pytest.raises(TypeError, match="initial_value"):
+        ProcessBackend(io.StringIO, 5)               # the factory fails in the child
+    be = ProcessBackend(io.StringIO, "abc")
+    with pytest.raises(ValueError, match="[Nn]egative seek"):
+        be.seek(-1)
+    assert be.read() == "abc"                         # still serving after an error
+    be.close()
+    assert not be._proc.is_alive()
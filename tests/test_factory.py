@@ -85,6 +85,29 @@ def test_pipedream_backend_default_is_all_coupled_no_bc(inp_path):
     assert be.H_bc is None
 
 
+def test_pipedream_backend_steady_initialization(inp_path, tmp_path):
+    SuperLink = pytest.importorskip("pipedream_solver.hydraulics").SuperLink
+    inp = read_inp(inp_path)
+    njunc = len(inp.junctions)
+
+    def backend():
+        sj, sl = inp_to_pipedream(inp)
+        s = SuperLink(sl, sj, internal_links=4)
+        return PipedreamBackend(s, coupled_indices=range(njunc), H_bc=s._z_inv_j.copy())
+
+    be = backend()
+    cache = str(tmp_path / "steady.npz")
+    assert be.initialize_steady([0.02, 0.0], dt=10.0, tol=1e-6, cache=cache) > 0
+    H = be.get_heads().copy()
+    assert H[0] > be.superlink._z_inv_j[0] + 1e-3           # base flow is in the pipes
+    be.step(np.array([0.02, 0.0]), dt=1.0)                  # ...and already settled
+    assert be.get_heads() == pytest.approx(H, abs=1e-4)
+
+    again = backend()
+    assert again.initialize_steady([0.02, 0.0], dt=10.0, tol=1e-6, cache=cache) == 0
+    assert again.get_heads() == pytest.approx(H)
+
+
 def test_couple_from_inp_pipedream(inp_path):
     anuga = pytest.importorskip("anuga")
     pytest.importorskip("pipedream_solver.hydraulics")
@@ -114,6 +137,125 @@ def test_couple_from_inp_pipedream(inp_path):
     c.close()                                      # no-op for pipedream, but must not raise
 
 
+def test_couple_from_inp_caches_superlink(inp_path, tmp_path):
+    anuga = pytest.importorskip("anuga")
+    pytest.importorskip("pipedream_solver.hydraulics")
+    from anuga_drainage import couple_from_inp
+
+    cache = tmp_path / "cache"
+    domain = anuga.rectangular_cross_domain(20, 10, len1=20.0, len2=10.0)
+    domain.set_quantity("elevation", 0.0)
+
+    def build(**kw):
+        return couple_from_inp(domain, inp_path, backend="pipedream", manhole_area=0.5,
+                               cache_superlink=True, cache_dir=str(cache), **kw)
+
+    first = build(internal_links=4)
+    assert len(list(cache.glob("pipedream_superlink_*.npz"))) == 1
+    again = build(internal_links=4)                # loaded, not rebuilt
+    assert len(list(cache.glob("pipedream_superlink_*.npz"))) == 1
+    assert again.handle is not first.handle
+    np.testing.assert_array_equal(again.handle.H_j, first.handle.H_j)
+    np.testing.assert_array_equal(again.handle._dx_ik, first.handle._dx_ik)
+    for c in (first, again):                       # the restored SuperLink steps alike
+        c.backend.step(np.array([0.01, 0.0]), 1.0)
+    np.testing.assert_array_equal(again.handle.H_j, first.handle.H_j)
+    build(internal_links=6)                        # a different discretisation misses
+    assert len(list(cache.glob("pipedream_superlink_*.npz"))) == 2
+
+
+def test_couple_from_inp_cache_superlink_is_pipedream_only(inp_path):
+    anuga = pytest.importorskip("anuga")
+    from anuga_drainage import couple_from_inp
+
+    domain = anuga.rectangular_cross_domain(20, 10, len1=20.0, len2=10.0)
+    with pytest.raises(ValueError, match="pipedream-only"):
+        couple_from_inp(domain, inp_path, backend="swmm", cache_superlink=True)
+
+
+def test_couple_from_inp_warmup_is_swmm_only(inp_path):
+    anuga = pytest.importorskip("anuga")
+    from anuga_drainage import couple_from_inp
+
+    domain = anuga.rectangular_cross_domain(20, 10, len1=20.0, len2=10.0)
+    with pytest.raises(ValueError, match="SWMM-only"):
+        couple_from_inp(domain, inp_path, backend="pipedream", warmup=600)
+
+
+def test_couple_from_inp_sizes_links_per_conduit(inp_path):
+    anuga = pytest.importorskip("anuga")
+    pytest.importorskip("pipedream_solver.hydraulics")
+    from anuga_drainage import couple_from_inp
+
+    domain = anuga.rectangular_cross_domain(20, 10, len1=20.0, len2=10.0)
+    domain.set_quantity("elevation", 0.0)
+    c = couple_from_inp(domain, inp_path, backend="pipedream", manhole_area=0.5,
+                        internal_links=8, target_dx=2.0)
+    assert list(np.bincount(c.handle._ki)) == [4, 3]         # 8 m and 5 m conduits
+
+    with pytest.raises(ValueError, match="pipedream_max_step"):
+        couple_from_inp(domain, inp_path, backend="pipedream", courant=1.0)
+    with pytest.raises(ValueError, match="pipedream-only"):
+        couple_from_inp(domain, inp_path, backend="swmm", target_dx=5.0)
+
+
+_STRUCTURES_INP = """\
+[JUNCTIONS]
+J1      0.0   1.0   0      0    0
+J2     -0.5   1.0   0      0    0
+
+[OUTFALLS]
+O1     -1.0   FREE         NO
+
+[STORAGE]
+ST1    -1.0   2.0   0.5    FUNCTIONAL   10   0   5
+
+[CONDUITS]
+C1      J1    J2    8.0    0.013   0   0   0   0
+
+[ORIFICES]
+OR1     J2    ST1   BOTTOM   0.0   0.65   NO
+
+[WEIRS]
+W1      ST1   O1    TRANSVERSE   0.8   1.84   NO
+
+[XSECTIONS]
+C1      CIRCULAR    0.5   0     0   0   1
+OR1     CIRCULAR    0.3   0     0   0
+W1      RECT_OPEN   0.5   1.0   0   0
+
+[COORDINATES]
+J1      15.0   5.0
+J2       8.0   5.0
+O1       3.0   5.0
+ST1      5.0   5.0
+"""
+
+
+def test_couple_from_inp_pipedream_maps_structures(tmp_path):
+    anuga = pytest.importorskip("anuga")
+    pytest.importorskip("pipedream_solver.hydraulics")
+    from anuga_drainage import couple_from_inp
+
+    path = tmp_path / "structures.inp"
+    path.write_text(_STRUCTURES_INP)
+    domain = anuga.rectangular_cross_domain(20, 10, len1=20.0, len2=10.0)
+    domain.set_datadir(str(tmp_path))
+    domain.set_store(False)
+    domain.set_quantity("elevation", 0.0)
+    domain.set_quantity("stage", 0.2)
+    Br = anuga.Reflective_boundary(domain)
+    domain.set_boundary({"left": Br, "right": Br, "top": Br, "bottom": Br})
+    c = couple_from_inp(domain, str(path), backend="pipedream", manhole_area=0.5,
+                        internal_links=4, pipedream_max_step=0.1)
+    assert list(c.inlets) == ["J1", "J2"]                  # storage is not coupled
+    assert c.handle.n_o == 1 and c.handle.n_w == 1
+    for t in domain.evolve(yieldstep=1.0, finaltime=5.0):
+        last = c.step(1.0)
+    assert np.isfinite(last.Q_in).all()
+    assert np.isfinite(c.handle.H_j).all()
+
+
 def test_couple_from_inp_inlet_specs_decouple_hydraulics_from_footprint(inp_path):
     anuga = pytest.importorskip("anuga")
     pytest.importorskip("pipedream_solver.hydraulics")
@@ -167,3 +309,142 @@ def test_couple_from_inp_logs_hydrographs(inp_path, tmp_path):
     paths = c.coupler.logger.write_csv(directory=str(tmp_path))
     assert len(paths) == 2                          # one per junction (J1, J2)
     c.close()
+
+
+_TWO_NETWORKS = """\
+[OPTIONS]
+FLOW_UNITS           CMS
+FLOW_ROUTING         DYNWAVE
+START_DATE           01/01/2021
+START_TIME           00:00:00
+END_DATE             01/01/2021
+END_TIME             01:00:00
+ROUTING_STEP         0:00:01
+
+[JUNCTIONS]
+J1      0.0   1.0   0      0    0
+J2      0.0   1.0   0      0    0
+K1      0.0   1.0   0      0    0
+
+[OUTFALLS]
+O1      -0.5   FREE         NO
+O2      -0.5   FREE         NO
+
+[CONDUITS]
+C1      J1    J2    8.0    0.013   0   0   0   0
+C2      J2    O1    5.0    0.013   0   0   0   0
+D1      K1    O2    5.0    0.013   0   0   0   0
+
+[XSECTIONS]
+C1      CIRCULAR   0.5   0   0   0   1
+C2      CIRCULAR   0.5   0   0   0   1
+D1      CIRCULAR   0.5   0   0   0   1
+
+[COORDINATES]
+J1      15.0   5.0
+J2       8.0   5.0
+O1       3.0   5.0
+K1      15.0   8.0
+O2      18.0   8.0
+"""
+
+
+def test_couple_from_inp_swmm_workers_splits_catchments(tmp_path):
+    anuga = pytest.importorskip("anuga")
+    pytest.importorskip("pyswmm")
+    from anuga_drainage import couple_from_inp, CompositeBackend
+
+    path = tmp_path / "two.inp"
+    path.write_text(_TWO_NETWORKS)
+    domain = anuga.rectangular_cross_domain(20, 10, len1=20.0, len2=10.0)
+    domain.set_datadir(str(tmp_path))
+    domain.set_store(False)
+    domain.set_quantity("elevation", 0.0)
+    domain.set_quantity("stage", 0.3)
+    Br = anuga.Reflective_boundary(domain)
+    domain.set_boundary({"left": Br, "right": Br, "top": Br, "bottom": Br})
+
+    c = couple_from_inp(domain, str(path), backend="swmm", manhole_area=0.5, workers=2)
+    assert isinstance(c.backend, CompositeBackend)
+    assert len(c.handle) == 2                      # one SWMM process per catchment
+    c.add_volume_balance()
+    for t in domain.evolve(yieldstep=1.0, finaltime=3.0):
+        last = c.step(1.0)
+    assert last.Q_in.shape == (3,)                 # J1, J2, K1 in .inp order
+    assert len(c.backend.get_heads()) == 3
+    r = c.volume_balance.records[-1]
+    assert r.R_couple == pytest.approx(0.0, abs=1e-9)   # handoff still consistent
+    c.close()
+
+
+def test_couple_from_inp_swmm_warmup_caches_hotstart(tmp_path):
+    anuga = pytest.importorskip("anuga")
+    pytest.importorskip("pyswmm")
+    from anuga_drainage import couple_from_inp
+
+    path = tmp_path / "two.inp"
+    path.write_text(_TWO_NETWORKS)
+    cache = tmp_path / "cache"
+    domain = anuga.rectangular_cross_domain(20, 10, len1=20.0, len2=10.0)
+    domain.set_quantity("elevation", 0.0)
+
+    c = couple_from_inp(domain, str(path), backend="swmm", warmup=600,
+                        cache_dir=str(cache))
+    c.close()
+    assert len(list(cache.glob("swmm_hotstart_*.hsf"))) == 1
+    c = couple_from_inp(domain, str(path), backend="swmm", warmup=600,
+                        cache_dir=str(cache), workers=2)
+    c.close()
+    assert len(list(cache.glob("swmm_hotstart_*.hsf"))) == 3   # + one per sub-network
+
+
+def test_couple_from_inp_caches_inlet_setup(tmp_path):
+    anuga = pytest.importorskip("anuga")
+    pytest.importorskip("pyswmm")
+    from anuga_drainage import couple_from_inp
+
+    path = tmp_path / "two.inp"
+    path.write_text(_TWO_NETWORKS)
+    cache = tmp_path / "cache"
+    domain = anuga.rectangular_cross_domain(20, 10, len1=20.0, len2=10.0)
+    domain.set_quantity("elevation", lambda x, y: 0.1 * x)
+
+    def build():
+        c = couple_from_inp(domain, str(path), backend="swmm", manhole_area=0.5,
+                            cache_setup=True, cache_dir=str(cache))
+        c.close()
+        return c
+
+    first = build()
+    assert len(list(cache.glob("coupling_setup_*.npz"))) == 1
+    assert first.coupler.beds == pytest.approx(
+        [op.inlet.get_average_elevation() for op in first.coupler.inlets])
+    again = build()                                # a hit: nothing new written
+    assert len(list(cache.glob("coupling_setup_*.npz"))) == 1
+    np.testing.assert_array_equal(again.coupler.beds, first.coupler.beds)
+    for a, b in zip(again.coupler.inlets, first.coupler.inlets):
+        np.testing.assert_array_equal(a.inlet.triangle_indices, b.inlet.triangle_indices)
+
+    domain.set_quantity("elevation", 0.0)           # a changed bed is a miss
+    build()
+    assert len(list(cache.glob("coupling_setup_*.npz"))) == 2
+
+
+def test_couple_from_inp_swmm_workers_respect_control_rules(tmp_path):
+    anuga = pytest.importorskip("anuga")
+    pytest.importorskip("pyswmm")
+    from anuga_drainage import couple_from_inp
+
+    rule = "\n[CONTROLS]\nRULE R1\nIF NODE J1 DEPTH > 0.5\n{}THEN CONDUIT C1 STATUS = CLOSED\n"
+    path = tmp_path / "two.inp"
+    path.write_text(_TWO_NETWORKS + rule.format(""))
+    domain = anuga.rectangular_cross_domain(20, 10, len1=20.0, len2=10.0)
+    domain.set_quantity("elevation", 0.0)
+    # R1 stays with J1's part; the K1 part would not open with it.
+    c = couple_from_inp(domain, str(path), backend="swmm", workers=2)
+    assert len(c.backend.backends) == 2
+    c.close()
+    path.write_text(_TWO_NETWORKS + rule.format("AND NODE K1 DEPTH > 0.5\n"))
+    c = couple_from_inp(domain, str(path), backend="swmm", workers=2)
+    assert len(c.backend.backends) == 1             # the rule joins both catchments
+    c.close()
@@ -2,6 +2,8 @@
 
 Pure: record() takes plain arrays, so this needs neither ANUGA nor a backend.
 """
+import os
+
 import pandas as pd
 import pytest
 
@@ -69,3 +71,140 @@ def test_write_csv_roundtrip(tmp_path):
     df = pd.read_csv(tmp_path / "hydrograph_J1.csv")
     assert set(VIEWER_REQUIRED).issubset(df.columns)
     assert df.iloc[0]["Asset_ID"] == "J1"
+
+
+def test_stream_dir_appends_chunks_and_bounds_memory(tmp_path):
+    log = HydrographLogger(["J1", "J2"], stream_dir=str(tmp_path), flush_every=2)
+    for k in range(3):
+        log.record(float(k), 1.0, [0.3, 0.2], [-1.0, -1.0], [0.5, 0.4], [0.2, 0.1])
+    # Two records were flushed and dropped from memory; the third is buffered.
+    assert len(pd.read_csv(tmp_path / "hydrograph_J1.csv")) == 2
+    assert len(log.column("Time_s")) == 1
+    df = log.to_dataframe("J1")                 # flushes and reads the file back
+    assert list(df["Time_s"]) == [0.0, 1.0, 2.0]
+    assert list(df.columns) == ["Asset_ID"] + COLUMNS
+    assert df.iloc[-1]["Cum_Captured_m3"] == pytest.approx(0.6)
+    assert log.write_csv(str(tmp_path)) == [str(tmp_path / "hydrograph_J1.csv"),
+                                            str(tmp_path / "hydrograph_J2.csv")]
+    copied = log.write_csv(str(tmp_path / "copy"))
+    assert pd.read_csv(copied[1])["Cum_Inflow_m3"].iloc[-1] == pytest.approx(1.2)
+
+
+def test_columns_are_steps_by_inlets_arrays():
+    log = HydrographLogger(["J1", "J2"])
+    for k in range(3):
+        log.record(float(k), 2.0, [0.3, 0.1], [-1.0, 0.5], [1.0, 0.0], [0.5, -0.25])
+    assert list(log.column("Time_s")) == [0.0, 1.0, 2.0]
+    cum = log.column("Cum_Surcharged_m3")
+    assert cum.shape == (3, 2)
+    assert list(cum[:, 1]) == pytest.approx([0.5, 1.0, 1.5])
+    assert list(log.column("Bypass_Q_cms")[-1]) == pytest.approx([0.5, 0.0])
+
+
+def test_write_binary_roundtrips_through_a_memory_map(tmp_path):
+    from anuga_drainage.hydrograph import read_hydrographs
+    log = HydrographLogger(["J1", "J2"])
+    for k in range(3):
+        log.record(float(k), 1.0, [0.3, 0.2], [-1.0, 0.4], [0.5, 0.4], [0.2, -0.1])
+    path = log.write_binary(str(tmp_path / "run.hyd"))
+    h = read_hydrographs(path)
+    assert h.names == ["J1", "J2"]
+    assert h.column("Captured_Q_cms").shape == (3, 2)
+    pd.testing.assert_frame_equal(h.to_dataframe("J2"), log.to_dataframe("J2"))
+    with pytest.raises(ValueError, match="not a binary hydrograph"):
+        read_hydrographs(log.write_csv(str(tmp_path))[0])
+
+
+@pytest.mark.parametrize("pool", ["thread", "process"])
+def test_parallel_write_csv_matches_sequential(tmp_path, pool):
+    names = [f"J{i}" for i in range(7)]
+    log = HydrographLogger(names)
+    for k in range(4):
+        log.record(float(k), 0.5, [0.1 * i for i in range(7)], [0.0] * 7,
+                   [0.3] * 7, [0.01 * (i - 3) for i in range(7)])
+    seq = log.write_csv(str(tmp_path / "seq"), float_format="%.6g")
+    par = log.write_csv(str(tmp_path / "par"), workers=2, float_format="%.6g", pool=pool)
+    assert [os.path.basename(p) for p in par] == [os.path.basename(p) for p in seq]
+    for a, b in zip(seq, par):
+        assert open(a).read() == open(b).read()
+    assert "0.15" in open(seq[3]).read().splitlines()[1]   # Cum_Inflow 0.3*0.5
+
+
+def test_log_every_keeps_exact_cumulatives_and_the_last_sample():
+    log = HydrographLogger(["J1"], log_every=3)
+    for k in range(5):
+        log.record(float(k), 1.0, [0.3], [-1.0], [1.0], [0.5])
+    df = log.to_dataframe("J1")
+    assert list(df["Time_s"]) == [0.0, 3.0, 4.0]          # first, 3rd-later, last
+    assert list(df["Cum_Captured_m3"]) == pytest.approx([0.5, 2.0, 2.5])
+
+
+def test_reading_the_log_does_not_store_the_latest_sample(tmp_path):
+    log = HydrographLogger(["J1"], log_every=3, stream_dir=str(tmp_path), flush_every=1)
+    for k in range(5):
+        log.record(float(k), 1.0, [0.3], [-1.0], [1.0], [0.5])
+    assert list(log.to_dataframe("J1")["Time_s"]) == [0.0, 3.0, 4.0]
+    log.record(5.0, 1.0, [0.3], [-1.0], [1.0], [0.5])
+    log.record(6.0, 1.0, [0.3], [-1.0], [1.0], [0.5])
+    assert list(log.to_dataframe("J1")["Time_s"]) == [0.0, 3.0, 6.0]   # 4.0 not kept
+    assert list(pd.read_csv(tmp_path / "hydrograph_J1.csv")["Time_s"]) == [0.0, 3.0, 6.0]
+    log.record(7.0, 1.0, [0.3], [-1.0], [1.0], [0.5])
+    log.close()                                             # now the file ends on it
+    assert list(pd.read_csv(tmp_path / "hydrograph_J1.csv")["Time_s"]) == [0.0, 3.0, 6.0,
+                                                                            7.0]
+
+    dense = HydrographLogger(["J1"], log_every=3)
+    for k in range(5):
+        dense.record(float(k), 1.0, [0.3], [-1.0], [1.0], [0.5])
+        assert dense.column("Time_s")[-1] == float(k)
+    assert list(dense.column("Time_s")) == [0.0, 3.0, 4.0]
+
+
+def test_tolerances_keep_a_row_only_when_an_inlet_changes(tmp_path):
+    log = HydrographLogger(["dry", "wet"], tolerances={"depth": 0.01, "Q": 0.01})
+    for k in range(6):
+        q = 0.1 if k < 3 else 0.2                           # wet inlet steps up at t=3
+        log.record(float(k), 1.0, [0.0, 0.2], [-1.0, -1.0], [0.0, q], [0.0, q])
+    dry, wet = log.to_dataframe("dry"), log.to_dataframe("wet")
+    assert list(dry["Time_s"]) == [0.0, 5.0]                # first and last only
+    assert list(wet["Time_s"]) == [0.0, 3.0, 5.0]
+    assert wet["Cum_Captured_m3"].iloc[-1] == pytest.approx(0.3 + 0.6)
+    paths = log.write_csv(str(tmp_path), workers=2, pool="thread")
+    assert len(pd.read_csv(paths[1])) == 3
+    with pytest.raises(ValueError, match="full table"):
+        log.column("Depth_m")
+    with pytest.raises(ValueError, match="unknown tolerances"):
+        HydrographLogger(["J1"], tolerances={"velocity": 0.1})
+
+
+def test_tolerances_compare_approach_and_bypass_flow():
+    log = HydrographLogger(["J1"], tolerances={"Q": 0.01})
+    for k, approach in enumerate([0.1, 0.1, 0.5, 0.5]):    # capture steady at 0.1
+        log.record(float(k), 1.0, [0.0], [-1.0], [approach], [0.1])
+    assert list(log.to_dataframe("J1")["Time_s"]) == [0.0, 2.0, 3.0]
+
+
+def test_summary_only_keeps_online_statistics(tmp_path):
+    from anuga_drainage.hydrograph import SUMMARY_COLUMNS
+    full = HydrographLogger(["J1", "J2"])
+    lean = HydrographLogger(["J1", "J2"], summary_only=True)
+    q = [(0.1, -0.2), (0.4, -0.1), (0.4, 0.0), (0.2, 0.3)]  # J2 surcharges twice
+    for k, (q1, q2) in enumerate(q):
+        for log in (full, lean):
+            log.record(100.0 + 60.0 * k, 60.0, [0.1, 0.1], [0.0, 0.0],
+                       [0.5, 0.3], [q1, q2])
+    s = lean.summary().set_index("Asset_ID")
+    assert list(lean.summary().columns) == SUMMARY_COLUMNS
+    assert s.loc["J1", "Peak_Captured_Q_cms"] == pytest.approx(0.4)
+    assert s.loc["J1", "Time_to_Peak_s"] == pytest.approx(60.0)   # first time at 0.4
+    assert s.loc["J2", "Peak_Surcharge_Q_cms"] == pytest.approx(0.2)
+    assert s.loc["J2", "Hours_Surcharged"] == pytest.approx(120.0 / 3600.0)
+    assert s.loc["J1", "Total_Captured_m3"] == pytest.approx(
+        full.to_dataframe("J1")["Cum_Captured_m3"].iloc[-1])
+    assert s.loc["J2", "Total_Bypassed_m3"] == pytest.approx(
+        full.to_dataframe("J2")["Cum_Bypassed_m3"].iloc[-1])
+    pd.testing.assert_frame_equal(full.summary(), lean.summary())
+    path = lean.write_summary(str(tmp_path / "summary.csv"))
+    assert len(pd.read_csv(path)) == 2
+    with pytest.raises(ValueError, match="summary_only"):
+        lean.to_dataframe("J1")
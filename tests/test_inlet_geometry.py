@@ -1,4 +1,4 @@
-"""Unit tests for the pure geometry helper n_sided_inlet.
+"""Unit tests for the pure geometry helpers n_sided_inlet and inlet_triangle_indices.
 
 These need no ANUGA/SWMM install (the heavy imports in inlet_initialization
 are deferred into initialize_inlets).
@@ -7,7 +7,9 @@ import math
 
 import pytest
 
-from anuga_drainage.inlet_initialization import n_sided_inlet
+import numpy as np
+
+from anuga_drainage.inlet_initialization import inlet_triangle_indices, n_sided_inlet
 
 
 def _polygon_area(vertices):
@@ -58,3 +60,56 @@ def test_square_side_length():
 def test_rejects_degenerate_polygon():
     with pytest.raises(RuntimeError):
         n_sided_inlet(2, 1.0, (0.0, 0.0), rotation=0.0)
+
+
+def _grid_mesh(nx, ny):
+    """Unit squares split along the diagonal: vertices (3N, 2) and centroids."""
+    tris = []
+    for i in range(nx):
+        for j in range(ny):
+            tris.append([[i, j], [i + 1, j], [i + 1, j + 1]])
+            tris.append([[i, j], [i + 1, j + 1], [i, j + 1]])
+    tris = np.array(tris, dtype=float)
+    return tris.reshape(-1, 2), tris.mean(axis=1)
+
+
+def test_triangle_indices_by_centroid():
+    vertices, centroids = _grid_mesh(4, 4)
+    square = [[1.0, 1.0], [3.0, 1.0], [3.0, 3.0], [1.0, 3.0]]
+    (ix,) = inlet_triangle_indices(centroids, vertices, [square], expand_polygon=False)
+    inside = [k for k, (x, y) in enumerate(centroids) if 1 < x < 3 and 1 < y < 3]
+    assert ix.tolist() == inside
+
+
+def test_triangle_indices_expand_catches_small_polygon():
+    # A polygon too small to hold any centroid picks up the triangles its
+    # edges cross only when expanded.
+    vertices, centroids = _grid_mesh(4, 4)
+    tiny, _ = n_sided_inlet(6, 0.01, (2.6, 2.2), rotation=0.0)
+    plain, expanded = inlet_triangle_indices(centroids, vertices, [tiny, tiny],
+                                             expand_polygon=[False, True])
+    assert len(plain) == 0
+    assert expanded.tolist() == [2 * (2 * 4 + 2)]   # lower triangle of cell (2, 2)
+
+
+@pytest.mark.filterwarnings("ignore:No centroids found")
+def test_triangle_indices_match_anuga_region():
+    anuga = pytest.importorskip("anuga")
+    domain = anuga.create_domain_from_regions(
+        [[0, 0], [20, 0], [20, 15], [0, 15]], boundary_tags={"all": [0, 1, 2, 3]},
+        maximum_triangle_area=0.5,
+        interior_regions=[[[[5, 5], [10, 5], [10, 10], [5, 10]], 0.05]])
+    rng = np.random.default_rng(3)
+    polygons, expand = [], []
+    for k in range(60):
+        xy = (float(rng.uniform(1, 19)), float(rng.uniform(1, 14)))
+        vertices, _ = n_sided_inlet(int(rng.integers(3, 9)), float(rng.uniform(0.01, 3)),
+                                    xy, float(rng.uniform(0, 1)))
+        polygons.append(vertices)
+        expand.append(bool(k % 3))
+    got = inlet_triangle_indices(domain.get_centroid_coordinates(absolute=True),
+                                 domain.get_vertex_coordinates(absolute=True),
+                                 polygons, expand)
+    for poly, exp, ix in zip(polygons, expand, got):
+        ref = anuga.Region(domain, polygon=poly, expand_polygon=exp).indices
+        assert np.array_equal(np.sort(np.asarray(ref, dtype=int)), ix)
@@ -1,9 +1,11 @@
 """Tests for the SWMM .inp parser and pipedream converter (no ANUGA/pyswmm)."""
 import numpy as np
+import pandas as pd
 import pytest
 
 from anuga_drainage.inp import (
     read_inp, inp_to_pipedream, InpNetwork, _shape_geometry,
+    internal_link_counts, pipedream_elements,
 )
 
 _INP = """\
@@ -56,6 +58,72 @@ def test_read_inp_sections(inp_path):
     assert inp.conduits.loc[0, "length"] == 20.0
 
 
+def test_read_inp_skips_other_sections_and_pads_short_rows(tmp_path):
+    p = tmp_path / "net.inp"
+    p.write_text("""\
+[VERTICES]
+C1   1.0  2.0
+[bogus]  1  2
+[junctions]
+  J1   10.0   2.0
+[TAGS]
+Node  J1  [not a header]
+[JUNCTIONS]
+J2   9.0   2.0   0.5   0   0   trailing  tokens
+""")
+    inp = read_inp(str(p))
+    # section names are case-insensitive and repeated sections accumulate
+    assert list(inp.junctions["name"]) == ["J1", "J2"]
+    assert np.isnan(inp.junctions.loc[0, "init_depth"])     # missing field -> NaN
+    assert inp.junctions.loc[1, "aponded"] == 0               # extra fields dropped
+    assert inp.conduits.empty and list(inp.conduits.columns)[0] == "name"
+
+
+def test_read_inp_cache_tracks_file_changes(inp_path, tmp_path, monkeypatch):
+    import os
+    from dataclasses import fields
+    import anuga_drainage.inp as inp_module
+
+    cache = str(tmp_path / "cache")
+    first = read_inp(inp_path, cache=True, cache_dir=cache)
+    parses = []
+    real = inp_module._read_sections
+    monkeypatch.setattr(inp_module, "_read_sections",
+                        lambda *a: parses.append(a) or real(*a))
+
+    again = read_inp(inp_path, cache=True, cache_dir=cache)
+    assert not parses                                      # loaded, not re-parsed
+    for f in fields(first)[:-1]:
+        pd.testing.assert_frame_equal(getattr(again, f.name), getattr(first, f.name))
+    assert again.source == inp_path
+    assert [p.suffix for p in (tmp_path / "cache").iterdir()] == [".npz"]
+    st = os.stat(inp_path)
+    os.utime(inp_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    read_inp(inp_path, cache=True, cache_dir=cache)       # touched, same content
+    assert not parses
+    with open(inp_path, "a") as f:
+        f.write("[JUNCTIONS]\nJ9  5.0  1.0\n")
+    changed = read_inp(inp_path, cache=True, cache_dir=cache)
+    assert len(parses) == 1
+    assert list(changed.junctions["name"]) == ["J1", "J2", "J9"]
+
+
+def test_read_inp_section_reads_one_table(inp_path, monkeypatch):
+    import anuga_drainage.inp as inp_module
+    from anuga_drainage import read_inp_section
+    full = read_inp(inp_path)
+    requested = []
+    real = inp_module._read_sections
+    monkeypatch.setattr(inp_module, "_read_sections",
+                        lambda path, sections: requested.append(set(sections))
+                        or real(path, sections))
+    coords = read_inp_section(inp_path, "coordinates")
+    assert requested == [{"COORDINATES"}]
+    pd.testing.assert_frame_equal(coords, full.coordinates)
+    with pytest.raises(ValueError, match="not one of the network sections"):
+        read_inp_section(inp_path, "VERTICES")
+
+
 def test_inp_to_pipedream_superjunctions(inp_path):
     sj, sl = inp_to_pipedream(read_inp(inp_path), manhole_area=1.5, h_0=1e-4)
     assert list(sj["name"]) == ["J1", "J2", "O1"]          # junctions then outfalls
@@ -80,6 +148,42 @@ def test_inp_to_pipedream_superlinks(inp_path):
     assert (sl["A_s"] == 1.2).all()                        # pit_area
 
 
+def test_internal_link_counts_from_target_dx(inp_path):
+    sj, sl = inp_to_pipedream(read_inp(inp_path))           # C1 20 m, C2 10 m
+    assert list(internal_link_counts(sl, 20, target_dx=3.0)) == [7, 4]
+    assert list(internal_link_counts(sl, 5, target_dx=3.0)) == [5, 4]   # capped
+    assert list(internal_link_counts(sl, 20, target_dx=50.0)) == [2, 2]  # min_links
+
+
+def test_internal_link_counts_from_courant(inp_path):
+    sj, sl = inp_to_pipedream(read_inp(inp_path))
+    # full-depth celerity: sqrt(g * 0.5) = 2.21 m/s (C1), sqrt(g * 1.0) = 3.13 m/s (C2)
+    n = internal_link_counts(sl, 20, courant=1.0, max_step=0.5)
+    assert list(n) == [18, 6]
+    cell = sl["dx"].to_numpy() / n
+    assert (cell >= np.sqrt(9.81 * sl["g1"].to_numpy()) * 0.5).all()
+    with pytest.raises(ValueError, match="exactly one"):
+        internal_link_counts(sl, 20, target_dx=1.0, courant=1.0, max_step=0.5)
+    with pytest.raises(ValueError, match="max_step"):
+        internal_link_counts(sl, 20, courant=1.0)
+
+
+def test_pipedream_elements_per_superlink_layout(inp_path):
+    sj, sl = inp_to_pipedream(read_inp(inp_path), pit_area=1.2)
+    sl2, links, junctions = pipedream_elements(sj, sl, [4, 2])
+    assert list(links["k"]) == [0, 0, 0, 0, 1, 1]
+    assert list(junctions["k"]) == [0] * 5 + [1] * 3
+    assert list(sl2["j_0"]) == [0, 5] and list(sl2["j_1"]) == [4, 7]
+    assert (links["j_1"] == links["j_0"] + 1).all()
+    assert list(links["dx"]) == pytest.approx([5.0] * 4 + [5.0] * 2)
+    # inverts run linearly between the superjunction inverts
+    assert list(junctions["z_inv"]) == pytest.approx(
+        [10.0, 9.75, 9.5, 9.25, 9.0, 9.0, 8.5, 8.0])
+    assert (junctions["A_s"] == 1.2).all()
+    assert list(links["shape"]) == ["circular"] * 4 + ["rect_open"] * 2
+    assert "j_0" not in sl                                  # input left untouched
+
+
 def test_shape_geometry_conversions():
     # direct (height/width) shapes
     assert _shape_geometry("CIRCULAR", 0.5, 0, 0, 0) == (0.5, 0.0, 0.0, 0.0)
@@ -123,3 +227,547 @@ def test_conduit_without_xsection_raises(inp_path):
     inp.xsections = inp.xsections.iloc[0:0]                # drop all xsections
     with pytest.raises(ValueError, match="no \\[XSECTIONS\\] entry"):
         inp_to_pipedream(inp)
+
+
+def test_dangling_conduit_node_raises(inp_path):
+    inp = read_inp(inp_path)
+    inp.conduits.loc[1, "to_node"] = "NOWHERE"
+    with pytest.raises(ValueError, match="C2.*'NOWHERE' is not a junction/outfall"):
+        inp_to_pipedream(inp)
+
+
+def test_first_bad_conduit_is_reported(inp_path):
+    inp = read_inp(inp_path)
+    inp.conduits.loc[1, "to_node"] = "NOWHERE"             # C2: dangling
+    inp.xsections.loc[0, "shape"] = "EGG"                  # C1: reported first
+    with pytest.raises(ValueError, match="'C1': SWMM shape 'EGG'"):
+        inp_to_pipedream(inp)
+
+
+def test_mixed_shapes_match_per_conduit_geometry(inp_path):
+    inp = read_inp(inp_path)
+    inp.xsections.loc[0, ["shape", "geom1", "geom2", "geom3", "geom4"]] = [
+        "TRAPEZOIDAL", 2.0, 3.0, 1.0, 3.0]
+    inp.xsections.loc[1, ["shape", "geom1", "geom2"]] = ["TRIANGULAR", 2.0, 4.0]
+    _, sl = inp_to_pipedream(inp)
+    for k, row in inp.xsections.iterrows():
+        expected = _shape_geometry(row["shape"], row["geom1"], row["geom2"],
+                                   row["geom3"], row["geom4"])
+        assert list(sl.loc[k, ["g1", "g2", "g3", "g4"]]) == pytest.approx(expected)
+
+
+_TWO_CATCHMENTS = """\
+[JUNCTIONS]
+A1   5.0   1.0   0   0   0
+A2   4.0   1.0   0   0   0
+B1   5.0   1.0   0   0   0
+L1   5.0   1.0   0   0   0
+
+[OUTFALLS]
+OA   3.0   FREE   NO
+OB   3.0   FREE   NO
+
+[CONDUITS]
+CA1  A1   A2   10.0   0.013   0   0   0   0
+CA2  A2   OA   10.0   0.013   0   0   0   0
+CB1  B1   OB   10.0   0.013   0   0   0   0
+
+[XSECTIONS]
+CA1  CIRCULAR   0.5   0   0   0   1
+CA2  CIRCULAR   0.5   0   0   0   1
+CB1  CIRCULAR   0.5   0   0   0   1
+
+[COORDINATES]
+A1   0.0   0.0
+A2   10.0  0.0
+OA   20.0  0.0
+B1   0.0   50.0
+OB   10.0  50.0
+L1   5.0   5.0
+
+[VERTICES]
+CA1  5.0   1.0
+CB1  5.0   51.0
+"""
+
+
+@pytest.fixture
+def two_catchments(tmp_path):
+    p = tmp_path / "two.inp"
+    p.write_text(_TWO_CATCHMENTS)
+    return str(p)
+
+
+def test_network_components_split_by_outfall_catchment(two_catchments):
+    from anuga_drainage import network_components
+    comps = network_components(read_inp(two_catchments))
+    assert [sorted(c) for c in comps] == [["A1", "A2", "OA"], ["B1", "OB"], ["L1"]]
+
+
+def test_network_graph_traversals(two_catchments):
+    inp = read_inp(two_catchments)
+    g = inp.graph
+    assert inp.graph is g                                  # built once
+    assert list(g.names) == ["A1", "A2", "B1", "L1", "OA", "OB"]
+
+    def names(ids):
+        return list(g.names[ids])
+
+    assert names(g.downstream(g.index["A1"])) == ["A1", "A2", "OA"]
+    assert names(g.upstream(g.index["OA"])) == ["A1", "A2", "OA"]
+    assert names(g.upstream(g.index["L1"])) == ["L1"]
+    assert {g.names[o]: names(ids) for o, ids in g.catchments().items()} == {
+        "OA": ["A1", "A2", "OA"], "OB": ["B1", "OB"]}
+    order = list(g.topological_order())
+    for a, b in zip(inp.conduits["from_node"], inp.conduits["to_node"]):
+        assert order.index(g.index[a]) < order.index(g.index[b])
+
+
+def test_network_graph_topological_order_rejects_loops(inp_path):
+    inp = read_inp(inp_path)
+    inp.conduits.loc[2] = ["C3", "J2", "J1", 5.0, 0.013, 0, 0, 0, 0]
+    g = inp.graph
+    with pytest.raises(ValueError, match="loop"):
+        g.topological_order()
+    assert [list(g.names[c]) for c in g.components()] == [["J1", "J2", "O1"]]
+
+
+def test_subset_network_keeps_only_internal_conduits(two_catchments):
+    from anuga_drainage import subset_network
+    sub = subset_network(read_inp(two_catchments), ["B1", "OB", "A2"])
+    assert list(sub.junctions["name"]) == ["A2", "B1"]     # source order kept
+    assert list(sub.outfalls["name"]) == ["OB"]
+    assert list(sub.conduits["name"]) == ["CB1"]           # CA1/CA2 cross the cut
+    assert list(sub.xsections["link"]) == ["CB1"]
+    assert set(sub.coordinates["node"]) == {"A2", "B1", "OB"}
+
+
+def test_write_inp_subset_drops_rows_outside_the_part(two_catchments, tmp_path):
+    from anuga_drainage import subset_network, write_inp
+    path = tmp_path / "part.inp"
+    write_inp(subset_network(read_inp(two_catchments), ["B1", "OB"]), str(path),
+              source=two_catchments)
+    text = path.read_text()
+    part = text.splitlines()
+    assert not any(line.split()[:1] == ["A1"] for line in part)
+    assert not any(line.split()[:1] == ["CA1"] for line in part)   # [VERTICES] too
+    assert any(line.split()[:1] == ["CB1"] for line in part)
+    assert "[OUTFALLS]" in text                                    # headers kept
+    assert list(read_inp(str(path)).junctions["name"]) == ["B1"]
+
+
+def test_write_inp_round_trips_tables(inp_path, tmp_path):
+    import pandas as pd
+    from anuga_drainage import write_inp
+    inp = read_inp(inp_path)
+    path = tmp_path / "out.inp"
+    write_inp(inp, str(path))
+    again = read_inp(str(path))
+    for attr in ("junctions", "outfalls", "conduits", "xsections", "coordinates"):
+        pd.testing.assert_frame_equal(getattr(again, attr), getattr(inp, attr))
+    assert "[STORAGE]" not in path.read_text()              # no empty sections
+    assert "[PUMPS]" not in path.read_text()
+
+    src = tmp_path / "src.inp"
+    src.write_text(open(inp_path).read() + "\n[PUMPS]\n;;Name From To Curve\n")
+    write_inp(inp, str(path), source=str(src))
+    text = path.read_text()
+    assert text.count("[PUMPS]") == 1 and "[STORAGE]" not in text
+
+
+def test_write_inp_passes_other_sections_through(inp_path, tmp_path):
+    from anuga_drainage import write_inp
+    inp = read_inp(inp_path)
+    inp.conduits.loc[0, "length"] = 25.0
+    path = tmp_path / "out.inp"
+    write_inp(inp, str(path), source=inp_path)
+    text = path.read_text()
+    assert text.startswith("[TITLE]\nTest network\n")            # verbatim, in place
+    assert ";;Name   Elev   MaxD" in text                          # column comments kept
+    assert read_inp(str(path)).conduits.loc[0, "length"] == 25.0
+    assert text.count("[CONDUITS]") == 1
+
+
+_BRANCHED = """\
+[JUNCTIONS]
+J1   10.0   2.0   0   0   0
+J2    9.5   2.0   0   0   0
+J3    9.0   2.0   0   0   0
+J4    8.5   2.0   0   0   0
+S1    9.6   1.0   0   0   0
+S2    9.7   1.0   0   0   0
+K1    9.2   2.0   0   0   0
+
+[OUTFALLS]
+O1    8.0   FREE   NO
+
+[CONDUITS]
+C1   J1   J2   10.0   0.012   0.1   0     0   0
+C2   J2   J3   30.0   0.016   0     0     0   0
+C3   J3   J4   10.0   0.013   0     0     0   0
+C4   J4   O1    5.0   0.013   0     0.2   0   0
+L1   S1   J2    2.0   0.013   0     0     0   0
+L2   S2   S1    1.0   0.013   0     0     0   0
+L3   K1   J3   50.0   0.013   0     0     0   0
+
+[XSECTIONS]
+C1   CIRCULAR   0.5   0   0   0   1
+C2   CIRCULAR   0.5   0   0   0   1
+C3   CIRCULAR   0.6   0   0   0   1
+C4   CIRCULAR   0.6   0   0   0   1
+L1   CIRCULAR   0.2   0   0   0   1
+L2   CIRCULAR   0.2   0   0   0   1
+L3   CIRCULAR   0.3   0   0   0   1
+"""
+
+
+@pytest.fixture
+def branched(tmp_path):
+    p = tmp_path / "branched.inp"
+    p.write_text(_BRANCHED)
+    return read_inp(str(p))
+
+
+def test_skeletonize_merges_series_conduits_of_one_section(branched):
+    from anuga_drainage import skeletonize
+    reduced, node_map, link_map = skeletonize(branched)
+    # J4 sits between two 0.6 m pipes; S1 between two 0.2 m laterals. J2 and J3
+    # have a third conduit, and C1/C2 differ from C3, so they stay.
+    assert list(reduced.junctions["name"]) == ["J1", "J2", "J3", "S2", "K1"]
+    c3 = reduced.conduits.set_index("name").loc["C3"]
+    assert (c3["from_node"], c3["to_node"], c3["length"]) == ("J3", "O1", 15.0)
+    assert c3["out_offset"] == 0.2                         # from the downstream pipe
+    assert link_map["C4"] == "C3" and link_map["L1"] == "L2"
+    assert node_map["J4"] == "O1" and node_map["S1"] == "J2" and node_map["J1"] == "J1"
+    assert list(reduced.xsections["link"]) == list(reduced.conduits["name"])
+
+
+def test_skeletonize_drops_stubs_and_keeps_named_junctions(branched):
+    from anuga_drainage import skeletonize
+    reduced, node_map, link_map = skeletonize(branched, stub_length=5.0)
+    # S2-S1 is a dead-end chain of short laterals; without it J2 is in series.
+    assert list(reduced.junctions["name"]) == ["J1", "J3", "K1"]
+    c1 = reduced.conduits.set_index("name").loc["C1"]
+    assert c1["to_node"] == "J3" and c1["length"] == 40.0
+    # equal full-pipe friction loss: n^2 L summed over the merged pipes
+    assert c1["roughness"] == pytest.approx(((0.012**2 * 10 + 0.016**2 * 30) / 40) ** 0.5)
+    assert link_map["L1"] is None and link_map["L2"] is None
+    assert node_map["S2"] == "J3"                          # via S1 -> J2 -> J3
+
+    reduced, _, _ = skeletonize(branched, keep=["J2"], stub_length=5.0)
+    assert "J2" in set(reduced.junctions["name"])
+
+
+def test_skeletonize_keeps_loaded_controlled_and_dropped_junctions(tmp_path, branched):
+    from dataclasses import replace
+    from anuga_drainage import skeletonize
+    p = tmp_path / "loaded.inp"
+    p.write_text(_BRANCHED + "\n[INFLOWS]\nJ4   FLOW   \"\"\n\n[DWF]\nS1   FLOW   0.01\n"
+                 "\n[CONTROLS]\nRULE R1\nIF NODE K1 DEPTH > 1\nTHEN LINK L3 STATUS = CLOSED\n")
+    reduced, node_map, _ = skeletonize(read_inp(str(p)), stub_length=60.0)
+    assert {"J4", "S1", "K1"} <= set(reduced.junctions["name"])
+    assert node_map["S2"] == "S1"
+
+    # C3 reaches J4 0.3 m above C4's inlet: one straight conduit would lose the drop
+    conduits = branched.conduits.copy()
+    conduits.loc[conduits["name"] == "C3", "out_offset"] = 0.3
+    reduced, _, _ = skeletonize(replace(branched, conduits=conduits, source=None))
+    assert "J4" in set(reduced.junctions["name"])
+    conduits.loc[conduits["name"] == "C4", "in_offset"] = 0.3    # no drop: merged
+    reduced, _, _ = skeletonize(replace(branched, conduits=conduits, source=None))
+    c3 = reduced.conduits.set_index("name").loc["C3"]
+    assert "J4" not in set(reduced.junctions["name"])
+    assert (c3["in_offset"], c3["out_offset"]) == (0.0, 0.2)
+
+
+_STRUCTURES = """\
+[JUNCTIONS]
+J1       10.0   2.0    0       0     0
+J2        7.0   2.0    0       0     0
+J3        6.5   2.0    0       0     0
+J4        6.4   2.0    0       0     0
+
+[OUTFALLS]
+O1        5.0   FREE           NO
+
+[STORAGE]
+;;Name   Elev   MaxD   InitD   Shape        Params
+ST1       8.0   3.0    0       FUNCTIONAL   100   0.5   50   0   0
+WW        4.0   3.0    0.5     TABULAR      WWcurve   0   0
+
+[CONDUITS]
+C1       J1     ST1   50.0   0.013   0       0        0          0
+C2       J3     J4    10.0   0.013   0       0        0          0
+C3       J4     O1    20.0   0.013   0       0        0          0
+
+[ORIFICES]
+OR1      ST1    J2    SIDE   0.1      0.65     NO      0
+
+[WEIRS]
+W1       J2     J3    V-NOTCH      0.5       1.4      NO
+W2       J2     J3    TRAPEZOIDAL  0.6       1.84     NO      0        1.4
+
+[PUMPS]
+P1       WW     J3    PC1     OFF      0.3       0.1
+
+[XSECTIONS]
+C1       CIRCULAR     0.5     0       0       0       1
+C2       CIRCULAR     0.5     0       0       0       1
+C3       CIRCULAR     0.5     0       0       0       1
+OR1      CIRCULAR     0.4     0       0       0
+W1       TRIANGULAR   0.5     2.0     0       0
+W2       TRAPEZOIDAL  0.5     2.0     0.5     1.5
+
+[CURVES]
+;;Name    Type     X      Y
+PC1       Pump3    2      0.1
+PC1                6      0.05
+PC1                8      0
+WWcurve   Storage  0      20
+WWcurve            3      25
+SHAPE1    Shape    0  1   0.5  1   ;several pairs a line
+SHAPE1             1  1
+"""
+
+
+@pytest.fixture
+def structures(tmp_path):
+    p = tmp_path / "structures.inp"
+    p.write_text(_STRUCTURES)
+    return str(p)
+
+
+def test_read_inp_structure_sections(structures):
+    inp = read_inp(structures)
+    assert list(inp.storage["name"]) == ["ST1", "WW"]
+    assert list(inp.storage["p1"]) == ["100", "WWcurve"]   # shape parameters kept as text
+    assert list(inp.orifices["offset"]) == [0.1]
+    assert list(inp.weirs["end_coeff"].fillna(0)) == [0.0, 1.4]
+    assert list(inp.pumps["status"]) == ["OFF"]
+    # the curve type is named on a curve's first row only
+    assert list(inp.curves["type"]) == ["Pump3"] * 3 + ["Storage"] * 2 + ["Shape"] * 3
+    assert list(inp.curves["x"]) == [2.0, 6.0, 8.0, 0.0, 3.0, 0.0, 0.5, 1.0]
+    assert list(inp.curves["y"]) == [0.1, 0.05, 0.0, 20.0, 25.0, 1.0, 1.0, 1.0]
+    assert InpNetwork(*(getattr(inp, a) for a in ("junctions", "outfalls", "conduits",
+                                                   "xsections", "coordinates"))).pumps.empty
+
+
+def test_inp_to_pipedream_storage_nodes_follow_outfalls(structures):
+    sj, sl = inp_to_pipedream(read_inp(structures), manhole_area=1.5)
+    assert list(sj["name"]) == ["J1", "J2", "J3", "J4", "O1", "ST1", "WW"]
+    assert list(sj["bc"]) == [False] * 4 + [True, False, False]
+    st1, ww = sj.loc[5], sj.loc[6]
+    assert (st1["storage"], st1["a"], st1["b"], st1["c"]) == ("functional", 100.0, 0.5, 50.0)
+    assert (ww["storage"], ww["table"], ww["h_0"]) == ("tabular", "WWcurve", 0.5)
+    assert (sj.loc[:4, "c"] == 1.5).all()                  # manholes keep manhole_area
+    assert list(sl["sj_1"]) == [5, 3, 4]                   # C1 ends at storage ST1
+
+
+def test_pipedream_structures_mapping(structures):
+    from anuga_drainage import pipedream_structures
+    out = pipedream_structures(read_inp(structures))
+    o = out["orifices"].iloc[0]
+    assert (o["sj_0"], o["sj_1"], o["orientation"]) == (5, 1, "side")
+    assert o["A"] == pytest.approx(np.pi / 4 * 0.4 ** 2)   # circular area, same height
+    assert (o["y_max"], o["z_o"], o["C"]) == (0.4, 0.1, 0.65)
+
+    w = out["weirs"].set_index("name")
+    assert list(w.loc["W1", ["Cr", "Ct", "L", "s"]]) == [0.0, 1.4, 0.0, 2.0]   # V-notch
+    assert list(w.loc["W2", ["Cr", "Ct", "L", "s"]]) == [1.84, 1.4, 2.0, 1.0]  # trapezoid
+    assert list(w["z_w"]) == [0.5, 0.6]
+
+    p = out["pumps"].iloc[0]
+    assert (p["sj_0"], p["sj_1"], p["z_p"], p["u"]) == (6, 2, 0.3, 0.0)   # listed OFF
+    assert (p["dH_min"], p["dH_max"]) == (2.0, 8.0)
+    head = p["a_p"] - p["b_p"] * np.array([0.1, 0.05, 0.0]) ** p["c_p"]
+    assert head == pytest.approx([2.0, 6.0, 8.0], abs=0.3)
+    assert out["storages"]["WWcurve"]["A"].tolist() == [20.0, 25.0]
+
+
+def test_pump_curve_fit_recovers_a_power_law():
+    from anuga_drainage.inp import _fit_pump_curve
+    q = np.array([0.0, 0.1, 0.2, 0.3])
+    assert _fit_pump_curve(10 - 50 * q ** 1.5, q) == pytest.approx((10.0, 50.0, 1.5))
+    with pytest.raises(ValueError, match="fall"):
+        _fit_pump_curve([1.0, 2.0, 3.0], q[1:])
+
+
+def test_pipedream_structures_rejects_unmapped_kinds(structures):
+    from anuga_drainage import pipedream_structures
+    inp = read_inp(structures)
+    inp.weirs.loc[0, "type"] = "ROADWAY"
+    with pytest.raises(ValueError, match="W1.*ROADWAY"):
+        pipedream_structures(inp)
+    inp = read_inp(structures)
+    inp.curves.loc[inp.curves["name"] == "PC1", "type"] = "Pump4"
+    with pytest.raises(ValueError, match="P1.*PUMP3"):
+        pipedream_structures(inp)
+    inp = read_inp(structures)
+    inp.xsections.loc[inp.xsections["link"] == "OR1", "shape"] = "RECT_OPEN"
+    with pytest.raises(ValueError, match="OR1.*RECT_OPEN"):
+        pipedream_structures(inp)
+
+
+def test_structures_connect_the_graph_and_block_skeletonize(structures):
+    from anuga_drainage import network_components, skeletonize, subset_network
+    inp = read_inp(structures)
+    assert sorted(network_components(inp)[0]) == ["J1", "J2", "J3", "J4", "O1", "ST1", "WW"]
+    assert list(inp.graph.outfalls) == [4]
+    sub = subset_network(inp, ["J2", "J3", "J4", "O1"])
+    assert list(sub.weirs["name"]) == ["W1", "W2"] and sub.orifices.empty
+    assert sorted(sub.xsections["link"]) == ["C2", "C3", "W1", "W2"]
+    # J4 merges away; J3 takes the weirs and stays, as do the storage units.
+    reduced, node_map, _ = skeletonize(inp, stub_length=100.0)
+    assert list(reduced.junctions["name"]) == ["J2", "J3"]
+    assert node_map["J1"] == "ST1"
+    assert list(reduced.conduits["name"]) == ["C2"]
+    assert list(reduced.storage["name"]) == ["ST1", "WW"]
+    assert len(reduced.weirs) == 2 and len(reduced.pumps) == 1
+
+
+def test_write_inp_round_trips_structures(structures, tmp_path):
+    from anuga_drainage import write_inp
+    inp = read_inp(structures)
+    out = tmp_path / "out.inp"
+    write_inp(inp, out)
+    back = read_inp(out)
+    for table in ("storage", "orifices", "weirs", "pumps", "curves", "xsections"):
+        assert getattr(back, table).astype(str).equals(getattr(inp, table).astype(str))
+    curves = out.read_text().split("[CURVES]")[1].split("\n[")[0]
+    assert curves.count("Pump3") == 1                      # SWMM: type on first row only
+
+
+_OUTLET = """\
+[JUNCTIONS]
+J1        10.0   2.0
+J2         9.0   2.0
+
+[OUTFALLS]
+O1         5.0   FREE
+
+[CONDUITS]
+C1       J1     J2    50.0   0.013   0       0
+
+[OUTLETS]
+;;Name   From   To    Offset   Type              Params
+OL1      J2     O1    0.2      FUNCTIONAL/DEPTH  10   0.5   NO
+
+[XSECTIONS]
+C1       CIRCULAR     0.5     0       0       0
+"""
+
+
+def test_write_inp_round_trips_outlets(tmp_path):
+    from anuga_drainage import pipedream_structures, subset_network, write_inp
+    src = tmp_path / "outlet.inp"
+    src.write_text(_OUTLET)
+    inp = read_inp(str(src))
+    assert list(inp.outlets.iloc[0]) == ["OL1", "J2", "O1", 0.2, "FUNCTIONAL/DEPTH",
+                                         "10", "0.5", "NO"]
+    out = tmp_path / "out.inp"
+    write_inp(inp, str(out), source=str(src))
+    assert read_inp(str(out)).outlets.astype(str).equals(inp.outlets.astype(str))
+    write_inp(subset_network(inp, ["J1", "J2"]), str(out), source=str(src))
+    assert read_inp(str(out)).outlets.empty                # O1 left the part
+    with pytest.raises(ValueError, match="OUTLETS.*OL1"):
+        pipedream_structures(inp)
+
+
+def test_outlets_and_dividers_join_the_graph(tmp_path):
+    from anuga_drainage import network_components, subset_network, write_inp
+    src = tmp_path / "outlet.inp"
+    src.write_text(_OUTLET)
+    assert network_components(read_inp(str(src))) == [["J1", "J2", "O1"]]
+
+    text = _OUTLET.replace("C1       J1     J2", "C1       J1     D1").replace(
+        "[OUTFALLS]", "[DIVIDERS]\nD1         9.5   OL1   CUTOFF   0.1\n\n[OUTFALLS]")
+    text = text.replace("OL1      J2", "OL1      D1").replace(
+        "[OUTLETS]", "[OUTLETS]\nOL2      D1     J2    0        FUNCTIONAL/DEPTH  10   0.5")
+    src.write_text(text)
+    inp = read_inp(str(src))
+    assert list(inp.graph.names) == ["J1", "J2", "O1", "D1"]
+    assert sorted(network_components(inp)[0]) == ["D1", "J1", "J2", "O1"]
+    sub = subset_network(inp, ["J1", "D1", "O1"])
+    assert list(sub.dividers["name"]) == ["D1"]
+    assert list(sub.outlets["name"]) == ["OL1"]
+    out = tmp_path / "out.inp"
+    write_inp(sub, str(out), source=str(src))
+    back = read_inp(str(out))
+    assert back.dividers.astype(str).equals(inp.dividers.astype(str))
+    assert list(back.junctions["name"]) == ["J1"]
+    with pytest.raises(ValueError, match="DIVIDERS.*D1"):
+        inp_to_pipedream(inp)
+
+
+_CONTROLS = """
+[CONTROLS]
+;;rules on one catchment, on both, and through a variable
+RULE RA
+IF NODE A1 DEPTH > 0.5
+THEN CONDUIT CA1 STATUS = CLOSED
+
+RULE RAB
+IF NODE A1 DEPTH > 0.5
+AND LINK CB1 FLOW > 0.1
+THEN CONDUIT CA2 STATUS = CLOSED
+
+VARIABLE VB = NODE B1 DEPTH
+RULE RV
+IF VB > 0.2
+THEN CONDUIT CA1 STATUS = OPEN
+"""
+
+
+def test_control_rules_join_components_and_are_filtered(two_catchments, tmp_path):
+    from anuga_drainage import (control_rule_elements, network_components,
+                                subset_network, write_inp)
+    src = tmp_path / "controls.inp"
+    src.write_text(_TWO_CATCHMENTS + _CONTROLS)
+    assert control_rule_elements(str(src)) == [{"A1", "CA1"}, {"A1", "CB1", "CA2"},
+                                               {"B1", "CA1"}]
+    inp = read_inp(str(src))
+    assert [sorted(c) for c in network_components(inp, [{"A1", "CA1"}])] == [
+        ["A1", "A2", "OA"], ["B1", "OB"], ["L1"]]
+    assert [sorted(c) for c in network_components(inp, control_rule_elements(str(src)))] == [
+        ["A1", "A2", "B1", "OA", "OB"], ["L1"]]
+
+    out = tmp_path / "part.inp"
+    write_inp(subset_network(inp, ["A1", "A2", "OA"]), str(out), source=str(src))
+    text = out.read_text()
+    rules = [line for line in text.splitlines() if line.startswith(("RULE", "VARIABLE"))]
+    assert rules == ["RULE RA"]                            # VB reads B1, so RV goes
+    assert ";;rules on one catchment" in text
+    write_inp(subset_network(inp, ["B1", "OB"]), str(out), source=str(src))
+    assert "RULE" not in out.read_text()
+
+
+def test_named_cross_sections_round_trip(inp_path, tmp_path):
+    from anuga_drainage import write_inp
+    text = open(inp_path).read().replace("[XSECTIONS]", "[XSECTIONS]\nX1 IRREGULAR TR1\n"
+                                         "X2 CUSTOM 1.5 SHAPE1 0 0 1")
+    src = tmp_path / "named.inp"
+    src.write_text(text)
+    inp = read_inp(str(src))
+    xs = inp.xsections.set_index("link")
+    assert (xs.loc["X1", "geom1"], xs.loc["X2", "geom1"], xs.loc["X2", "geom2"]) == (
+        "TR1", 1.5, "SHAPE1")
+    out = tmp_path / "out.inp"
+    write_inp(inp, str(out))
+    lines = [line.split() for line in out.read_text().splitlines()]
+    assert ["X1", "IRREGULAR", "TR1"] in lines
+    assert ["X2", "CUSTOM", "1.5", "SHAPE1", "0.0", "0.0", "1.0"] in lines
+
+
+def test_write_inp_subset_filters_report_and_tags(two_catchments, tmp_path):
+    from anuga_drainage import subset_network, write_inp
+    src = tmp_path / "report.inp"
+    src.write_text(_TWO_CATCHMENTS + "\n[REPORT]\nINPUT NO\nNODES A1 B1 OB ;listed\n"
+                   "LINKS CA1\nSUBCATCHMENTS ALL\n\n[TAGS]\nNode A1 manhole\n"
+                   "Link CB1 main\nNode OB outlet\n")
+    out = tmp_path / "part.inp"
+    write_inp(subset_network(read_inp(str(src)), ["B1", "OB"]), str(out), source=str(src))
+    text = out.read_text()
+    report = text.split("[REPORT]\n")[1].split("\n[")[0].splitlines()
+    assert report == ["INPUT NO", "NODES B1 OB ;listed", "SUBCATCHMENTS ALL"]
+    tags = text.split("[TAGS]\n")[1].split("\n[")[0].splitlines()
+    assert tags == ["Link CB1 main", "Node OB outlet"]
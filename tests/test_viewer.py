@@ -57,3 +57,25 @@ def test_combine_empty_when_none_valid(tmp_path):
 def test_entry_points_exist():
     assert callable(main)
     assert isinstance(HydrographViewerApp, type)
+
+
+def test_combine_reads_binary_hydrograph_files(tmp_path):
+    from anuga_drainage import HydrographLogger
+    log = HydrographLogger(["J1", "J2"])
+    for k in range(3):
+        log.record(float(k), 1.0, [0.0, 0.0], [0.0, 0.0], [0.5, 0.0], [0.1, 0.3])
+    hyd = log.write_binary(str(tmp_path / "run.hyd"))
+    _write(tmp_path / "c.csv", [0.0, 1.0, 2.0], [0.2, 0.2, 0.2], [0.0, 0.0, 0.0])
+
+    combined, skipped = combine_hydrographs([hyd, str(tmp_path / "c.csv")])
+    assert skipped == []
+    assert combined["Captured_total_cms"].tolist() == pytest.approx([0.6, 0.6, 0.6])
+    assert combined["Bypass_total_cms"].tolist() == pytest.approx([0.4, 0.4, 0.4])
+
+
+def test_combine_holds_a_sparse_file_between_its_samples(tmp_path):
+    # b.csv was logged only when its flow changed: 0.3 holds over t=1.
+    _write(tmp_path / "a.csv", [0.0, 1.0, 2.0, 3.0], [0.1] * 4, [0.0] * 4)
+    _write(tmp_path / "b.csv", [0.0, 2.0], [0.3, 0.3], [0.0, 0.0])
+    combined, _ = combine_hydrographs([str(tmp_path / "a.csv"), str(tmp_path / "b.csv")])
+    assert combined["Captured_total_cms"].tolist() == pytest.approx([0.4, 0.4, 0.4, 0.1])
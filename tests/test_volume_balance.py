@@ -186,3 +186,178 @@ def test_baseline_is_taken_on_first_step_not_construction():
     dom.water_volume = -3555.0 + 7.0   # 7 m^3 added
     r = vb.step(1.0)
     assert r.R_anuga == pytest.approx(7.0, abs=1e-12)  # no inflow/inlets accounted -> shows as residual
+
+
+def test_records_grow_past_capacity_and_the_dataframe_is_a_view():
+    import numpy as np
+    dom, be = _FakeDomain(), _FakeBackend()
+    vb = VolumeBalance(dom, [], be, capacity=2)
+    for k in range(5):
+        dom.water_volume = float(k)
+        vb.step(float(k))
+    assert len(vb.records) == 5
+    assert vb.records[-1].t == 4.0 and vb.records[-1].R_anuga == pytest.approx(4.0)
+    assert [r.t for r in vb.records[1:3]] == [1.0, 2.0]
+    df = vb.to_dataframe()
+    assert list(df["V_anuga"]) == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert np.shares_memory(df.to_numpy(), vb._store.data)
+
+
+def test_path_keeps_the_history_on_disk_before_close(tmp_path):
+    from anuga_drainage import read_volume_balance
+    dom, be = _FakeDomain(), _FakeBackend()
+    path = tmp_path / "balance.f8"
+    vb = VolumeBalance(dom, [], be, path=path, capacity=2)
+    for k in range(3):
+        dom.water_volume = float(k)
+        vb.step(float(k))
+    vb._store.flush()
+    # Not closed (as after a crash): the unwritten preallocated row is dropped.
+    df = read_volume_balance(path)
+    assert list(df["t"]) == [0.0, 1.0, 2.0]
+    assert list(df["R_anuga"]) == pytest.approx([0.0, 1.0, 2.0])
+    vb.close()
+    assert path.stat().st_size == 3 * 12 * 8
+    assert list(read_volume_balance(path)["V_anuga"]) == [0.0, 1.0, 2.0]
+    assert vb.records[-1].t == 2.0
+
+
+def _per_inlet_run(every):
+    dom = _FakeDomain()
+    inlet0, inlet1 = _FakeOp(), _FakeOp()
+    be = _VecBackend()
+    vb = VolumeBalance(dom, [inlet0, inlet1], be, per_inlet_every=every)
+    for k in range(5):
+        be.vols = (2.0 * k, -1.0 * k)
+        inlet0.applied = -1.5 * k
+        inlet1.applied = 1.0 * k
+        vb.step(float(k), dt=1.0,
+                coupling_step=_Step(Q_in=[2.0, -1.0], anuga_flux=[0.0, 0.0]))
+    return vb
+
+
+def test_per_inlet_history_is_a_steps_by_inlets_array():
+    vb = _per_inlet_run(1)
+    assert len(vb.per_inlet) == 5
+    drying = vb.per_inlet_array("drying")
+    assert drying.shape == (5, 2)
+    assert list(drying[:, 0]) == pytest.approx([0.0, 0.5, 1.0, 1.5, 2.0])
+    assert list(vb.per_inlet_array("t")) == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert list(vb.per_inlet[2]["accepted"]) == pytest.approx([4.0, -2.0])
+    with pytest.raises(ValueError, match="unknown per-inlet quantity"):
+        vb.per_inlet_array("bogus")
+
+
+def test_per_inlet_every_thins_the_history_and_keeps_the_summary():
+    full = _per_inlet_run(1)
+    thinned = _per_inlet_run(2)
+    assert list(thinned.per_inlet_array("t")) == [0.0, 2.0, 4.0]
+    latest = _per_inlet_run(0)
+    assert len(latest.per_inlet) == 1 and latest.per_inlet[-1]["t"] == 4.0
+    assert latest.per_inlet_array("requested").shape == (0, 2)
+    assert thinned.summary() == full.summary() == latest.summary()
+
+
+def _cadence_run(**kw):
+    dom, inlet, be = _FakeDomain(), _FakeOp(), _VecBackend()
+    vb = VolumeBalance(dom, [inlet], be, **kw)
+    calls = []
+    get = dom.get_water_volume
+    dom.get_water_volume = lambda: calls.append(1) or get()
+    for k in range(7):
+        be.vols = (1.0 * k,)           # the sewer takes 1 per step ...
+        inlet.applied = -1.0 * k       # ... and ANUGA gives it up
+        be.pv = 1.0 * k
+        dom.water_volume = -1.0 * k - (0.5 * k if k >= 3 else 0.0)  # leak from t=3
+        vb.step(float(k), dt=1.0, coupling_step=_Step(Q_in=[1.0], anuga_flux=[0.0]))
+    return vb, len(calls)
+
+
+def test_every_and_interval_decimate_the_audit():
+    vb, calls = _cadence_run(every=3)
+    assert calls == 3 and [r.t for r in vb.records] == [0.0, 3.0, 6.0]
+    vb, _ = _cadence_run(interval=2.5)
+    assert [r.t for r in vb.records] == [0.0, 3.0, 6.0]
+    # The requested volume is accumulated every step, skipped or not.
+    assert list(vb.per_inlet[-1]["requested"]) == pytest.approx([6.0])
+    assert vb.per_inlet[-1]["drying"][0] == pytest.approx(0.0)
+
+
+def test_dense_above_audits_every_step_once_the_loss_grows():
+    vb, _ = _cadence_run(every=3, dense_above=1.0)
+    # t=3 loss = -1.5 crosses the threshold; it then audits every step.
+    assert [r.t for r in vb.records] == [0.0, 3.0, 4.0, 5.0, 6.0]
+
+
+def test_force_audits_a_skipped_step_and_bad_cadence_is_rejected():
+    dom, be = _FakeDomain(), _FakeBackend()
+    vb = VolumeBalance(dom, [], be, every=10)
+    vb.step(0.0)
+    assert vb.step(1.0) is None
+    assert vb.step(2.0, force=True).t == 2.0
+    with pytest.raises(ValueError, match="every"):
+        VolumeBalance(dom, [], be, every=0)
+    with pytest.raises(ValueError, match="interval"):
+        VolumeBalance(dom, [], be, interval=0.0)
+
+
+class _HeadBackend(_VecBackend):
+    vols = ()
+    heads = (1.0, 2.0)
+
+    def get_heads(self):
+        return list(self.heads)
+
+
+def test_watchdog_raises_with_a_snapshot_on_a_residual_breach():
+    from anuga_drainage import MassBalanceError
+    dom, be = _FakeDomain(), _HeadBackend()
+    vb = VolumeBalance(dom, [], be, tolerances={"R_pipe": 0.1, "R_anuga": 1.0})
+    vb.step(0.0)
+    be.pv = 0.05                                    # within tolerance
+    vb.step(1.0)
+    be.pv = 0.3                                     # pipe gained 0.3 from nowhere
+    with pytest.raises(MassBalanceError, match=r"\|R_pipe\| = 3.000e-01") as e:
+        vb.step(2.0)
+    snap = e.value.snapshot
+    assert snap["t"] == 2.0 and snap["breaches"] == [("R_pipe", pytest.approx(0.3), 0.1)]
+    assert snap["record"]["R_pipe"] == pytest.approx(0.3)
+    assert vb.breach is snap and len(vb.records) == 3
+
+
+def test_watchdog_catches_nonfinite_heads_and_stops_the_coupling():
+    from anuga_drainage.factory import Coupling
+
+    class _Coupler:
+        steps = 0
+
+        def step(self, dt):
+            self.steps += 1
+            return _Step(Q_in=[], anuga_flux=[])
+
+    dom, be = _FakeDomain(), _HeadBackend()
+    dom.get_time = lambda: 0.0
+    coupling = Coupling(coupler=_Coupler(), inlets={}, backend=be, handle=None,
+                        inp=None, domain=dom)
+    vb = coupling.add_volume_balance(tolerances={}, on_breach="stop")
+    assert coupling.step(1.0) is not None
+    be.heads = (1.0, float("nan"))
+    with pytest.warns(RuntimeWarning, match="1 non-finite pipe head"):
+        assert coupling.step(1.0) is None
+    assert vb.breach["nonfinite_heads"] == [1]
+    assert coupling.step(1.0) is None and coupling.coupler.steps == 1
+    with pytest.raises(ValueError, match="unknown tolerances"):
+        VolumeBalance(dom, [], be, tolerances={"R_bogus": 1.0})
+
+
+def test_flush_every_pushes_the_memmap_and_needs_a_path(tmp_path):
+    dom, be = _FakeDomain(), _FakeBackend()
+    vb = VolumeBalance(dom, [], be, path=tmp_path / "balance.f8", flush_every=2)
+    flushes = []
+    flush = vb._store.flush
+    vb._store.flush = lambda: flushes.append(1) or flush()
+    for k in range(5):
+        vb.step(float(k))
+    assert len(flushes) == 2
+    with pytest.raises(ValueError, match="need a path"):
+        VolumeBalance(dom, [], be, flush_interval=1.0)